@@ -462,8 +462,10 @@ def _CheckGeneratedFiles(input_api, output_api):
         input_api.PresubmitLocalPath(), 'scripts', 'deps',
         'generate_protocol_resources.py')
 
+    # The per-step profile shows which generator is slow.
     return _ExecuteSubProcess(input_api, output_api,
-                              generate_protocol_resources_path, [], results)
+                              generate_protocol_resources_path, ['--profile'],
+                              results)
 
 
 def _CheckL10nStrings(input_api, output_api):
@@ -20,6 +20,12 @@ sys.path.append(
         'inspector_protocol'))
 import concatenate_protocols
 
+sys.path.append(
+    str(
+        Path(__file__).resolve().parent.parent.parent.parent / 'scripts' /
+        'build'))
+import protocol_ir
+
 DEFAULT_APIS = [
     '../src/SymbolsBackend.cc.in', '../src/SymbolsBackend.d.ts.in',
     '../lib/api.h.in'
@@ -56,7 +62,7 @@ def script_main(args):
                         default=defaults)
     options = parser.parse_args(args)
 
-    specs = pdl_cxx.PDL.parse(pdlToJson())
+    specs = pdl_cxx.PDL.parse(protocol_ir.build_ir(pdlToJson()))
 
     for api_input in options.api_input:
         output, ext = os.path.splitext(api_input)
@@ -22,6 +22,14 @@ def to_proud_camel_case(name):
     return to_snake_case(name).title().replace('_', '')
 
 
+def _ref_type_name(spec):
+    # In the normalized protocol (scripts/build/protocol_ir.py), references are
+    # already resolved to `domain.Type`.
+    if '$resolvedRef' in spec:
+        return spec['$resolvedRef'].split('.', 1)[1]
+    return spec['$ref']
+
+
 def _desc(spec):
     if 'description' in spec:
         return spec['description'].split('\n')
@@ -41,7 +49,7 @@ class Variable(object):
             enums.append(self.type)
         else:
             type_spec = spec['items'] if self.array else spec
-            type_name = type_spec.get('type') or type_spec['$ref']
+            type_name = type_spec.get('type') or _ref_type_name(type_spec)
             if type_name not in types:
                 types[type_name] = Type.make_type(type_name)
                 assert types[
@@ -0,0 +1,471 @@
+#!/usr/bin/env vpython3
+#
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Benchmarks the generators that run after a protocol or CSS roll.
+
+Every generator runs in its own process, on its real input and on synthetic
+inputs that are scaled up by copying every domain (or CSS property) several
+times, so the cost of the generators is measured against the growth of the
+protocol before it shows up in presubmit. For every run, the wall time, the
+peak RSS of the process and the size of the outputs are recorded.
+
+Results are compared against a baseline written by an earlier run on the same
+machine with --write-baseline. A run fails if a measurement exceeds the
+baseline by more than its threshold, or if the wall time grows superlinearly
+with the size of the input, regardless of the baseline.
+
+Example:
+  benchmark_protocol_generators.py --write-baseline
+  benchmark_protocol_generators.py --scales 1 20 --generators pdl_cxx
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+SCRIPTS_BUILD_PATH = path.dirname(path.abspath(__file__))
+ROOT_DIRECTORY = path.join(SCRIPTS_BUILD_PATH, '..', '..')
+PROTOCOL_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'public',
+                              'devtools_protocol', 'browser_protocol.json')
+CSS_PROPERTIES_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink',
+                                    'renderer', 'core', 'css',
+                                    'css_properties.json5')
+CXX_DEBUGGING_TOOLS_PATH = path.join(ROOT_DIRECTORY, 'extensions',
+                                     'cxx_debugging', 'tools')
+CXX_API_TEMPLATES = [
+    path.join(CXX_DEBUGGING_TOOLS_PATH, '..', 'src', 'SymbolsBackend.cc.in'),
+    path.join(CXX_DEBUGGING_TOOLS_PATH, '..', 'src', 'SymbolsBackend.d.ts.in'),
+    path.join(CXX_DEBUGGING_TOOLS_PATH, '..', 'lib', 'api.h.in'),
+]
+DEFAULT_BASELINE_LOCATION = path.join(ROOT_DIRECTORY,
+                                      '.protocol_resources_cache',
+                                      'benchmark_baseline.json')
+
+GENERATORS = ['code_generator_frontend', 'generate_supported_css', 'pdl_cxx']
+DEFAULT_SCALES = [1, 5, 20]
+
+
+def scaled_name(name, copy):
+    return name if copy == 0 else '%sCopy%d' % (name, copy)
+
+
+def rename_refs(json_value, domain_names, copy):
+    if isinstance(json_value, dict):
+        if '.' in json_value.get('$ref', ''):
+            domain_name, type_name = json_value['$ref'].split('.', 1)
+            if domain_name in domain_names:
+                json_value['$ref'] = '%s.%s' % (scaled_name(domain_name,
+                                                            copy), type_name)
+        for value in json_value.values():
+            rename_refs(value, domain_names, copy)
+    elif isinstance(json_value, list):
+        for value in json_value:
+            rename_refs(value, domain_names, copy)
+
+
+# Returns a protocol with `factor` copies of every domain. The copies only
+# refer to each other, so every copy is as expensive to generate as the
+# original domain.
+def scale_protocol(protocol, factor):
+    domain_names = {
+        json_domain['domain']
+        for json_domain in protocol['domains']
+    }
+    domains = []
+    for copy in range(factor):
+        for json_domain in protocol['domains']:
+            json_domain = json.loads(json.dumps(json_domain))
+            json_domain['domain'] = scaled_name(json_domain['domain'], copy)
+            json_domain['dependencies'] = [
+                scaled_name(dependency, copy)
+                for dependency in json_domain.get('dependencies', [])
+            ]
+            rename_refs(json_domain, domain_names, copy)
+            domains.append(json_domain)
+    scaled_protocol = dict(protocol)
+    scaled_protocol['domains'] = domains
+    return scaled_protocol
+
+
+def scaled_property_name(name, copy):
+    return name if copy == 0 else '%s-copy%d' % (name, copy)
+
+
+# Returns the css_properties.json5 document with `factor` copies of every
+# property, including its longhands and aliases.
+def scale_css_properties(doc, factor):
+    data = []
+    for copy in range(factor):
+        for entry in doc['data']:
+            if isinstance(entry, str):
+                data.append(scaled_property_name(entry, copy))
+                continue
+            entry = dict(entry)
+            entry['name'] = scaled_property_name(entry['name'], copy)
+            if 'alias_for' in entry:
+                entry['alias_for'] = scaled_property_name(
+                    entry['alias_for'], copy)
+            longhands = entry.get('longhands')
+            if isinstance(longhands, str):
+                longhands = longhands.split(';')
+            if longhands:
+                entry['longhands'] = [
+                    scaled_property_name(longhand, copy)
+                    for longhand in longhands
+                ]
+            data.append(entry)
+    scaled_doc = dict(doc)
+    scaled_doc['data'] = data
+    return scaled_doc
+
+
+def load_json5(location):
+    sys.path.append(path.join(ROOT_DIRECTORY, 'third_party', 'pyjson5', 'src'))
+    import json5  # pylint: disable=import-error
+    with open(location, encoding='utf-8') as json5_file:
+        return json5.loads(json5_file.read())
+
+
+def load_cxx_api_protocol():
+    sys.path.append(
+        path.join(ROOT_DIRECTORY, 'third_party', 'inspector_protocol'))
+    import concatenate_protocols  # pylint: disable=import-error
+    with tempfile.TemporaryDirectory() as temp_directory:
+        json_location = path.join(temp_directory, 'api.json')
+        concatenate_protocols.main(
+            [path.join(CXX_DEBUGGING_TOOLS_PATH, 'api.pdl'), json_location])
+        with open(json_location, encoding='utf-8') as json_file:
+            return json.load(json_file)
+
+
+def write_json(location, value):
+    with open(location, 'w', encoding='utf-8') as json_file:
+        json.dump(value, json_file)
+
+
+# Writes the input of `generator` scaled by `factor` to `directory` and returns
+# the command that runs the generator and the location of its outputs.
+def prepare_run(generator, factor, directory, inputs):
+    input_location = path.join(directory, 'input.json')
+    output_location = path.join(directory, 'output')
+    if generator == 'code_generator_frontend':
+        write_json(input_location, scale_protocol(inputs['protocol'], factor))
+        command = [
+            path.join(SCRIPTS_BUILD_PATH, 'code_generator_frontend.py'),
+            '--input', input_location, '--output', output_location
+        ]
+    elif generator == 'generate_supported_css':
+        write_json(input_location,
+                   scale_css_properties(inputs['css_properties'], factor))
+        command = [
+            path.join(SCRIPTS_BUILD_PATH, 'generate_supported_css.py'),
+            '--input', input_location, '--output', output_location
+        ]
+    else:
+        write_json(input_location,
+                   scale_protocol(inputs['cxx_api_protocol'], factor))
+        os.makedirs(output_location)
+        command = [
+            path.abspath(__file__), '--run-pdl-cxx', input_location,
+            output_location
+        ]
+    return [sys.executable] + command, output_location
+
+
+def load_inputs(generators):
+    inputs = {}
+    if 'code_generator_frontend' in generators:
+        with open(PROTOCOL_LOCATION, encoding='utf-8') as protocol_file:
+            inputs['protocol'] = json.load(protocol_file)
+    if 'generate_supported_css' in generators:
+        inputs['css_properties'] = load_json5(CSS_PROPERTIES_LOCATION)
+    if 'pdl_cxx' in generators:
+        inputs['cxx_api_protocol'] = load_cxx_api_protocol()
+    return inputs
+
+
+def get_output_size(output_location):
+    if path.isfile(output_location):
+        return path.getsize(output_location)
+    size = 0
+    for directory, _, file_names in os.walk(output_location):
+        for file_name in file_names:
+            size += path.getsize(path.join(directory, file_name))
+    return size
+
+
+# Runs `command` and returns its wall time in seconds and its peak RSS in KiB,
+# which is None where the platform doesn't report it.
+def measure(command):
+    start = time.perf_counter()
+    process = subprocess.Popen(command,
+                               cwd=ROOT_DIRECTORY,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    if hasattr(os, 'wait4'):
+        output = process.stdout.read()
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = rusage.ru_maxrss
+        # macOS reports bytes, Linux reports KiB.
+        if sys.platform == 'darwin':
+            peak_rss //= 1024
+    else:
+        output, _ = process.communicate()
+        peak_rss = None
+    wall_time = time.perf_counter() - start
+    process.stdout.close()
+    if process.returncode != 0:
+        raise RuntimeError(
+            '%s failed:\n%s' %
+            (' '.join(command), output.decode('utf-8', 'replace')))
+    return wall_time, peak_rss
+
+
+# Wall time of starting an interpreter that does nothing, which is subtracted
+# before comparing the wall times of different scales.
+def measure_startup_time(repeat):
+    return min(measure([sys.executable, '-c', ''])[0] for _ in range(repeat))
+
+
+def run_benchmark(generator, factor, inputs, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        command, output_location = prepare_run(generator, factor, directory,
+                                               inputs)
+        wall_times = []
+        peak_rss = None
+        for _ in range(repeat):
+            wall_time, run_peak_rss = measure(command)
+            wall_times.append(wall_time)
+            if run_peak_rss is not None:
+                peak_rss = max(peak_rss or 0, run_peak_rss)
+        return {
+            'wallTime': min(wall_times),
+            'peakRss': peak_rss,
+            'outputSize': get_output_size(output_location),
+        }
+
+
+def get_key(generator, factor):
+    return '%s@%dx' % (generator, factor)
+
+
+def parse_key(key):
+    generator, factor = re.match(r'^(.*)@(\d+)x$', key).groups()
+    return generator, int(factor)
+
+
+# Returns log(time ratio) / log(size ratio) between the smallest and largest
+# scale of each generator: 1 for linear growth, 2 for quadratic growth.
+def compute_scaling_exponents(results, startup_time):
+    by_generator = {}
+    for key, result in results.items():
+        generator, factor = parse_key(key)
+        by_generator.setdefault(generator, {})[factor] = result
+    exponents = {}
+    for generator, by_factor in by_generator.items():
+        smallest, largest = min(by_factor), max(by_factor)
+        if smallest == largest:
+            continue
+        small_time = max(by_factor[smallest]['wallTime'] - startup_time, 1e-3)
+        large_time = max(by_factor[largest]['wallTime'] - startup_time, 1e-3)
+        exponents[generator] = math.log(large_time / small_time) / math.log(
+            largest / smallest)
+    return exponents
+
+
+def compare_to_baseline(results, baseline, opts):
+    regressions = []
+    thresholds = [
+        ('wallTime', 'wall time', opts.time_threshold),
+        ('peakRss', 'peak RSS', opts.memory_threshold),
+        ('outputSize', 'output size', opts.size_threshold),
+    ]
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        for metric, label, threshold in thresholds:
+            value = result.get(metric)
+            baseline_value = baseline[key].get(metric)
+            if not value or not baseline_value:
+                continue
+            ratio = value / baseline_value
+            if ratio > 1 + threshold:
+                regressions.append('%s: %s is %.0f%% above the baseline' %
+                                   (key, label, (ratio - 1) * 100))
+    return regressions
+
+
+def format_table(results, baseline):
+    lines = [
+        '%-32s %10s %12s %12s %10s' %
+        ('Benchmark', 'Time (s)', 'Peak RSS (MiB)', 'Output (KiB)', 'vs base')
+    ]
+    for key, result in sorted(results.items(),
+                              key=lambda item: parse_key(item[0])):
+        vs_baseline = ''
+        if key in baseline and baseline[key]['wallTime']:
+            vs_baseline = '%+.0f%%' % (
+                (result['wallTime'] / baseline[key]['wallTime'] - 1) * 100)
+        peak_rss = ('%.1f' % (result['peakRss'] / 1024)
+                    if result['peakRss'] is not None else '-')
+        lines.append('%-32s %10.3f %14s %12.1f %10s' %
+                     (key, result['wallTime'], peak_rss,
+                      result['outputSize'] / 1024, vs_baseline))
+    return '\n'.join(lines)
+
+
+def read_baseline(location):
+    try:
+        with open(location, encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)['results']
+    except (IOError, ValueError, KeyError):
+        return {}
+
+
+def write_baseline(location, results):
+    os.makedirs(path.dirname(path.abspath(location)), exist_ok=True)
+    with open(location, 'w', encoding='utf-8') as baseline_file:
+        json.dump({'results': results},
+                  baseline_file,
+                  indent=2,
+                  sort_keys=True)
+
+
+# Runs pdl_cxx like extensions/cxx_debugging/tools/generate-api.py does, but on
+# the protocol JSON at `input_location`.
+def run_pdl_cxx(input_location, output_directory):
+    sys.path.append(CXX_DEBUGGING_TOOLS_PATH)
+    sys.path.append(SCRIPTS_BUILD_PATH)
+    from jinja2 import Template  # pylint: disable=import-error
+    import pdl_cxx
+    import protocol_ir
+
+    with open(input_location, encoding='utf-8') as input_file:
+        specs = pdl_cxx.PDL.parse(protocol_ir.build_ir(json.load(input_file)))
+    for template_location in CXX_API_TEMPLATES:
+        with open(template_location, encoding='utf-8') as template_file:
+            template = Template(template_file.read())
+        output_name = path.splitext(path.basename(template_location))[0]
+        with open(path.join(output_directory, output_name),
+                  'w',
+                  encoding='utf-8') as output_file:
+            output_file.write(
+                template.render(specs=specs, enumerate=enumerate, list=list))
+    return 0
+
+
+def parse_options(cli_args):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the protocol resource generators')
+    parser.add_argument('--generators',
+                        nargs='+',
+                        choices=GENERATORS,
+                        default=GENERATORS,
+                        help='Generators to benchmark')
+    parser.add_argument(
+        '--scales',
+        nargs='+',
+        type=int,
+        default=DEFAULT_SCALES,
+        help='Sizes of the inputs, as multiples of the real one')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help='Runs per benchmark, the fastest one is reported')
+    parser.add_argument('--baseline',
+                        default=DEFAULT_BASELINE_LOCATION,
+                        help='Results of an earlier run to compare against')
+    parser.add_argument('--write-baseline',
+                        action='store_true',
+                        help='Store the results as the new baseline')
+    parser.add_argument('--time-threshold',
+                        type=float,
+                        default=0.25,
+                        help='Allowed relative increase of the wall time')
+    parser.add_argument('--memory-threshold',
+                        type=float,
+                        default=0.25,
+                        help='Allowed relative increase of the peak RSS')
+    parser.add_argument('--size-threshold',
+                        type=float,
+                        default=0.1,
+                        help='Allowed relative increase of the output size')
+    parser.add_argument(
+        '--max-scaling-exponent',
+        type=float,
+        default=1.3,
+        help='Largest allowed growth of the wall time with the input size, '
+        'as an exponent (1 is linear)')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--run-pdl-cxx',
+                        nargs=2,
+                        metavar=('INPUT', 'OUTPUT_DIRECTORY'),
+                        help=argparse.SUPPRESS)
+    return parser.parse_args(cli_args)
+
+
+def main(cli_args):
+    opts = parse_options(cli_args)
+    if opts.run_pdl_cxx:
+        return run_pdl_cxx(*opts.run_pdl_cxx)
+
+    inputs = load_inputs(opts.generators)
+    startup_time = measure_startup_time(opts.repeat)
+    results = {}
+    for generator in opts.generators:
+        for factor in sorted(set(opts.scales)):
+            key = get_key(generator, factor)
+            print('Running %s' % key, file=sys.stderr)
+            results[key] = run_benchmark(generator, factor, inputs,
+                                         opts.repeat)
+
+    baseline = read_baseline(opts.baseline)
+    print(format_table(results, baseline))
+
+    failures = compare_to_baseline(results, baseline, opts)
+    exponents = compute_scaling_exponents(results, startup_time)
+    for generator, exponent in sorted(exponents.items()):
+        print('%s scales with n^%.2f' % (generator, exponent))
+        if exponent > opts.max_scaling_exponent:
+            failures.append('%s grows superlinearly (n^%.2f)' %
+                            (generator, exponent))
+
+    if opts.json:
+        with open(opts.json, 'w', encoding='utf-8') as json_file:
+            json.dump(
+                {
+                    'startupTime': startup_time,
+                    'results': results,
+                    'scalingExponents': exponents,
+                    'failures': failures,
+                },
+                json_file,
+                indent=2,
+                sort_keys=True)
+    if opts.write_baseline:
+        write_baseline(opts.baseline, results)
+        print('Wrote baseline to %s' % opts.baseline)
+        return 0
+
+    if failures:
+        print('')
+        print('Performance regressions:')
+        for failure in failures:
+            print('  * %s' % failure)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
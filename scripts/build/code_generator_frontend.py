@@ -28,11 +28,18 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import sys
-import string
+import argparse
+import hashlib
+import os
 import re
+import string
+import sys
 from os import path
 
+import generated_file
+import protocol_diff
+import protocol_ir
+
 try:
     import json
 except ImportError:
@@ -40,6 +47,8 @@ except ImportError:
 
 ROOT_DIRECTORY = path.join(path.dirname(__file__), '..', '..')
 GENERATED_LOCATION = path.join(ROOT_DIRECTORY, 'front_end', 'generated', 'InspectorBackendCommands.js')
+DEFAULT_MODULE_PATH = path.splitext(path.basename(GENERATED_LOCATION))[0]
+DESCRIPTIONS_EXTENSION = ".descriptions.json"
 READ_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'public', 'devtools_protocol', 'browser_protocol.json')
 
 
@@ -83,42 +92,11 @@ class RawTypes(object):
             raise Exception("Unknown type: %s" % json_type)
 
 
-class TypeData(object):
-
-    def __init__(self, json_type):
-        if "type" not in json_type:
-            raise Exception("Unknown type")
-        json_type_name = json_type["type"]
-        self.raw_type_js_ = RawTypes.get_js(json_type_name)
-
-    def get_raw_type_js(self):
-        return self.raw_type_js_
-
-
-class TypeMap:
-
-    def __init__(self, api):
-        self.map_ = {}
-        for json_domain in api["domains"]:
-            domain_name = json_domain["domain"]
-
-            domain_map = {}
-            self.map_[domain_name] = domain_map
-
-            if "types" in json_domain:
-                for json_type in json_domain["types"]:
-                    type_name = json_type["id"]
-                    type_data = TypeData(json_type)
-                    domain_map[type_name] = type_data
-
-    def get(self, domain_name, type_name):
-        return self.map_[domain_name][type_name]
-
-
-def resolve_param_raw_type_js(json_parameter, scope_domain_name):
+# The protocol is normalized by protocol_ir.py, which resolves `$ref`s and
+# adds the type of the referenced type as `$refType`.
+def resolve_param_raw_type_js(json_parameter):
     if "$ref" in json_parameter:
-        json_ref = json_parameter["$ref"]
-        return get_ref_data_js(json_ref, scope_domain_name)
+        return RawTypes.get_js(json_parameter["$refType"])
     elif "type" in json_parameter:
         json_type = json_parameter["type"]
         return RawTypes.get_js(json_type)
@@ -126,21 +104,17 @@ def resolve_param_raw_type_js(json_parameter, scope_domain_name):
         raise Exception("Unknown type")
 
 
-def get_ref_data_js(json_ref, scope_domain_name):
-    dot_pos = json_ref.find(".")
-    if dot_pos == -1:
-        domain_name = scope_domain_name
-        type_name = json_ref
-    else:
-        domain_name = json_ref[:dot_pos]
-        type_name = json_ref[dot_pos + 1:]
-
-    return type_map.get(domain_name, type_name).get_raw_type_js()
-
-
-input_file = open(READ_LOCATION, "r")
-json_string = input_file.read()
-json_api = json.loads(json_string)
+def collect_refs(json_value, refs):
+    if isinstance(json_value, dict):
+        for key, value in json_value.items():
+            if key == "$resolvedRef":
+                refs.add(value)
+            else:
+                collect_refs(value, refs)
+    elif isinstance(json_value, list):
+        for value in json_value:
+            collect_refs(value, refs)
+    return refs
 
 
 class Templates:
@@ -165,11 +139,13 @@ class Templates:
 
         return "/".join(components)
 
-    file_header_ = (
+    copyright_header_ = (
         """// Copyright (c) 2020 The Chromium Authors. All rights reserved.
 // Use of this source code is governed by a BSD-style license that can be
 // found in the LICENSE file.
-""" + "// File is generated by %s\n" % get_this_script_path_(sys.argv[0]) + """
+""" + "// File is generated by %s\n" % get_this_script_path_(__file__))
+
+    file_header_ = copyright_header_ + """
 /**
  * @typedef {{
  *  registerCommand: function(
@@ -200,95 +176,404 @@ class Templates:
  */
 // @ts-ignore typedef
 export let InspectorBackendAPI;
+"""
 
+    # The modules of split domains import the typedef from the index module
+    # instead of repeating it.
+    domain_module_header_ = string.Template(copyright_header_ + """
+import {InspectorBackendAPI} from $indexUrl;
+""")
+
+    register_commands_header_ = """
 /**
  * @param {!InspectorBackendAPI} inspectorBackend
  */
 export function registerCommands(inspectorBackend) {
+"""
+
+    # With out-of-line descriptions, `registerCommands` is called again with
+    # the loaded descriptions, which registers the commands and types again
+    # with their descriptions.
+    register_commands_with_descriptions_header_ = string.Template("""
+/**
+ * Fetches the descriptions of the commands and parameters, which the
+ * registered commands and types only have after calling `registerCommands`
+ * again with them.
+ * @return {!Promise<!Array<string>>}
+ */
+export async function loadDescriptions() {
+  const response = await fetch(new URL($descriptionsUrl, import.meta.url));
+  return response.json();
+}
+
+/**
+ * @param {!InspectorBackendAPI} inspectorBackend
+ * @param {!Array<string>=} descriptions The result of `loadDescriptions`.
+ */
+export function registerCommands(inspectorBackend, descriptions = []) {
 """)
 
-    backend_js = string.Template(file_header_ + """
+    backend_js = string.Template("""$fileHeader$registerCommandsHeader
 
 $domainInitializers
 }
 """)
 
+    domain_index_js = string.Template(file_header_ + """
+/**
+ * @typedef {{registerCommands: function(!InspectorBackendAPI): void}}
+ */
+// @ts-ignore typedef
+export let DomainModule;
+
+/** @type {!Object<string, function(): !Promise<!DomainModule>>} */
+const DOMAIN_LOADERS = {
+$domainLoaders
+};
+
+/** @type {!Object<string, !Array<string>>} */
+const DOMAIN_DEPENDENCIES = {
+$domainDependencies
+};
+
+export const DOMAINS = Object.keys(DOMAIN_LOADERS);
+
+/** @type {!WeakMap<!InspectorBackendAPI, !Map<string, !Promise<void>>>} */
+const registrationsByBackend = new WeakMap();
+
+/**
+ * @param {!InspectorBackendAPI} inspectorBackend
+ * @param {string} domain
+ * @return {!Promise<void>}
+ */
+function registerDomainOnly(inspectorBackend, domain) {
+  let registrations = registrationsByBackend.get(inspectorBackend);
+  if (!registrations) {
+    registrations = new Map();
+    registrationsByBackend.set(inspectorBackend, registrations);
+  }
+  let registration = registrations.get(domain);
+  if (!registration) {
+    registration = DOMAIN_LOADERS[domain]().then(module => module.registerCommands(inspectorBackend));
+    registrations.set(domain, registration);
+  }
+  return registration;
+}
+
+/**
+ * Registers a domain and the domains whose types it refers to. Every domain
+ * is only loaded and registered once.
+ * @param {!InspectorBackendAPI} inspectorBackend
+ * @param {string} domain
+ * @return {!Promise<void>}
+ */
+export async function registerDomain(inspectorBackend, domain) {
+  const domains = [domain, ...(DOMAIN_DEPENDENCIES[domain] || [])];
+  await Promise.all(domains.map(domain => registerDomainOnly(inspectorBackend, domain)));
+}
+
+/**
+ * @param {!InspectorBackendAPI} inspectorBackend
+ * @return {!Promise<void>}
+ */
+export async function registerCommands(inspectorBackend) {
+  await Promise.all(DOMAINS.map(domain => registerDomainOnly(inspectorBackend, domain)));
+}
+""")
+
+    # The compact output stores the arguments of all register calls in a few
+    # arrays. Strings are interned in STRINGS, parameters are interned in
+    # PARAMETERS (PARAMETER_SIZE numbers each) and OPS lists the register calls
+    # in the order of the regular output. See CompactGenerator.
+    compact_backend_js = string.Template("""$fileHeader
+const DOMAIN = 0, ENUM = 1, EVENT = 2, COMMAND = 3, TYPE = 4;
+const TYPES = $types;
+const PARAMETER_SIZE = 5;
+
+/** @type {!Array<string>} */
+const STRINGS = [
+$strings
+];
+
+/** @type {!Array<number>} */
+const PARAMETERS = [
+$parameters
+];
+
+/** @type {!Array<number>} */
+const OPS = [
+$ops
+];
+$registerCommandsHeader  let position = 0;
+  let domain = "";
+  const readString = () => STRINGS[OPS[position++]];
+  const readName = () => domain + "." + readString();
+  const readStrings = () => {
+    const strings = [];
+    for (let count = OPS[position++]; count > 0; --count) {
+      strings.push(readString());
+    }
+    return strings;
+  };
+  const readParameters = () => {
+    const parameters = [];
+    for (let count = OPS[position++]; count > 0; --count) {
+      const offset = OPS[position++] * PARAMETER_SIZE;
+      const typeRef = PARAMETERS[offset + 4];
+      parameters.push({
+        name: STRINGS[PARAMETERS[offset]],
+        type: TYPES[PARAMETERS[offset + 1]],
+        optional: PARAMETERS[offset + 2] === 1,
+        description: describe(PARAMETERS[offset + 3]),
+        typeRef: typeRef === -1 ? null : STRINGS[typeRef],
+      });
+    }
+    return parameters;
+  };
+
+  while (position < OPS.length) {
+    switch (OPS[position++]) {
+      case DOMAIN:
+        domain = readString();
+        break;
+      case ENUM: {
+        const name = readName();
+        const keys = readStrings();
+        const values = readStrings();
+        /** @type {!Object<string, string>} */
+        const members = {};
+        keys.forEach((key, index) => {
+          members[key] = values[index];
+        });
+        inspectorBackend.registerEnum(name, members);
+        break;
+      }
+      case EVENT:
+        inspectorBackend.registerEvent(readName(), readStrings());
+        break;
+      case COMMAND:
+        inspectorBackend.registerCommand(readName(), readParameters(), readStrings(), describe(OPS[position++]));
+        break;
+      case TYPE:
+        inspectorBackend.registerType(readName(), readParameters());
+        break;
+    }
+  }
+}
+""")
+
 
-type_map = TypeMap(json_api)
+# The output of a domain only depends on its own JSON, the raw types of the
+# types it references and this script, so fragments are cached by a digest of
+# these. Changes to the script invalidate every fragment.
+def compute_generator_version():
+    with open(__file__, "rb") as script_file:
+        return hashlib.sha256(script_file.read()).hexdigest()
 
 
 class Generator:
-    backend_js_domain_initializer_list = []
 
-    @staticmethod
-    def go():
-        for json_domain in json_api["domains"]:
+    format_name = "classic"
+
+    # Descriptions are only needed by tools like the Protocol Monitor. They are
+    # either part of the register calls (inline), moved to a JSON file next to
+    # the module that is loaded on demand (table) or left out (strip).
+    description_modes = ["inline", "table", "strip"]
+
+    def __init__(self, json_api, fragment_cache=None, descriptions="inline", reused_fragments=None):
+        self.json_api = protocol_ir.ensure_ir(json_api)
+        self.fragment_cache = fragment_cache
+        # Fragments of an existing output to use as-is, keyed by domain. Unlike
+        # the fragment cache, they are only valid for this run and never saved.
+        self.reused_fragments = reused_fragments or {}
+        self.descriptions = descriptions
+        self.used_fragment_digests = set()
+        self.cache_hits = 0
+        # The description tables to write next to the modules, keyed by their
+        # path relative to the output directory.
+        self.description_tables = {}
+
+    # `module_path` is the path of the module without extension relative to the
+    # output directory.
+    def go(self, module_path=DEFAULT_MODULE_PATH):
+        return self.assemble([fragment for _, fragment in self.generate_fragments()], module_path)
+
+    # Returns the contents of a module per domain, each exporting its own
+    # `registerCommands`, and of an index module that registers domains on
+    # demand. The modules are keyed by their path relative to the index.
+    def go_split(self, modules_directory_name):
+        modules = {}
+        domain_loaders = []
+        # The modules are in a directory named like the index module.
+        index_url = json.dumps("../%s.js" % modules_directory_name)
+        file_header = Templates.domain_module_header_.substitute(None, indexUrl=index_url)
+        for domain_name, fragment in self.generate_fragments():
+            module_path = "%s/%s" % (modules_directory_name, domain_name)
+            modules[module_path + ".js"] = self.assemble([fragment], module_path, file_header)
+            domain_loaders.append("  %s: () => import(%s)," %
+                                  (json.dumps(domain_name), json.dumps("./%s.js" % module_path)))
+
+        domain_dependencies = []
+        for domain_name, dependencies in sorted(self.compute_domain_dependencies().items()):
+            domain_dependencies.append("  %s: %s," % (json.dumps(domain_name), json.dumps(dependencies)))
+
+        modules[None] = Templates.domain_index_js.substitute(None,
+                                                             domainLoaders="\n".join(domain_loaders),
+                                                             domainDependencies="\n".join(domain_dependencies))
+        return modules
+
+    def generate_fragments(self):
+        for json_domain in self.json_api["domains"]:
             domain_name = json_domain["domain"]
-            domain_name_lower = domain_name.lower()
-            if domain_name_lower == "console":
+            if domain_name.lower() == "console":
                 continue
 
-            Generator.backend_js_domain_initializer_list.append("// %s.\n" % domain_name)
-
-            if "types" in json_domain:
-                for json_type in json_domain["types"]:
-                    if "type" in json_type and json_type["type"] == "string" and "enum" in json_type:
-                        enum_name = "%s.%s" % (domain_name, json_type["id"])
-                        Generator.process_enum(json_type, enum_name)
-                    elif json_type["type"] == "object":
-                        if "properties" in json_type:
-                            for json_property in json_type["properties"]:
-                                if "type" in json_property and json_property["type"] == "string" and "enum" in json_property:
-                                    enum_name = "%s.%s%s" % (domain_name, json_type["id"], to_title_case(json_property["name"]))
-                                    Generator.process_enum(json_property, enum_name)
-
-            if "events" in json_domain:
-                for json_event in json_domain["events"]:
-                    if "parameters" in json_event:
-                        for param in json_event["parameters"]:
-                            if "enum" in param:
-                                enum_name = "%s.%sEvent%s" % (
-                                    domain_name,
-                                    to_title_case(json_event["name"]),
-                                    to_title_case(param["name"]))
-                                Generator.process_enum(param, enum_name)
-                    Generator.process_event(json_event, domain_name)
-
-            if "commands" in json_domain:
-                for json_command in json_domain["commands"]:
-                    if "parameters" in json_command:
-                        for param in json_command["parameters"]:
-                            if "enum" in param:
-                                enum_name = "%s.%sRequest%s" % (
-                                    domain_name,
-                                    to_title_case(json_command["name"]),
-                                    to_title_case(param["name"]))
-                                Generator.process_enum(param, enum_name)
-                    Generator.process_command(json_command, domain_name)
-
-            if "types" in json_domain:
-                for json_type in json_domain["types"]:
-                    if json_type[
-                            "type"] == "object" and "properties" in json_type:
-                        Generator.process_type(json_type["properties"],
-                                               domain_name, json_type["id"])
-                    elif json_type["type"] == "array":
-                        Generator.process_type([json_type], domain_name,
-                                               json_type["id"])
-
-            Generator.backend_js_domain_initializer_list.append("\n")
+            if domain_name in self.reused_fragments:
+                if self.fragment_cache is not None:
+                    # Keeps the cached fragment of the domain, if any, for the next run.
+                    digest = self.compute_domain_digest(json_domain)
+                    if digest in self.fragment_cache:
+                        self.used_fragment_digests.add(digest)
+                yield domain_name, self.reused_fragments[domain_name]
+                continue
 
-    @staticmethod
-    def process_enum(json_enum, enum_name):
+            if self.fragment_cache is None:
+                yield domain_name, self.process_domain(json_domain)
+                continue
+
+            digest = self.compute_domain_digest(json_domain)
+            self.used_fragment_digests.add(digest)
+            if digest in self.fragment_cache:
+                self.cache_hits += 1
+            else:
+                self.fragment_cache[digest] = self.process_domain(json_domain)
+            yield domain_name, self.fragment_cache[digest]
+
+    # Returns the domains that every domain refers to types of, directly or
+    # through other domains. These have to be registered with the domain, so
+    # that its typeRefs resolve.
+    def compute_domain_dependencies(self):
+        direct_dependencies = {}
+        for json_domain in self.json_api["domains"]:
+            domain_name = json_domain["domain"]
+            if domain_name.lower() == "console":
+                continue
+            referenced_domains = set(json_ref.split(".")[0] for json_ref in collect_refs(json_domain, set()))
+            direct_dependencies[domain_name] = referenced_domains
+
+        dependencies = {}
+        for domain_name in direct_dependencies:
+            closure = set()
+            pending = list(direct_dependencies[domain_name])
+            while pending:
+                dependency = pending.pop()
+                if dependency in closure or dependency == domain_name or dependency not in direct_dependencies:
+                    continue
+                closure.add(dependency)
+                pending.extend(direct_dependencies[dependency])
+            dependencies[domain_name] = sorted(closure)
+        return dependencies
+
+    def get_register_commands_header(self, module_path):
+        if self.descriptions != "table":
+            return Templates.register_commands_header_
+        descriptions_location = module_path + DESCRIPTIONS_EXTENSION
+        return Templates.register_commands_with_descriptions_header_.substitute(
+            None, descriptionsUrl=json.dumps("./" + path.basename(descriptions_location)))
+
+    def assemble(self, fragments, module_path, file_header=Templates.file_header_):
+        if self.descriptions == "table":
+            # Fragments number their descriptions from zero, so that they can be
+            # cached. Every domain starts at an offset into the table.
+            descriptions = []
+            texts = []
+            for text, domain_descriptions in fragments:
+                texts.append("descriptionOffset = %d;\n%s" % (len(descriptions), text))
+                descriptions.extend(domain_descriptions)
+            self.description_tables[module_path + DESCRIPTIONS_EXTENSION] = descriptions
+            register_commands_header = self.get_register_commands_header(module_path) + """  let descriptionOffset = 0;
+  /** @param {number} index */
+  const description = index => descriptions[descriptionOffset + index] || "";
+"""
+            return Templates.backend_js.substitute(None,
+                                                   fileHeader=file_header,
+                                                   registerCommandsHeader=register_commands_header,
+                                                   domainInitializers="".join(texts))
+
+        return Templates.backend_js.substitute(None,
+                                               fileHeader=file_header,
+                                               registerCommandsHeader=Templates.register_commands_header_,
+                                               domainInitializers="".join(fragments))
+
+    # The normalized domain includes the types of the types it refers to.
+    def compute_domain_digest(self, json_domain):
+        digest_input = json.dumps([self.format_name, self.descriptions, json_domain], sort_keys=True)
+        return hashlib.sha256(digest_input.encode("utf-8")).hexdigest()
+
+    def process_domain(self, json_domain):
+        self.domain_initializer_list = ["// %s.\n" % json_domain["domain"]]
+        self.domain_descriptions = {}
+        self.visit_domain(json_domain)
+        self.domain_initializer_list.append("\n")
+        if self.descriptions == "table":
+            return ["".join(self.domain_initializer_list), list(self.domain_descriptions)]
+        return "".join(self.domain_initializer_list)
+
+    # Returns the JavaScript expression for a description in the table and
+    # strip modes.
+    def get_description_expression(self, description):
+        if self.descriptions == "strip":
+            return '""'
+        return "description(%d)" % self.domain_descriptions.setdefault(description, len(self.domain_descriptions))
+
+    def visit_domain(self, json_domain):
+        domain_name = json_domain["domain"]
+
+        if "types" in json_domain:
+            for json_type in json_domain["types"]:
+                if "type" in json_type and json_type["type"] == "string" and "enum" in json_type:
+                    self.process_enum(json_type, json_type["enumName"])
+                elif json_type["type"] == "object":
+                    if "properties" in json_type:
+                        for json_property in json_type["properties"]:
+                            if "type" in json_property and json_property["type"] == "string" and "enum" in json_property:
+                                self.process_enum(json_property, json_property["enumName"])
+
+        if "events" in json_domain:
+            for json_event in json_domain["events"]:
+                if "parameters" in json_event:
+                    for param in json_event["parameters"]:
+                        if "enum" in param:
+                            self.process_enum(param, param["enumName"])
+                self.process_event(json_event, domain_name)
+
+        if "commands" in json_domain:
+            for json_command in json_domain["commands"]:
+                if "parameters" in json_command:
+                    for param in json_command["parameters"]:
+                        if "enum" in param:
+                            self.process_enum(param, param["enumName"])
+                self.process_command(json_command, domain_name)
+
+        if "types" in json_domain:
+            for json_type in json_domain["types"]:
+                if json_type[
+                        "type"] == "object" and "properties" in json_type:
+                    self.process_type(json_type["properties"],
+                                      domain_name, json_type["id"])
+                elif json_type["type"] == "array":
+                    self.process_type([json_type], domain_name,
+                                      json_type["id"])
+
+    def process_enum(self, json_enum, enum_name):
         enum_members = []
         for member in json_enum["enum"]:
             enum_members.append("%s: \"%s\"" % (fix_camel_case(member), member))
 
-        Generator.backend_js_domain_initializer_list.append(
+        self.domain_initializer_list.append(
             "inspectorBackend.registerEnum(\"%s\", {%s});\n" % (enum_name, ", ".join(enum_members)))
 
-    @staticmethod
-    def process_event(json_event, domain_name):
+    def process_event(self, json_event, domain_name):
         event_name = json_event["name"]
 
         json_parameters = json_event.get("parameters")
@@ -299,21 +584,32 @@ class Generator:
                 parameter_name = parameter["name"]
                 backend_js_event_param_list.append("\"%s\"" % parameter_name)
 
-        Generator.backend_js_domain_initializer_list.append("inspectorBackend.registerEvent(\"%s.%s\", [%s]);\n" %
-                                                            (domain_name, event_name, ", ".join(backend_js_event_param_list)))
+        self.domain_initializer_list.append("inspectorBackend.registerEvent(\"%s.%s\", [%s]);\n" %
+                                            (domain_name, event_name, ", ".join(backend_js_event_param_list)))
+
+    @staticmethod
+    def flatten_description(description):
+        return description.replace('\r\n', ' ').replace('\r', ' ').replace('\n', ' ')
 
     @staticmethod
     def format_description(description):
-        description = description.replace('\r\n',
-                                          ' ').replace('\r',
-                                                       ' ').replace('\n', ' ')
+        description = Generator.flatten_description(description)
         description = description.replace('"', '\\"')
         return description
 
-    @staticmethod
-    def convert_json_parameter(json_parameter, domain_name, enum_name):
+    def convert_json_parameter(self, json_parameter, domain_name, enum_name):
+        return self.format_parameter(self.create_parameter(json_parameter, domain_name, enum_name))
+
+    def format_parameter(self, parameter):
+        if self.descriptions == "inline":
+            return json.dumps(parameter)
+        return '{"name": %s, "type": %s, "optional": %s, "description": %s, "typeRef": %s}' % (
+            json.dumps(parameter["name"]), json.dumps(parameter["type"]), json.dumps(parameter["optional"]),
+            self.get_description_expression(parameter["description"]), json.dumps(parameter["typeRef"]))
+
+    def create_parameter(self, json_parameter, domain_name, enum_name):
         json_param_name = json_parameter.get("name") or json_parameter["id"]
-        json_param_description = json_param_description = Generator.format_description(
+        json_param_description = Generator.format_description(
             json_parameter.get("description", ""))
 
         type_ref = json_parameter.get("$ref")
@@ -321,7 +617,7 @@ class Generator:
             type_ref = type_ref if '.' in type_ref else "%s.%s" % (domain_name,
                                                                    type_ref)
         json_ref = ""
-        js_bind_type = resolve_param_raw_type_js(json_parameter, domain_name)
+        js_bind_type = resolve_param_raw_type_js(json_parameter)
 
         if js_bind_type == "array" and 'items' in json_parameter:
             if '$ref' in json_parameter['items']:
@@ -340,53 +636,44 @@ class Generator:
             type_ref = enum_name
 
         optional = json_parameter.get("optional", False)
-        param_dict = {
+        return {
             "name": json_param_name,
             "type": js_bind_type,
             "optional": optional,
             "description": json_param_description,
             "typeRef": type_ref
         }
-        js_param_text = json.dumps(param_dict)
-
-        return js_param_text
 
-    @staticmethod
-    def process_type(json_type, domain_name, type_id):
+    def process_type(self, json_type, domain_name, type_id):
         js_param_list = []
         for json_parameter in json_type:
-            js_param_text = Generator.convert_json_parameter(
+            js_param_text = self.convert_json_parameter(
                 json_parameter, domain_name, None)
             js_param_list.append(js_param_text)
 
         js_parameters_text = ", ".join(js_param_list)
 
-        Generator.backend_js_domain_initializer_list.append(
+        self.domain_initializer_list.append(
             "inspectorBackend.registerType(\"%s.%s\", [%s]);\n" % (
                 domain_name,
                 type_id,
                 js_parameters_text,
             ))
 
-    @staticmethod
-    def process_command(json_command, domain_name):
+    def create_command_parameters(self, json_command, domain_name):
+        parameters = []
+        enum_name = None
+        for json_parameter in json_command.get("parameters", []):
+            if "enum" in json_parameter:
+                enum_name = json_parameter["enumName"]
+            parameters.append(self.create_parameter(json_parameter, domain_name, enum_name))
+        return parameters
+
+    def process_command(self, json_command, domain_name):
         json_command_name = json_command["name"]
         json_command_description = json_command.get("description", "")
-        js_parameters_text = ""
-        if "parameters" in json_command:
-            json_params = json_command["parameters"]
-            js_param_list = []
-            enum_name = None
-            for json_parameter in json_params:
-                if "enum" in json_parameter:
-                    enum_name = "%s.%sRequest%s" % (
-                        domain_name, to_title_case(json_command["name"]),
-                        to_title_case(json_parameter["name"]))
-                js_param_text = Generator.convert_json_parameter(
-                    json_parameter, domain_name, enum_name)
-                js_param_list.append(js_param_text)
-
-            js_parameters_text = ", ".join(js_param_list)
+        js_parameters_text = ", ".join(
+            self.format_parameter(parameter) for parameter in self.create_command_parameters(json_command, domain_name))
 
         backend_js_reply_param_list = []
         if "returns" in json_command:
@@ -395,19 +682,282 @@ class Generator:
                 backend_js_reply_param_list.append("\"%s\"" % json_return_name)
 
         js_reply_list = "[%s]" % ", ".join(backend_js_reply_param_list)
-        json_command_description = Generator.format_description(
-            json_command_description)
-        Generator.backend_js_domain_initializer_list.append(
-            "inspectorBackend.registerCommand(\"%s.%s\", [%s], %s, \"%s\");\n"
+        if self.descriptions == "inline":
+            js_description = "\"%s\"" % Generator.format_description(json_command_description)
+        else:
+            js_description = self.get_description_expression(Generator.flatten_description(json_command_description))
+        self.domain_initializer_list.append(
+            "inspectorBackend.registerCommand(\"%s.%s\", [%s], %s, %s);\n"
             % (domain_name, json_command_name, js_parameters_text,
-               js_reply_list, json_command_description))
+               js_reply_list, js_description))
+
 
+# Emits the same register calls as Generator, but as a table that a small
+# loader replays. Every string is stored once and parameters that appear in
+# several commands or types are shared, which makes the output a lot smaller
+# and cheaper to parse than thousands of object literals.
+class CompactGenerator(Generator):
+    format_name = "compact"
 
-Generator.go()
+    raw_types = ["boolean", "string", "array", "object", "number", "any"]
+    op_codes = {"domain": 0, "enum": 1, "event": 2, "command": 3, "type": 4}
 
-backend_js_file = open(GENERATED_LOCATION, "w+")
+    # Fragments are lists of records of the domain, so they can be cached like
+    # the text fragments of the regular output. Strings are only interned when
+    # the fragments are assembled.
+    def process_domain(self, json_domain):
+        self.domain_initializer_list = []
+        self.visit_domain(json_domain)
+        return [json_domain["domain"], self.domain_initializer_list]
 
-backend_js_file.write(
-    Templates.backend_js.substitute(None, domainInitializers="".join(Generator.backend_js_domain_initializer_list)))
+    @staticmethod
+    def create_parameter_record(parameter):
+        return [parameter["name"], parameter["type"], parameter["optional"], parameter["description"], parameter["typeRef"]]
+
+    def process_enum(self, json_enum, enum_name):
+        self.domain_initializer_list.append(
+            ["enum", enum_name, [fix_camel_case(member) for member in json_enum["enum"]], json_enum["enum"]])
+
+    def process_event(self, json_event, domain_name):
+        self.domain_initializer_list.append([
+            "event",
+            "%s.%s" % (domain_name, json_event["name"]),
+            [parameter["name"] for parameter in json_event.get("parameters") or []],
+        ])
+
+    def process_type(self, json_type, domain_name, type_id):
+        self.domain_initializer_list.append([
+            "type",
+            "%s.%s" % (domain_name, type_id),
+            [
+                CompactGenerator.create_parameter_record(self.create_parameter(json_parameter, domain_name, None))
+                for json_parameter in json_type
+            ],
+        ])
+
+    def process_command(self, json_command, domain_name):
+        # The regular output embeds the description in a string literal, so
+        # quotes are not escaped here.
+        description = Generator.flatten_description(json_command.get("description", ""))
+        self.domain_initializer_list.append([
+            "command",
+            "%s.%s" % (domain_name, json_command["name"]),
+            [
+                CompactGenerator.create_parameter_record(parameter)
+                for parameter in self.create_command_parameters(json_command, domain_name)
+            ],
+            [json_return["name"] for json_return in json_command.get("returns", [])],
+            description,
+        ])
+
+    def assemble(self, fragments, module_path, file_header=Templates.file_header_):
+        strings = {}
+        parameters = {}
+        descriptions = {}
+
+        def intern(value):
+            return strings.setdefault(value, len(strings))
+
+        def intern_description(description):
+            if self.descriptions == "table":
+                return descriptions.setdefault(description, len(descriptions))
+            return intern("" if self.descriptions == "strip" else description)
+
+        def intern_parameter(record):
+            name, raw_type, optional, description, type_ref = record
+            parameter = (intern(name), CompactGenerator.raw_types.index(raw_type), 1 if optional else 0,
+                         intern_description(description), -1 if type_ref is None else intern(type_ref))
+            return parameters.setdefault(parameter, len(parameters))
+
+        def intern_list(values):
+            return [len(values)] + [intern(value) for value in values]
+
+        op_lines = []
+        for domain_name, records in fragments:
+            ops = [CompactGenerator.op_codes["domain"], intern(domain_name)]
+            for record in records:
+                kind = record[0]
+                # All names are qualified with the domain, which the loader
+                # adds back.
+                name = record[1][len(domain_name) + 1:]
+                ops += [CompactGenerator.op_codes[kind], intern(name)]
+                if kind == "enum":
+                    ops += intern_list(record[2]) + intern_list(record[3])
+                elif kind == "event":
+                    ops += intern_list(record[2])
+                elif kind == "command":
+                    ops += [len(record[2])] + [intern_parameter(parameter) for parameter in record[2]]
+                    ops += intern_list(record[3]) + [intern_description(record[4])]
+                elif kind == "type":
+                    ops += [len(record[2])] + [intern_parameter(parameter) for parameter in record[2]]
+            op_lines.append(", ".join(str(op) for op in ops) + ",")
+
+        register_commands_header = self.get_register_commands_header(module_path)
+        if self.descriptions == "table":
+            self.description_tables[module_path + DESCRIPTIONS_EXTENSION] = list(descriptions)
+            register_commands_header += """  /** @param {number} index */
+  const describe = index => descriptions[index] || "";
+"""
+        else:
+            register_commands_header += """  /** @param {number} index */
+  const describe = index => STRINGS[index];
+"""
+
+        return Templates.compact_backend_js.substitute(
+            None,
+            fileHeader=file_header,
+            registerCommandsHeader=register_commands_header,
+            types=json.dumps(CompactGenerator.raw_types),
+            strings="\n".join(json.dumps(value) + "," for value in strings),
+            parameters="\n".join(", ".join(str(field) for field in parameter) + "," for parameter in parameters),
+            ops="\n".join(op_lines))
+
+
+GENERATORS = {
+    Generator.format_name: Generator,
+    CompactGenerator.format_name: CompactGenerator,
+}
 
-backend_js_file.close()
+
+# Returns the contents of InspectorBackendCommands.js for the given protocol.
+# If a `fragment_cache` dictionary is passed, the output of unchanged domains
+# is taken from it and the output of new or changed domains is added to it.
+def generate(json_api, fragment_cache=None, output_format="classic", descriptions="inline"):
+    return GENERATORS[output_format](json_api, fragment_cache, descriptions).go()
+
+
+# Returns the fragment of every domain in an existing regular output, or None if
+# it doesn't exist or wasn't written by this version of the templates.
+def read_output_fragments(output_location):
+    try:
+        with open(output_location, "r") as output_file:
+            contents = output_file.read()
+    except IOError:
+        return None
+    prefix, suffix = Templates.backend_js.substitute(None,
+                                                     fileHeader=Templates.file_header_,
+                                                     registerCommandsHeader=Templates.register_commands_header_,
+                                                     domainInitializers="\0").split("\0")
+    if not contents.startswith(prefix) or not contents.endswith(suffix):
+        return None
+    fragments = {}
+    for fragment in re.split(r"^(?=// \w+\.\n)", contents[len(prefix):-len(suffix)], flags=re.M):
+        if fragment:
+            fragments[fragment[3:fragment.index(".\n")]] = fragment
+    return fragments
+
+
+# Returns the fragments of the existing output for the domains that the change
+# set doesn't affect, so only affected domains are generated again. The change
+# set must describe the changes since the protocol the existing output was
+# generated from.
+def read_unaffected_fragments(change_set, output_location):
+    previous_fragments = read_output_fragments(output_location)
+    if previous_fragments is None:
+        return {}
+    affected_domains = protocol_diff.get_affected_domains(change_set)
+    return {
+        domain_name: fragment
+        for domain_name, fragment in previous_fragments.items() if domain_name not in affected_domains
+    }
+
+
+def load_fragment_cache(cache_location, generator_version):
+    try:
+        with open(cache_location, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, ValueError):
+        return {}
+    if cache.get("version") != generator_version:
+        return {}
+    return cache.get("fragments", {})
+
+
+def save_fragment_cache(cache_location, generator_version, fragments):
+    cache_directory = path.dirname(path.abspath(cache_location))
+    if not path.isdir(cache_directory):
+        os.makedirs(cache_directory)
+    temp_location = "%s.%d.tmp" % (cache_location, os.getpid())
+    with open(temp_location, "w") as cache_file:
+        json.dump({"version": generator_version, "fragments": fragments}, cache_file)
+    os.replace(temp_location, cache_location)
+
+
+def main(cli_args=None):
+    parser = argparse.ArgumentParser(description="Generate InspectorBackendCommands.js from the protocol")
+    parser.add_argument("--input", default=READ_LOCATION, help="Protocol JSON to read")
+    parser.add_argument("--output", default=GENERATED_LOCATION, help="File to write")
+    parser.add_argument("--ir-cache-file", help="Reuse the normalized protocol stored in this file, see protocol_ir.py")
+    parser.add_argument("--cache-file", help="Reuse the output of unchanged domains stored in this file")
+    parser.add_argument("--change-set",
+                        help="Change set written by protocol_diff.py against the protocol the existing output was "
+                        "generated from, to reuse the output of unaffected domains")
+    parser.add_argument("--descriptions",
+                        choices=Generator.description_modes,
+                        default="inline",
+                        help="Keep descriptions inline, move them to a JSON file loaded on demand, or strip them")
+    parser.add_argument("--split-domains",
+                        action="store_true",
+                        help="Write a module per domain next to the output, which becomes an index that loads them")
+    parser.add_argument("--format",
+                        choices=sorted(GENERATORS),
+                        default=Generator.format_name,
+                        help="Emit register calls (classic) or a table and a loader (compact)")
+    opts = parser.parse_args(cli_args)
+
+    json_api = protocol_ir.load_ir(opts.input, opts.ir_cache_file)
+
+    fragment_cache = None
+    if opts.cache_file:
+        generator_version = compute_generator_version()
+        fragment_cache = load_fragment_cache(opts.cache_file, generator_version)
+    reused_fragments = None
+    if opts.change_set and opts.format == Generator.format_name and opts.descriptions == "inline" and not opts.split_domains:
+        with open(opts.change_set, "r") as change_set_file:
+            change_set = json.load(change_set_file)
+        reused_fragments = read_unaffected_fragments(change_set, opts.output)
+    generator = GENERATORS[opts.format](json_api, fragment_cache, opts.descriptions, reused_fragments)
+    module_path = path.splitext(path.basename(opts.output))[0]
+
+    if opts.split_domains:
+        # The modules of InspectorBackendCommands.js go to InspectorBackendCommands/.
+        modules = generator.go_split(module_path)
+        write_split_modules(opts.output, module_path, modules, generator.description_tables)
+    else:
+        generated_file.write_if_changed(opts.output, generator.go(module_path))
+
+    for descriptions_path, descriptions in generator.description_tables.items():
+        descriptions_location = path.join(path.dirname(opts.output), descriptions_path)
+        generated_file.write_if_changed(descriptions_location, json.dumps(descriptions))
+
+    if opts.cache_file:
+        # Only keep the fragments of the current protocol, so the cache doesn't grow
+        # with every roll.
+        save_fragment_cache(opts.cache_file, generator_version,
+                            {digest: fragment_cache[digest]
+                             for digest in generator.used_fragment_digests})
+    return 0
+
+
+# `description_tables` are the description tables that are written next to the
+# modules, see Generator.description_tables.
+def write_split_modules(index_location, modules_directory_name, modules, description_tables):
+    modules_directory = path.join(path.dirname(index_location), modules_directory_name)
+    if not path.isdir(modules_directory):
+        os.makedirs(modules_directory)
+    # Remove the modules and description tables of domains that no longer
+    # exist or no longer use them.
+    for file_name in os.listdir(modules_directory):
+        module_path = "%s/%s" % (modules_directory_name, file_name)
+        is_stale_module = file_name.endswith(".js") and module_path not in modules
+        is_stale_descriptions = file_name.endswith(DESCRIPTIONS_EXTENSION) and module_path not in description_tables
+        if is_stale_module or is_stale_descriptions:
+            os.remove(path.join(modules_directory, file_name))
+
+    for module_path, contents in modules.items():
+        location = index_location if module_path is None else path.join(path.dirname(index_location), module_path)
+        generated_file.write_if_changed(location, contents)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
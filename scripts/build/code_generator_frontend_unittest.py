@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import copy
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+# The modules of this directory import each other as top-level modules.
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+code_generator_frontend = __import__('code_generator_frontend')
+protocol_diff = __import__('protocol_diff')
+protocol_ir = __import__('protocol_ir')
+Templates = code_generator_frontend.Templates
+
+PROTOCOL = {
+    'version': {
+        'major': '1',
+        'minor': '3'
+    },
+    'domains': [{
+        'domain':
+        'Page',
+        'types': [{
+            'id': 'FrameId',
+            'type': 'string'
+        }, {
+            'id': 'TransitionType',
+            'type': 'string',
+            'enum': ['link', 'auto_bookmark']
+        }, {
+            'id':
+            'Frame',
+            'type':
+            'object',
+            'properties': [{
+                'name': 'id',
+                'description': 'Frame "unique" identifier.',
+                '$ref': 'FrameId'
+            }, {
+                'name': 'state',
+                'type': 'string',
+                'enum': ['loading', 'done']
+            }, {
+                'name': 'childIds',
+                'optional': True,
+                'type': 'array',
+                'items': {
+                    '$ref': 'FrameId'
+                }
+            }]
+        }, {
+            'id': 'FrameIds',
+            'type': 'array',
+            'items': {
+                '$ref': 'FrameId'
+            }
+        }],
+        'commands': [{
+            'name':
+            'navigate',
+            'description':
+            'Navigates the page\nto the given "url".',
+            'parameters': [{
+                'name': 'url',
+                'description': 'URL to navigate to.',
+                'type': 'string'
+            }, {
+                'name': 'transitionType',
+                'optional': True,
+                '$ref': 'TransitionType'
+            }, {
+                'name': 'referrerPolicy',
+                'optional': True,
+                'type': 'string',
+                'enum': ['origin', 'noReferrer']
+            }],
+            'returns': [{
+                'name': 'frameId',
+                '$ref': 'FrameId'
+            }]
+        }, {
+            'name': 'reload',
+            'description': 'URL to navigate to.'
+        }],
+        'events': [{
+            'name':
+            'frameNavigated',
+            'parameters': [{
+                'name': 'frame',
+                '$ref': 'Frame'
+            }, {
+                'name': 'type',
+                'type': 'string',
+                'enum': ['Navigation', 'BackForwardCacheRestore']
+            }]
+        }]
+    }, {
+        'domain':
+        'DOM',
+        'types': [{
+            'id':
+            'Node',
+            'type':
+            'object',
+            'properties': [{
+                'name': 'frameId',
+                'optional': True,
+                '$ref': 'Page.FrameId'
+            }]
+        }],
+        'commands': [{
+            'name':
+            'getFrameOwner',
+            'parameters': [{
+                'name': 'frameId',
+                '$ref': 'Page.FrameId'
+            }],
+            'returns': [{
+                'name': 'node',
+                '$ref': 'Node'
+            }]
+        }]
+    }, {
+        'domain': 'Console',
+        'commands': [{
+            'name': 'enable'
+        }]
+    }, {
+        'domain':
+        'Log',
+        'commands': [{
+            'name': 'clear',
+            'description': 'Clears the log.'
+        }, {
+            'name':
+            'startViolationsReport',
+            'parameters': [{
+                'name': 'threshold',
+                'type': 'number'
+            }, {
+                'name': 'enabled',
+                'type': 'boolean'
+            }]
+        }]
+    }]
+}
+
+# The register calls that the generator wrote for PROTOCOL before it supported
+# caching and other output formats.
+BASELINE_DOMAIN_INITIALIZERS = (
+    '// Page.\n'
+    'inspectorBackend.registerEnum("Page.TransitionType", '
+    '{Link: "link", Auto_bookmark: "auto_bookmark"});\n'
+    'inspectorBackend.registerEnum("Page.FrameState", '
+    '{Loading: "loading", Done: "done"});\n'
+    'inspectorBackend.registerEnum("Page.FrameNavigatedEventType", '
+    '{Navigation: "Navigation", '
+    'BackForwardCacheRestore: "BackForwardCacheRestore"});\n'
+    'inspectorBackend.registerEvent("Page.frameNavigated", '
+    '["frame", "type"]);\n'
+    'inspectorBackend.registerEnum("Page.NavigateRequestReferrerPolicy", '
+    '{Origin: "origin", NoReferrer: "noReferrer"});\n'
+    'inspectorBackend.registerCommand("Page.navigate", '
+    '[{"name": "url", "type": "string", "optional": false, '
+    '"description": "URL to navigate to.", "typeRef": null}, '
+    '{"name": "transitionType", "type": "string", '
+    '"optional": true, "description": "", '
+    '"typeRef": "Page.TransitionType"}, '
+    '{"name": "referrerPolicy", "type": "string", '
+    '"optional": true, "description": "", '
+    '"typeRef": "Page.NavigateRequestReferrerPolicy"}], '
+    '["frameId"], "Navigates the page to the given \\"url\\".");\n'
+    'inspectorBackend.registerCommand("Page.reload", [], [], '
+    '"URL to navigate to.");\n'
+    'inspectorBackend.registerType("Page.Frame", [{"name": "id", '
+    '"type": "string", "optional": false, '
+    '"description": "Frame \\\\\\"unique\\\\\\" identifier.", '
+    '"typeRef": "Page.FrameId"}, {"name": "state", '
+    '"type": "string", "optional": false, "description": "", '
+    '"typeRef": null}, {"name": "childIds", "type": "array", '
+    '"optional": true, "description": "", "typeRef": "Page.FrameId"}]);\n'
+    'inspectorBackend.registerType("Page.FrameIds", '
+    '[{"name": "FrameIds", "type": "array", "optional": false, '
+    '"description": "", "typeRef": "Page.FrameId"}]);\n'
+    '\n'
+    '// DOM.\n'
+    'inspectorBackend.registerCommand("DOM.getFrameOwner", '
+    '[{"name": "frameId", "type": "string", "optional": false, '
+    '"description": "", "typeRef": "Page.FrameId"}], ["node"], "");\n'
+    'inspectorBackend.registerType("DOM.Node", '
+    '[{"name": "frameId", "type": "string", "optional": true, '
+    '"description": "", "typeRef": "Page.FrameId"}]);\n'
+    '\n'
+    '// Log.\n'
+    'inspectorBackend.registerCommand("Log.clear", [], [], '
+    '"Clears the log.");\n'
+    'inspectorBackend.registerCommand("Log.startViolationsReport", '
+    '[{"name": "threshold", "type": "number", "optional": false, '
+    '"description": "", "typeRef": null}, {"name": "enabled", '
+    '"type": "boolean", "optional": false, "description": "", '
+    '"typeRef": null}], [], "");\n'
+    '\n')
+
+
+def get_domain(protocol, domain_name):
+    return next(json_domain for json_domain in protocol['domains']
+                if json_domain['domain'] == domain_name)
+
+
+# Returns the register calls without descriptions.
+def strip_descriptions(calls):
+    calls = copy.deepcopy(calls)
+    for call in calls:
+        if call[0] == 'Command':
+            call[4] = ''
+        if call[0] in ['Command', 'Type']:
+            for parameter in call[2]:
+                parameter['description'] = ''
+    return calls
+
+
+def get_baseline_output():
+    return Templates.backend_js.substitute(
+        None,
+        fileHeader=Templates.file_header_,
+        registerCommandsHeader=Templates.register_commands_header_,
+        domainInitializers=BASELINE_DOMAIN_INITIALIZERS)
+
+
+# Returns the arguments of the register calls of a classic output. The
+# descriptions of an output with a description table are looked up in
+# `descriptions`.
+def get_register_calls(output, descriptions=None):
+    if descriptions is not None:
+        description_offset = 0
+
+        def look_up_description(match):
+            return json.dumps(descriptions[description_offset +
+                                           int(match.group(1))])
+
+        lines = []
+        for line in output.split('\n'):
+            match = re.match(r'descriptionOffset = (\d+);$', line)
+            if match:
+                description_offset = int(match.group(1))
+            lines.append(
+                re.sub(r'description\((\d+)\)', look_up_description, line))
+        output = '\n'.join(lines)
+    calls = []
+    for kind, arguments in re.findall(
+            r'^inspectorBackend\.register(\w+)\((.*)\);$', output, re.M):
+        if kind == 'Enum':
+            name, members = re.match(r'"(.*?)", {(.*)}$', arguments).groups()
+            calls.append(
+                [kind, name,
+                 dict(re.findall(r'(\w+): "(.*?)"', members))])
+        else:
+            calls.append([kind] + json.loads('[%s]' % arguments))
+    return calls
+
+
+def get_compact_array(output, name):
+    contents = re.search(r'^const %s = \[\n(.*?)\];$' % name, output,
+                         re.M | re.S).group(1)
+    return json.loads('[%s]' % contents.strip().rstrip(','))
+
+
+# Returns the arguments of the register calls that the loader of a compact
+# output makes, see Templates.compact_backend_js.
+def get_compact_register_calls(output, descriptions=None):
+    types = json.loads(
+        re.search(r'^const TYPES = (.*);$', output, re.M).group(1))
+    strings = get_compact_array(output, 'STRINGS')
+    parameters = get_compact_array(output, 'PARAMETERS')
+    ops = get_compact_array(output, 'OPS')
+    parameter_size = 5
+    position = 0
+    domain = ''
+
+    def describe(index):
+        return strings[index] if descriptions is None else descriptions[index]
+
+    def read():
+        nonlocal position
+        position += 1
+        return ops[position - 1]
+
+    def read_name():
+        return domain + '.' + strings[read()]
+
+    def read_strings():
+        return [strings[read()] for _ in range(read())]
+
+    def read_parameters():
+        records = []
+        for _ in range(read()):
+            offset = read() * parameter_size
+            name, raw_type, optional, description, type_ref = parameters[
+                offset:offset + parameter_size]
+            type_ref = None if type_ref == -1 else strings[type_ref]
+            records.append({
+                'name': strings[name],
+                'type': types[raw_type],
+                'optional': optional == 1,
+                'description': describe(description),
+                'typeRef': type_ref,
+            })
+        return records
+
+    op_codes = code_generator_frontend.CompactGenerator.op_codes
+    calls = []
+    while position < len(ops):
+        op = read()
+        if op == op_codes['domain']:
+            domain = strings[read()]
+        elif op == op_codes['enum']:
+            name = read_name()
+            calls.append(
+                ['Enum', name,
+                 dict(zip(read_strings(), read_strings()))])
+        elif op == op_codes['event']:
+            calls.append(['Event', read_name(), read_strings()])
+        elif op == op_codes['command']:
+            calls.append([
+                'Command',
+                read_name(),
+                read_parameters(),
+                read_strings(),
+                describe(read())
+            ])
+        elif op == op_codes['type']:
+            calls.append(['Type', read_name(), read_parameters()])
+    return calls
+
+
+class CodeGeneratorFrontendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.protocol = copy.deepcopy(PROTOCOL)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def get_location(self, file_name):
+        return path.join(self.directory, file_name)
+
+
+class FragmentCacheTestCase(CodeGeneratorFrontendTestCase):
+    def test_output_matches_baseline(self):
+        self.assertEqual(code_generator_frontend.generate(PROTOCOL),
+                         get_baseline_output())
+
+    def test_output_of_cached_ir_matches_baseline(self):
+        protocol_location = self.get_location('protocol.json')
+        with open(protocol_location, 'w', encoding='utf-8') as protocol_file:
+            json.dump(PROTOCOL, protocol_file)
+        ir_cache_location = self.get_location('protocol_ir.json')
+        protocol_ir.load_ir(protocol_location, ir_cache_location)
+        self.assertEqual(
+            code_generator_frontend.generate(
+                protocol_ir.load_ir(protocol_location, ir_cache_location)),
+            get_baseline_output())
+
+    def test_cached_output_matches_baseline(self):
+        fragment_cache = {}
+        self.assertEqual(
+            code_generator_frontend.generate(PROTOCOL, fragment_cache),
+            get_baseline_output())
+        # Console is not generated.
+        self.assertEqual(len(fragment_cache), 3)
+
+        generator = code_generator_frontend.Generator(PROTOCOL, fragment_cache)
+        self.assertEqual(generator.go(), get_baseline_output())
+        self.assertEqual(generator.cache_hits, 3)
+
+    def test_cache_only_reuses_unaffected_domains(self):
+        fragment_cache = {}
+        code_generator_frontend.generate(PROTOCOL, fragment_cache)
+        # DOM refers to Page.FrameId, so it changes with it.
+        get_domain(self.protocol, 'Page')['types'][0]['type'] = 'integer'
+
+        generator = code_generator_frontend.Generator(self.protocol,
+                                                      fragment_cache)
+        self.assertEqual(generator.go(),
+                         code_generator_frontend.generate(self.protocol))
+        self.assertEqual(generator.cache_hits, 1)
+        self.assertEqual(len(generator.used_fragment_digests), 3)
+        self.assertEqual(len(fragment_cache), 5)
+
+    def test_cache_is_specific_to_the_output_mode(self):
+        fragment_cache = {}
+        code_generator_frontend.generate(PROTOCOL, fragment_cache)
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      fragment_cache,
+                                                      descriptions='strip')
+        generator.go()
+        self.assertEqual(generator.cache_hits, 0)
+
+    def test_persists_fragment_cache_per_generator_version(self):
+        cache_location = self.get_location('cache/fragments.json')
+        fragment_cache = {}
+        code_generator_frontend.generate(PROTOCOL, fragment_cache)
+        code_generator_frontend.save_fragment_cache(cache_location, 'v1',
+                                                    fragment_cache)
+        self.assertEqual(
+            code_generator_frontend.load_fragment_cache(cache_location, 'v1'),
+            fragment_cache)
+        self.assertEqual(
+            code_generator_frontend.load_fragment_cache(cache_location, 'v2'),
+            {})
+        self.assertEqual(
+            code_generator_frontend.load_fragment_cache(
+                self.get_location('missing.json'), 'v1'), {})
+
+    def test_reads_fragments_of_the_output(self):
+        output_location = self.get_location('InspectorBackendCommands.js')
+        with open(output_location, 'w', encoding='utf-8') as output_file:
+            output_file.write(get_baseline_output())
+        fragments = code_generator_frontend.read_output_fragments(
+            output_location)
+        self.assertEqual(list(fragments), ['Page', 'DOM', 'Log'])
+        self.assertEqual(''.join(fragments.values()),
+                         BASELINE_DOMAIN_INITIALIZERS)
+
+    def test_ignores_outputs_of_other_templates(self):
+        self.assertIsNone(
+            code_generator_frontend.read_output_fragments(
+                self.get_location('missing.js')))
+        output_location = self.get_location('InspectorBackendCommands.js')
+        with open(output_location, 'w', encoding='utf-8') as output_file:
+            output_file.write(
+                code_generator_frontend.generate(PROTOCOL,
+                                                 output_format='compact'))
+        self.assertIsNone(
+            code_generator_frontend.read_output_fragments(output_location))
+
+    def test_reuses_fragments_of_unaffected_domains(self):
+        output_location = self.get_location('InspectorBackendCommands.js')
+        # Marks the fragments of the existing output to tell them apart.
+        with open(output_location, 'w', encoding='utf-8') as output_file:
+            output_file.write(
+                re.sub(r'^(// \w+\.\n)',
+                       r'\1/* Reused */\n',
+                       get_baseline_output(),
+                       flags=re.M))
+        get_domain(self.protocol, 'Page')['types'][0]['type'] = 'integer'
+        change_set = protocol_diff.diff_protocols(PROTOCOL, self.protocol)
+
+        reused_fragments = code_generator_frontend.read_unaffected_fragments(
+            change_set, output_location)
+        self.assertEqual(list(reused_fragments), ['Log'])
+        output = code_generator_frontend.Generator(
+            self.protocol, reused_fragments=reused_fragments).go()
+        self.assertEqual(
+            output,
+            code_generator_frontend.generate(self.protocol).replace(
+                '// Log.\n', '// Log.\n/* Reused */\n'))
+
+
+class CompactOutputTestCase(CodeGeneratorFrontendTestCase):
+    def test_compact_output_matches_baseline(self):
+        self.assertEqual(
+            get_compact_register_calls(
+                code_generator_frontend.generate(PROTOCOL,
+                                                 output_format='compact')),
+            get_register_calls(get_baseline_output()))
+
+    def test_cached_compact_output_matches_uncached_output(self):
+        fragment_cache = {}
+        output = code_generator_frontend.generate(PROTOCOL,
+                                                  fragment_cache,
+                                                  output_format='compact')
+        generator = code_generator_frontend.CompactGenerator(
+            PROTOCOL, fragment_cache)
+        self.assertEqual(generator.go(), output)
+        self.assertEqual(generator.cache_hits, 3)
+
+    def test_interns_strings_and_parameters(self):
+        output = code_generator_frontend.generate(PROTOCOL,
+                                                  output_format='compact')
+        strings = get_compact_array(output, 'STRINGS')
+        self.assertEqual(len(strings), len(set(strings)))
+        self.assertEqual(strings.count('URL to navigate to.'), 1)
+        parameters = get_compact_array(output, 'PARAMETERS')
+        records = [
+            tuple(parameters[offset:offset + 5])
+            for offset in range(0, len(parameters), 5)
+        ]
+        self.assertEqual(len(records), len(set(records)))
+
+
+class DescriptionsTestCase(CodeGeneratorFrontendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.baseline_calls = get_register_calls(get_baseline_output())
+
+    def test_inline_descriptions_match_baseline(self):
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      descriptions='inline')
+        self.assertEqual(generator.go(), get_baseline_output())
+        self.assertEqual(generator.description_tables, {})
+
+    def test_description_table_matches_baseline(self):
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      descriptions='table')
+        output = generator.go()
+        self.assertEqual(list(generator.description_tables),
+                         ['InspectorBackendCommands.descriptions.json'])
+        descriptions = generator.description_tables[
+            'InspectorBackendCommands.descriptions.json']
+        self.assertIn(
+            'new URL("./InspectorBackendCommands.descriptions.json", '
+            'import.meta.url)', output)
+        self.assertNotIn('URL to navigate to.', output)
+        # Every domain stores a description once.
+        self.assertEqual(descriptions.count('URL to navigate to.'), 1)
+        self.assertEqual(get_register_calls(output, descriptions),
+                         self.baseline_calls)
+
+    def test_description_table_entries_are_per_module(self):
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      descriptions='table')
+        modules = generator.go_split('InspectorBackendCommands')
+        self.assertEqual(sorted(generator.description_tables), [
+            'InspectorBackendCommands/DOM.descriptions.json',
+            'InspectorBackendCommands/Log.descriptions.json',
+            'InspectorBackendCommands/Page.descriptions.json',
+        ])
+        self.assertEqual(
+            get_register_calls(
+                modules['InspectorBackendCommands/Log.js'],
+                generator.description_tables[
+                    'InspectorBackendCommands/Log.descriptions.json']),
+            self.baseline_calls[-2:])
+
+    def test_cached_description_table_matches_uncached_output(self):
+        fragment_cache = {}
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      fragment_cache,
+                                                      descriptions='table')
+        output = generator.go()
+        cached_generator = code_generator_frontend.Generator(
+            PROTOCOL, fragment_cache, descriptions='table')
+        self.assertEqual(cached_generator.go(), output)
+        self.assertEqual(cached_generator.cache_hits, 3)
+        self.assertEqual(cached_generator.description_tables,
+                         generator.description_tables)
+
+    def test_stripped_descriptions_match_baseline(self):
+        generator = code_generator_frontend.Generator(PROTOCOL,
+                                                      descriptions='strip')
+        output = generator.go()
+        self.assertNotIn('URL to navigate to.', output)
+        self.assertEqual(generator.description_tables, {})
+        self.assertEqual(get_register_calls(output),
+                         strip_descriptions(self.baseline_calls))
+
+    def test_compact_description_table_matches_baseline(self):
+        generator = code_generator_frontend.CompactGenerator(
+            PROTOCOL, descriptions='table')
+        output = generator.go()
+        descriptions = generator.description_tables[
+            'InspectorBackendCommands.descriptions.json']
+        self.assertNotIn('URL to navigate to.', output)
+        self.assertEqual(get_compact_register_calls(output, descriptions),
+                         self.baseline_calls)
+
+    def test_compact_stripped_descriptions_match_baseline(self):
+        output = code_generator_frontend.generate(PROTOCOL,
+                                                  output_format='compact',
+                                                  descriptions='strip')
+        self.assertNotIn('URL to navigate to.', output)
+        self.assertEqual(get_compact_register_calls(output),
+                         strip_descriptions(self.baseline_calls))
+
+
+class SplitModulesTestCase(CodeGeneratorFrontendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.modules = code_generator_frontend.Generator(PROTOCOL).go_split(
+            'InspectorBackendCommands')
+
+    def test_modules_match_baseline(self):
+        self.assertEqual(sorted(self.modules, key=str), [
+            'InspectorBackendCommands/DOM.js',
+            'InspectorBackendCommands/Log.js',
+            'InspectorBackendCommands/Page.js',
+            None,
+        ])
+        calls = []
+        for domain_name in ['Page', 'DOM', 'Log']:
+            calls += get_register_calls(
+                self.modules['InspectorBackendCommands/%s.js' % domain_name])
+        self.assertEqual(calls, get_register_calls(get_baseline_output()))
+
+    def test_modules_import_the_typedef_of_the_index(self):
+        self.assertTrue(self.modules[None].startswith(Templates.file_header_))
+        module = self.modules['InspectorBackendCommands/Log.js']
+        self.assertTrue(module.startswith(Templates.copyright_header_))
+        self.assertIn(
+            '\nimport {InspectorBackendAPI} from '
+            '"../InspectorBackendCommands.js";\n', module)
+        self.assertNotIn('@typedef', module)
+
+    def test_index_registers_dependencies(self):
+        self.assertIn(
+            '  "DOM": () => import("./InspectorBackendCommands/DOM.js"),',
+            self.modules[None])
+        self.assertIn('  "DOM": ["Page"],', self.modules[None])
+        self.assertIn('  "Log": [],', self.modules[None])
+
+
+class MainTestCase(CodeGeneratorFrontendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.protocol_location = self.get_location('protocol.json')
+        self.write_protocol(PROTOCOL)
+        self.output_location = self.get_location(
+            'generated/InspectorBackendCommands.js')
+        os.makedirs(path.dirname(self.output_location))
+
+    def write_protocol(self, protocol):
+        with open(self.protocol_location, 'w',
+                  encoding='utf-8') as protocol_file:
+            json.dump(protocol, protocol_file)
+
+    def run_main(self, *args):
+        self.assertEqual(
+            code_generator_frontend.main([
+                '--input', self.protocol_location, '--output',
+                self.output_location
+            ] + list(args)), 0)
+
+    def get_mtimes(self):
+        mtimes = {}
+        for directory, _, file_names in os.walk(
+                self.get_location('generated')):
+            for file_name in file_names:
+                location = path.join(directory, file_name)
+                mtimes[path.relpath(
+                    location, self.directory)] = os.stat(location).st_mtime_ns
+        return mtimes
+
+    def reset_mtimes(self):
+        for location in self.get_mtimes():
+            os.utime(self.get_location(location), ns=(0, 0))
+
+    def test_writes_description_table_if_changed(self):
+        self.run_main('--descriptions', 'table')
+        with open(self.get_location(
+                'generated/InspectorBackendCommands.descriptions.json'),
+                  encoding='utf-8') as descriptions_file:
+            self.assertIn('URL to navigate to.', json.load(descriptions_file))
+        self.reset_mtimes()
+        self.run_main('--descriptions', 'table')
+        self.assertEqual(set(self.get_mtimes().values()), {0})
+
+    def test_writes_split_modules_if_changed(self):
+        self.run_main('--descriptions', 'table', '--split-domains')
+        self.assertEqual(sorted(self.get_mtimes()), [
+            'generated/InspectorBackendCommands.js',
+            'generated/InspectorBackendCommands/DOM.descriptions.json',
+            'generated/InspectorBackendCommands/DOM.js',
+            'generated/InspectorBackendCommands/Log.descriptions.json',
+            'generated/InspectorBackendCommands/Log.js',
+            'generated/InspectorBackendCommands/Page.descriptions.json',
+            'generated/InspectorBackendCommands/Page.js',
+        ])
+        self.reset_mtimes()
+        self.run_main('--descriptions', 'table', '--split-domains')
+        self.assertEqual(set(self.get_mtimes().values()), {0})
+
+    def test_removes_stale_split_modules(self):
+        self.run_main('--descriptions', 'table', '--split-domains')
+        self.protocol['domains'].remove(get_domain(self.protocol, 'Log'))
+        self.write_protocol(self.protocol)
+        self.run_main('--split-domains')
+        self.assertEqual(sorted(self.get_mtimes()), [
+            'generated/InspectorBackendCommands.js',
+            'generated/InspectorBackendCommands/DOM.js',
+            'generated/InspectorBackendCommands/Page.js',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,8 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
-import datetime
+import argparse
+import io
 import json
 import os
 import sys
@@ -15,6 +16,8 @@ sys.path.append(PYJSON5_DIR)
 
 import json5  # pylint: disable=import-error
 
+import generated_file
+
 ROOT_DIRECTORY = path.join(path.dirname(__file__), '..', '..')
 GENERATED_LOCATION = path.join(ROOT_DIRECTORY, 'front_end', 'generated', 'ARIAProperties.js')
 READ_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'renderer', 'core', 'html', 'aria_properties.json5')
@@ -25,12 +28,24 @@ def properties_from_file(file_name):
         return properties
 
 
-ARIA_PROPERTIES = properties_from_file(READ_LOCATION)
-now = datetime.datetime.now()
-with open(GENERATED_LOCATION, "w+") as f:
-    f.write('// Copyright %d The Chromium Authors. All rights reserved.\n' % now.year)
+def main(cli_args=None):
+    parser = argparse.ArgumentParser(description="Generate ARIAProperties.js")
+    parser.add_argument("--input", default=READ_LOCATION, help="aria_properties.json5 to read")
+    parser.add_argument("--output", default=GENERATED_LOCATION, help="Location of the generated file")
+    opts = parser.parse_args(cli_args)
+
+    aria_properties = properties_from_file(opts.input)
+    year = generated_file.get_copyright_year(opts.output)
+    f = io.StringIO()
+    f.write('// Copyright %d The Chromium Authors. All rights reserved.\n' % year)
     f.write('// Use of this source code is governed by a BSD-style license that can be\n')
     f.write('// found in the LICENSE file.\n')
     f.write('\n')
     f.write("export const config = %s;\n" %
-            json.dumps(ARIA_PROPERTIES, sort_keys=True, indent=1))
+            json.dumps(aria_properties, sort_keys=True, indent=1))
+    generated_file.write_if_changed(opts.output, f.getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@
 # We do this in order to get tyep-saftey of the JSON's content vs the
 # deprecations defined in CDP.
 
-import datetime
+import argparse
+import io
 import json
 import os
 import sys
@@ -20,6 +21,8 @@ sys.path.append(PYJSON5_DIR)
 
 import json5  # pylint: disable=import-error
 
+import generated_file
+
 ROOT_DIRECTORY = path.join(path.dirname(__file__), '..', '..')
 GENERATED_LOCATION = path.join(ROOT_DIRECTORY, 'front_end', 'generated',
                                'Deprecation.ts')
@@ -68,11 +71,21 @@ def deprecations_from_file(file_name):
     return meta, ui_strings
 
 
-meta, ui_strings = deprecations_from_file(READ_LOCATION)
-now = datetime.datetime.now()
-with open(GENERATED_LOCATION, mode="w+") as f:
+def main(cli_args=None):
+    parser = argparse.ArgumentParser(description="Generate Deprecation.ts")
+    parser.add_argument("--input",
+                        default=READ_LOCATION,
+                        help="deprecation.json5 to read")
+    parser.add_argument("--output",
+                        default=GENERATED_LOCATION,
+                        help="Location of the generated file")
+    opts = parser.parse_args(cli_args)
+
+    meta, ui_strings = deprecations_from_file(opts.input)
+    year = generated_file.get_copyright_year(opts.output)
+    f = io.StringIO()
     f.write("// Copyright %d The Chromium Authors. All rights reserved.\n" %
-            now.year)
+            year)
     f.write(
         "// Use of this source code is governed by a BSD-style license that can be\n"
     )
@@ -99,3 +112,9 @@ with open(GENERATED_LOCATION, mode="w+") as f:
     f.write(
         "export const DEPRECATIONS_METADATA: Partial<Record<string, DeprecationDescriptor>> = %s;\n"
         % json.dumps(meta, sort_keys=True, indent=2))
+    generated_file.write_if_changed(opts.output, f.getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,7 +27,8 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import datetime
+import argparse
+import io
 import json
 import os
 import sys
@@ -38,6 +39,8 @@ sys.path.append(PYJSON5_DIR)
 
 import json5  # pylint: disable=import-error
 
+import generated_file
+
 ROOT_DIRECTORY = path.join(path.dirname(__file__), '..', '..')
 GENERATED_LOCATION = path.join(ROOT_DIRECTORY, 'front_end', 'generated', 'SupportedCSSProperties.js')
 READ_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'renderer', 'core', 'css', 'css_properties.json5')
@@ -101,10 +104,16 @@ def properties_from_file(file_name):
     return properties, property_values, aliases_for
 
 
-properties, property_values, aliases_for = properties_from_file(READ_LOCATION)
-now = datetime.datetime.now()
-with open(GENERATED_LOCATION, "w+") as f:
-    f.write('// Copyright %d The Chromium Authors. All rights reserved.\n' % now.year)
+def main(cli_args=None):
+    parser = argparse.ArgumentParser(description="Generate SupportedCSSProperties.js")
+    parser.add_argument("--input", default=READ_LOCATION, help="css_properties.json5 to read")
+    parser.add_argument("--output", default=GENERATED_LOCATION, help="Location of the generated file")
+    opts = parser.parse_args(cli_args)
+
+    properties, property_values, aliases_for = properties_from_file(opts.input)
+    year = generated_file.get_copyright_year(opts.output)
+    f = io.StringIO()
+    f.write('// Copyright %d The Chromium Authors. All rights reserved.\n' % year)
     f.write('// Use of this source code is governed by a BSD-style license that can be\n')
     f.write('// found in the LICENSE file.\n')
     f.write('\n')
@@ -115,3 +124,9 @@ with open(GENERATED_LOCATION, "w+") as f:
             json.dumps(property_values, sort_keys=True, indent=1))
     f.write("export const generatedAliasesFor = new Map(%s);\n" %
             json.dumps(aliases_for, sort_keys=True, indent=1))
+    generated_file.write_if_changed(opts.output, f.getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Helpers to write the files in front_end/generated.
+
+The generators render a file in memory and only write it if its contents
+changed, so that regenerating with unchanged inputs doesn't touch the files
+and doesn't make the actions that read them dirty. The year in the copyright
+header is taken from the existing file, so that the output doesn't depend on
+when it is generated.
+"""
+
+import datetime
+import os
+import re
+from os import path
+
+COPYRIGHT_PATTERN = re.compile(r'Copyright (?:\(c\) )?(\d{4}) ')
+# The copyright header is on one of the first lines of the file.
+HEADER_LINES = 5
+
+
+# Returns the year of the copyright header of the file at `location`, or the
+# current year for new files.
+def get_copyright_year(location):
+    try:
+        with open(location, 'r', encoding='utf-8') as existing_file:
+            for _ in range(HEADER_LINES):
+                match = COPYRIGHT_PATTERN.search(existing_file.readline())
+                if match:
+                    return int(match.group(1))
+    except (IOError, UnicodeDecodeError):
+        pass
+    return datetime.datetime.now().year
+
+
+# Writes `contents` to `location` unless the file already has these contents.
+# The file is replaced atomically, so readers never see a partial file.
+# Returns whether the file was written.
+def write_if_changed(location, contents):
+    try:
+        with open(location, 'r', encoding='utf-8') as existing_file:
+            if existing_file.read() == contents:
+                return False
+    except (IOError, UnicodeDecodeError):
+        pass
+
+    temp_location = '%s.%d.tmp' % (location, os.getpid())
+    try:
+        with open(temp_location, 'w', encoding='utf-8') as temp_file:
+            temp_file.write(contents)
+        os.replace(temp_location, location)
+    finally:
+        if path.exists(temp_location):
+            os.remove(temp_location)
+    return True
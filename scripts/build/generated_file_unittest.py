@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# The modules of this directory import each other as top-level modules.
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+generated_file = __import__('generated_file')
+
+
+class GeneratedFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, 'generated.js')
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def read(self):
+        with open(self.location, encoding='utf-8') as fp:
+            return fp.read()
+
+    def get_mtime(self):
+        return os.stat(self.location).st_mtime_ns
+
+    def test_writes_missing_file(self):
+        self.assertTrue(generated_file.write_if_changed(self.location, 'a'))
+        self.assertEqual(self.read(), 'a')
+
+    def test_writes_changed_file(self):
+        generated_file.write_if_changed(self.location, 'a')
+        self.assertTrue(generated_file.write_if_changed(self.location, 'b'))
+        self.assertEqual(self.read(), 'b')
+
+    def test_keeps_unchanged_file(self):
+        generated_file.write_if_changed(self.location, 'a')
+        os.utime(self.location, ns=(1000, 1000))
+        self.assertFalse(generated_file.write_if_changed(self.location, 'a'))
+        self.assertEqual(self.get_mtime(), 1000)
+
+    def test_leaves_no_temporary_files(self):
+        generated_file.write_if_changed(self.location, 'a')
+        generated_file.write_if_changed(self.location, 'b')
+        self.assertEqual(os.listdir(self.directory), ['generated.js'])
+
+    def test_keeps_copyright_year(self):
+        generated_file.write_if_changed(
+            self.location, '// Copyright 2020 The Chromium Authors. '
+            'All rights reserved.\n')
+        self.assertEqual(generated_file.get_copyright_year(self.location),
+                         2020)
+
+    def test_keeps_copyright_year_after_other_lines(self):
+        generated_file.write_if_changed(
+            self.location, '#!/usr/bin/env node\n'
+            '\n'
+            '// Copyright (c) 2019 The Chromium Authors. '
+            'All rights reserved.\n')
+        self.assertEqual(generated_file.get_copyright_year(self.location),
+                         2019)
+
+    def test_uses_current_year_for_missing_file(self):
+        self.assertEqual(generated_file.get_copyright_year(self.location),
+                         datetime.datetime.now().year)
+
+    def test_uses_current_year_without_copyright_header(self):
+        generated_file.write_if_changed(self.location, 'export {};\n')
+        self.assertEqual(generated_file.get_copyright_year(self.location),
+                         datetime.datetime.now().year)
+
+
+if __name__ == '__main__':
+    unittest.main()
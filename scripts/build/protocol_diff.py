@@ -0,0 +1,215 @@
+#!/usr/bin/env vpython3
+#
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Compares two versions of a protocol.
+
+The change set lists the added, removed and changed domains, types, commands,
+events and enums, plus the changes that break existing clients, e.g. removed
+commands or new required parameters. Both protocols are normalized with
+protocol_ir.py first, so a domain also counts as changed when the JSON type of
+a type it refers to in another domain changes.
+
+code_generator_frontend.py uses the change set to only regenerate the domains
+that changed, and roll_deps.py adds the summary of breaking changes to the
+description of the roll.
+
+Example:
+  protocol_diff.py old/browser_protocol.json new/browser_protocol.json
+"""
+
+import argparse
+import json
+import sys
+
+import protocol_ir
+
+CATEGORIES = ['domains', 'types', 'commands', 'events', 'enums']
+
+
+def get_members(ir, category):
+    if category == 'domains':
+        return {
+            json_domain['domain']: json_domain
+            for json_domain in ir['domains']
+        }
+    if category == 'enums':
+        return ir['enumIndex']
+    index = ir['%sIndex' % category[:-1]]
+    return {
+        name: ir['domains'][domain_position][category][position]
+        for name, (domain_position, position) in index.items()
+    }
+
+
+def describe_type(member):
+    if '$resolvedRef' in member:
+        return member['$resolvedRef']
+    if member.get('type') == 'array':
+        return 'array of %s' % describe_type(member.get('items', {}))
+    return member.get('type', 'any')
+
+
+def is_experimental(*members):
+    return any(member.get('experimental') for member in members)
+
+
+# Returns the breaking changes between two lists of parameters, properties or
+# return values of `owner`. `required_is_breaking` is set for inputs of the
+# protocol (command parameters), where new required members break clients.
+# For outputs, members that become optional or are removed break clients.
+# Removed enum values are reported with the enums.
+def diff_members(owner, kind, old_members, new_members, required_is_breaking):
+    breaking = []
+    old_by_name = {member['name']: member for member in old_members or []}
+    new_by_name = {member['name']: member for member in new_members or []}
+    for name, old_member in old_by_name.items():
+        if name not in new_by_name:
+            breaking.append('Removed %s %s of %s' % (kind, name, owner))
+            continue
+        new_member = new_by_name[name]
+        if describe_type(old_member) != describe_type(new_member):
+            breaking.append('Changed type of %s %s of %s from %s to %s' %
+                            (kind, name, owner, describe_type(old_member),
+                             describe_type(new_member)))
+        old_optional = old_member.get('optional', False)
+        new_optional = new_member.get('optional', False)
+        if required_is_breaking and old_optional and not new_optional:
+            breaking.append('Made %s %s of %s required' % (kind, name, owner))
+        if not required_is_breaking and not old_optional and new_optional:
+            breaking.append('Made %s %s of %s optional' % (kind, name, owner))
+    if required_is_breaking:
+        for name, new_member in new_by_name.items():
+            if name not in old_by_name and not new_member.get('optional'):
+                breaking.append('Added required %s %s to %s' %
+                                (kind, name, owner))
+    return breaking
+
+
+def diff_breaking_changes(category, name, old_member, new_member):
+    if category == 'commands':
+        return diff_members(
+            'command %s' % name, 'parameter', old_member.get('parameters'),
+            new_member.get('parameters'), True) + diff_members(
+                'command %s' % name, 'return value', old_member.get('returns'),
+                new_member.get('returns'), False)
+    if category == 'events':
+        return diff_members('event %s' % name, 'parameter',
+                            old_member.get('parameters'),
+                            new_member.get('parameters'), False)
+    if category == 'types':
+        if describe_type(old_member) != describe_type(new_member):
+            return [
+                'Changed type %s from %s to %s' %
+                (name, describe_type(old_member), describe_type(new_member))
+            ]
+        return diff_members('type %s' % name, 'property',
+                            old_member.get('properties'),
+                            new_member.get('properties'), False)
+    if category == 'enums':
+        removed_values = [
+            value for value in old_member if value not in new_member
+        ]
+        if removed_values:
+            return [
+                'Removed values %s of enum %s' %
+                (', '.join(removed_values), name)
+            ]
+    return []
+
+
+# Returns the change set between two protocols, which may be normalized
+# already.
+def diff_protocols(old_protocol, new_protocol):
+    old_ir = protocol_ir.ensure_ir(old_protocol)
+    new_ir = protocol_ir.ensure_ir(new_protocol)
+    change_set = {'breaking': []}
+    for category in CATEGORIES:
+        old_members = get_members(old_ir, category)
+        new_members = get_members(new_ir, category)
+        added = sorted(set(new_members) - set(old_members))
+        removed = sorted(set(old_members) - set(new_members))
+        changed = sorted(name for name in set(old_members) & set(new_members)
+                         if json.dumps(old_members[name], sort_keys=True) !=
+                         json.dumps(new_members[name], sort_keys=True))
+        change_set[category] = {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+        }
+
+        # Enums are also reported with the member that declares them.
+        if category != 'enums':
+            for name in removed:
+                breaking_change = 'Removed %s %s' % (category[:-1], name)
+                if is_experimental(old_members[name]):
+                    breaking_change += ' (experimental)'
+                change_set['breaking'].append(breaking_change)
+        for name in changed:
+            for breaking_change in diff_breaking_changes(
+                    category, name, old_members[name], new_members[name]):
+                if category != 'enums' and is_experimental(old_members[name]):
+                    breaking_change += ' (experimental)'
+                change_set['breaking'].append(breaking_change)
+    return change_set
+
+
+# Returns the domains whose generated code differs between the protocols of
+# `change_set`.
+def get_affected_domains(change_set):
+    return set(change_set['domains']['added'] +
+               change_set['domains']['changed'])
+
+
+def format_summary(change_set):
+    lines = []
+    counts = []
+    for category in CATEGORIES:
+        changes = change_set[category]
+        if any(changes.values()):
+            counts.append('%s: +%d -%d ~%d' %
+                          (category, len(changes['added']),
+                           len(changes['removed']), len(changes['changed'])))
+    if not counts:
+        return 'No protocol changes.\n'
+    lines.append('Protocol changes (%s)' % ', '.join(counts))
+    for category in CATEGORIES:
+        for change in ['added', 'removed']:
+            names = change_set[category][change]
+            if names and category != 'enums':
+                lines.append('  %s %s: %s' %
+                             (change.capitalize(), category, ', '.join(names)))
+    if change_set['breaking']:
+        lines.append('')
+        lines.append('Breaking changes:')
+        lines.extend('  * %s' % change for change in change_set['breaking'])
+    return '\n'.join(lines) + '\n'
+
+
+def main(cli_args):
+    parser = argparse.ArgumentParser(description='Compare two protocols')
+    parser.add_argument('old_protocol', help='Protocol JSON or IR before')
+    parser.add_argument('new_protocol', help='Protocol JSON or IR after')
+    parser.add_argument('--output', help='Write the change set to this file')
+    parser.add_argument(
+        '--summary', help='Write the summary to this file instead of stdout')
+    opts = parser.parse_args(cli_args)
+
+    change_set = diff_protocols(protocol_ir.load_ir(opts.old_protocol),
+                                protocol_ir.load_ir(opts.new_protocol))
+    if opts.output:
+        with open(opts.output, 'w', encoding='utf-8') as output_file:
+            json.dump(change_set, output_file, indent=2)
+    summary = format_summary(change_set)
+    if opts.summary:
+        with open(opts.summary, 'w', encoding='utf-8') as summary_file:
+            summary_file.write(summary)
+    else:
+        sys.stdout.write(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
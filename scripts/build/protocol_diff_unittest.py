@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import copy
+import sys
+import unittest
+
+# The modules of this directory import each other as top-level modules.
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+protocol_diff = __import__('protocol_diff')
+
+PROTOCOL = {
+    'domains': [{
+        'domain':
+        'Page',
+        'types': [{
+            'id': 'FrameId',
+            'type': 'string'
+        }, {
+            'id':
+            'Frame',
+            'type':
+            'object',
+            'properties': [{
+                'name': 'id',
+                '$ref': 'FrameId'
+            }, {
+                'name': 'url',
+                'type': 'string'
+            }]
+        }],
+        'commands': [{
+            'name':
+            'navigate',
+            'parameters': [{
+                'name': 'url',
+                'type': 'string'
+            }, {
+                'name': 'referrer',
+                'type': 'string',
+                'optional': True
+            }],
+            'returns': [{
+                'name': 'frameId',
+                '$ref': 'FrameId'
+            }]
+        }, {
+            'name': 'reload',
+            'experimental': True
+        }],
+        'events': [{
+            'name': 'frameNavigated',
+            'parameters': [{
+                'name': 'frame',
+                '$ref': 'Frame'
+            }]
+        }]
+    }, {
+        'domain':
+        'DOM',
+        'dependencies': ['Page'],
+        'commands': [{
+            'name':
+            'getFrameOwner',
+            'parameters': [{
+                'name': 'frameId',
+                '$ref': 'Page.FrameId'
+            }]
+        }]
+    }, {
+        'domain': 'Log',
+        'commands': [{
+            'name': 'clear'
+        }]
+    }]
+}
+
+
+def get_domain(protocol, domain_name):
+    return next(json_domain for json_domain in protocol['domains']
+                if json_domain['domain'] == domain_name)
+
+
+def get_member(members, name):
+    return next(member for member in members if member['name'] == name)
+
+
+def get_type(protocol, domain_name, type_id):
+    return next(json_type
+                for json_type in get_domain(protocol, domain_name)['types']
+                if json_type['id'] == type_id)
+
+
+class ProtocolDiffTestCase(unittest.TestCase):
+    def setUp(self):
+        self.new_protocol = copy.deepcopy(PROTOCOL)
+        return super().setUp()
+
+    def diff(self):
+        return protocol_diff.diff_protocols(copy.deepcopy(PROTOCOL),
+                                            self.new_protocol)
+
+    def get_command(self, domain_name, name):
+        return get_member(
+            get_domain(self.new_protocol, domain_name)['commands'], name)
+
+    def test_no_changes(self):
+        change_set = self.diff()
+        for category in protocol_diff.CATEGORIES:
+            self.assertEqual(change_set[category], {
+                'added': [],
+                'removed': [],
+                'changed': []
+            })
+        self.assertEqual(change_set['breaking'], [])
+        self.assertEqual(protocol_diff.get_affected_domains(change_set), set())
+        self.assertEqual(protocol_diff.format_summary(change_set),
+                         'No protocol changes.\n')
+
+    def test_added_members(self):
+        self.new_protocol['domains'].append({
+            'domain': 'Audits',
+            'commands': [{
+                'name': 'enable'
+            }]
+        })
+        get_domain(self.new_protocol,
+                   'Log')['commands'].append({'name': 'enable'})
+        change_set = self.diff()
+        self.assertEqual(change_set['domains']['added'], ['Audits'])
+        self.assertEqual(change_set['domains']['changed'], ['Log'])
+        self.assertEqual(change_set['commands']['added'],
+                         ['Audits.enable', 'Log.enable'])
+        self.assertEqual(change_set['breaking'], [])
+        self.assertEqual(protocol_diff.get_affected_domains(change_set),
+                         {'Audits', 'Log'})
+
+    def test_removed_members(self):
+        self.new_protocol['domains'].remove(
+            get_domain(self.new_protocol, 'Log'))
+        page_commands = get_domain(self.new_protocol, 'Page')['commands']
+        page_commands.remove(get_member(page_commands, 'reload'))
+        change_set = self.diff()
+        self.assertEqual(change_set['domains']['removed'], ['Log'])
+        self.assertEqual(change_set['domains']['changed'], ['Page'])
+        self.assertEqual(change_set['commands']['removed'],
+                         ['Log.clear', 'Page.reload'])
+        self.assertEqual(change_set['breaking'], [
+            'Removed domain Log',
+            'Removed command Log.clear',
+            'Removed command Page.reload (experimental)',
+        ])
+        # Removed domains don't generate code.
+        self.assertEqual(protocol_diff.get_affected_domains(change_set),
+                         {'Page'})
+
+    def test_changed_members(self):
+        frame = get_type(self.new_protocol, 'Page', 'Frame')
+        frame['properties'].append({
+            'name': 'name',
+            'type': 'string',
+            'optional': True
+        })
+        change_set = self.diff()
+        self.assertEqual(change_set['domains']['changed'], ['Page'])
+        self.assertEqual(change_set['types']['changed'], ['Page.Frame'])
+        self.assertEqual(change_set['commands']['changed'], [])
+        self.assertEqual(change_set['breaking'], [])
+
+    def test_required_parameter_breaks_clients(self):
+        navigate = self.get_command('Page', 'navigate')
+        get_member(navigate['parameters'], 'referrer')['optional'] = False
+        navigate['parameters'].append({'name': 'timeout', 'type': 'integer'})
+        navigate['parameters'].append({
+            'name': 'transitionType',
+            'type': 'string',
+            'optional': True
+        })
+        self.assertEqual(self.diff()['breaking'], [
+            'Made parameter referrer of command Page.navigate required',
+            'Added required parameter timeout to command Page.navigate',
+        ])
+
+    def test_optional_parameter_is_compatible(self):
+        navigate = self.get_command('Page', 'navigate')
+        navigate['parameters'][0]['optional'] = True
+        self.assertEqual(self.diff()['breaking'], [])
+
+    def test_optional_return_value_breaks_clients(self):
+        navigate = self.get_command('Page', 'navigate')
+        navigate['returns'][0]['optional'] = True
+        navigate['returns'].append({'name': 'loaderId', 'type': 'string'})
+        self.assertEqual(self.diff()['breaking'], [
+            'Made return value frameId of command Page.navigate optional',
+        ])
+
+    def test_removed_event_parameter_breaks_clients(self):
+        frame_navigated = get_member(
+            get_domain(self.new_protocol, 'Page')['events'], 'frameNavigated')
+        frame_navigated['parameters'] = []
+        change_set = self.diff()
+        self.assertEqual(change_set['events']['changed'],
+                         ['Page.frameNavigated'])
+        self.assertEqual(change_set['breaking'], [
+            'Removed parameter frame of event Page.frameNavigated',
+        ])
+
+    def test_changed_referenced_type_affects_referring_domain(self):
+        get_type(self.new_protocol, 'Page', 'FrameId')['type'] = 'integer'
+        change_set = self.diff()
+        self.assertIn('Page.FrameId', change_set['types']['changed'])
+        self.assertIn('DOM.getFrameOwner', change_set['commands']['changed'])
+        self.assertIn('Changed type Page.FrameId from string to integer',
+                      change_set['breaking'])
+        self.assertEqual(protocol_diff.get_affected_domains(change_set),
+                         {'DOM', 'Page'})
+
+    def test_format_summary(self):
+        self.new_protocol['domains'].remove(
+            get_domain(self.new_protocol, 'Log'))
+        self.assertEqual(
+            protocol_diff.format_summary(self.diff()),
+            'Protocol changes (domains: +0 -1 ~0, commands: +0 -1 ~0)\n'
+            '  Removed domains: Log\n'
+            '  Removed commands: Log.clear\n'
+            '\n'
+            'Breaking changes:\n'
+            '  * Removed domain Log\n'
+            '  * Removed command Log.clear\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env vpython3
+#
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Normalized intermediate representation (IR) of a protocol.
+
+The IR is the protocol JSON as written by concatenate_protocols.py, with the
+same `domains` list, so every consumer of the JSON can read it. In addition:
+
+  * every `$ref` has a `$resolvedRef` with the qualified name of the type it
+    refers to and a `$refType` with the JSON type of that type,
+  * every `enum` has an `enumName`, qualified with the domain, named the way
+    the frontend registers it (e.g. `Page.NavigateRequestTransitionType`),
+  * `domainIndex`, `typeIndex`, `commandIndex` and `eventIndex` map names to
+    positions in `domains`, and `enumIndex` maps enum names to their values.
+
+Building the IR also checks that every reference resolves. The IR is cached in
+a file keyed by the digest of the protocol JSON, so the generators that run
+after a protocol roll don't each have to normalize the protocol again.
+
+Example:
+  protocol_ir.py --input browser_protocol.json --output protocol_ir.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from os import path
+
+ROOT_DIRECTORY = path.join(path.dirname(path.abspath(__file__)), '..', '..')
+PROTOCOL_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'public',
+                              'devtools_protocol', 'browser_protocol.json')
+DEFAULT_CACHE_LOCATION = path.join(ROOT_DIRECTORY, '.protocol_resources_cache',
+                                   'protocol_ir.json')
+
+
+def to_title_case(name):
+    return name[:1].upper() + name[1:]
+
+
+# Changes to this script invalidate cached IRs.
+def compute_ir_version():
+    with open(__file__, 'rb') as script_file:
+        return hashlib.sha256(script_file.read()).hexdigest()
+
+
+def is_ir(protocol):
+    return 'irVersion' in protocol
+
+
+def split_ref(json_ref, scope_domain_name):
+    if '.' not in json_ref:
+        return scope_domain_name, json_ref
+    return tuple(json_ref.split('.', 1))
+
+
+def annotate_refs(json_value, domain_name, types, location):
+    if isinstance(json_value, dict):
+        if '$ref' in json_value:
+            qualified_name = '%s.%s' % split_ref(json_value['$ref'],
+                                                 domain_name)
+            if qualified_name not in types:
+                raise ValueError('Unknown type %s referenced from %s' %
+                                 (qualified_name, location))
+            json_value['$resolvedRef'] = qualified_name
+            json_value['$refType'] = types[qualified_name].get('type')
+        for key, value in json_value.items():
+            annotate_refs(value, domain_name, types, location)
+    elif isinstance(json_value, list):
+        for value in json_value:
+            annotate_refs(value, domain_name, types, location)
+
+
+def annotate_enums(members, prefix, enum_index):
+    for member in members or []:
+        if 'enum' in member:
+            member['enumName'] = prefix + to_title_case(member['name'])
+            enum_index[member['enumName']] = member['enum']
+
+
+def build_ir(protocol, source_digest=None):
+    ir = {
+        'irVersion': compute_ir_version(),
+        'source': source_digest,
+        'domains': json.loads(json.dumps(protocol['domains'])),
+        'domainIndex': {},
+        'typeIndex': {},
+        'commandIndex': {},
+        'eventIndex': {},
+        'enumIndex': {},
+    }
+    if 'version' in protocol:
+        ir['version'] = protocol['version']
+
+    types = {}
+    for domain_position, json_domain in enumerate(ir['domains']):
+        domain_name = json_domain['domain']
+        ir['domainIndex'][domain_name] = domain_position
+        for type_position, json_type in enumerate(json_domain.get('types',
+                                                                  [])):
+            qualified_name = '%s.%s' % (domain_name, json_type['id'])
+            types[qualified_name] = json_type
+            ir['typeIndex'][qualified_name] = [domain_position, type_position]
+        for kind, index in [('commands', ir['commandIndex']),
+                            ('events', ir['eventIndex'])]:
+            for position, member in enumerate(json_domain.get(kind, [])):
+                qualified_name = '%s.%s' % (domain_name, member['name'])
+                index[qualified_name] = [domain_position, position]
+
+    enum_index = ir['enumIndex']
+    for json_domain in ir['domains']:
+        domain_name = json_domain['domain']
+        annotate_refs(json_domain, domain_name, types, domain_name)
+        for json_type in json_domain.get('types', []):
+            prefix = '%s.%s' % (domain_name, json_type['id'])
+            if 'enum' in json_type:
+                json_type['enumName'] = prefix
+                enum_index[prefix] = json_type['enum']
+            annotate_enums(json_type.get('properties'), prefix, enum_index)
+        for json_event in json_domain.get('events', []):
+            annotate_enums(
+                json_event.get('parameters'), '%s.%sEvent' %
+                (domain_name, to_title_case(json_event['name'])), enum_index)
+        for json_command in json_domain.get('commands', []):
+            prefix = '%s.%s' % (domain_name, to_title_case(
+                json_command['name']))
+            annotate_enums(json_command.get('parameters'), prefix + 'Request',
+                           enum_index)
+            annotate_enums(json_command.get('returns'), prefix + 'Response',
+                           enum_index)
+    return ir
+
+
+# Returns the IR of a protocol dictionary, which may already be an IR.
+def ensure_ir(protocol):
+    return protocol if is_ir(protocol) else build_ir(protocol)
+
+
+# Returns the IR of the protocol JSON at `protocol_location`. With a
+# `cache_location`, the IR is read from there if it was built from the same
+# protocol by the same version of this script, and written there otherwise.
+def load_ir(protocol_location, cache_location=None):
+    with open(protocol_location, 'rb') as protocol_file:
+        contents = protocol_file.read()
+    source_digest = hashlib.sha256(contents).hexdigest()
+    if cache_location:
+        try:
+            with open(cache_location, 'r', encoding='utf-8') as cache_file:
+                ir = json.load(cache_file)
+            if ir.get('source') == source_digest and ir.get(
+                    'irVersion') == compute_ir_version():
+                return ir
+        except (IOError, ValueError):
+            pass
+
+    protocol = json.loads(contents.decode('utf-8'))
+    if is_ir(protocol):
+        return protocol
+    ir = build_ir(protocol, source_digest)
+    if cache_location:
+        write_ir(cache_location, ir)
+    return ir
+
+
+def write_ir(location, ir):
+    directory = path.dirname(path.abspath(location))
+    os.makedirs(directory, exist_ok=True)
+    temp_location = '%s.%d.tmp' % (location, os.getpid())
+    with open(temp_location, 'w', encoding='utf-8') as ir_file:
+        json.dump(ir, ir_file, separators=(',', ':'))
+    os.replace(temp_location, location)
+
+
+def main(cli_args):
+    parser = argparse.ArgumentParser(
+        description='Write the normalized IR of a protocol')
+    parser.add_argument('--input',
+                        default=PROTOCOL_LOCATION,
+                        help='Protocol JSON to read')
+    parser.add_argument('--output',
+                        default=DEFAULT_CACHE_LOCATION,
+                        help='Location of the IR, reused if up to date')
+    opts = parser.parse_args(cli_args)
+    load_ir(opts.input, opts.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
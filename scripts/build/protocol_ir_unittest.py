@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# The modules of this directory import each other as top-level modules.
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+protocol_ir = __import__('protocol_ir')
+
+PROTOCOL = {
+    'version': {
+        'major': '1',
+        'minor': '3'
+    },
+    'domains': [{
+        'domain':
+        'Page',
+        'types': [{
+            'id': 'FrameId',
+            'type': 'string'
+        }, {
+            'id':
+            'Frame',
+            'type':
+            'object',
+            'properties': [{
+                'name': 'id',
+                '$ref': 'FrameId'
+            }, {
+                'name': 'state',
+                'type': 'string',
+                'enum': ['loading', 'done']
+            }]
+        }],
+        'commands': [{
+            'name':
+            'navigate',
+            'parameters': [{
+                'name': 'transitionType',
+                'type': 'string',
+                'enum': ['link', 'typed']
+            }],
+            'returns': [{
+                'name': 'frameId',
+                '$ref': 'FrameId'
+            }]
+        }],
+        'events': [{
+            'name': 'frameNavigated',
+            'parameters': [{
+                'name': 'frame',
+                '$ref': 'Frame'
+            }]
+        }]
+    }, {
+        'domain':
+        'DOM',
+        'types': [{
+            'id': 'NodeId',
+            'type': 'integer'
+        }],
+        'commands': [{
+            'name':
+            'getFrameOwner',
+            'parameters': [{
+                'name': 'frameId',
+                '$ref': 'Page.FrameId'
+            }],
+            'returns': [{
+                'name': 'nodeIds',
+                'type': 'array',
+                'items': {
+                    '$ref': 'NodeId'
+                }
+            }]
+        }]
+    }]
+}
+
+IR_KEYS = ['$resolvedRef', '$refType', 'enumName']
+
+
+# Returns the protocol JSON of an IR, without the annotations of the IR.
+def strip_ir(json_value):
+    if isinstance(json_value, dict):
+        return {
+            key: strip_ir(value)
+            for key, value in json_value.items() if key not in IR_KEYS
+        }
+    if isinstance(json_value, list):
+        return [strip_ir(value) for value in json_value]
+    return json_value
+
+
+class BuildIrTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ir = protocol_ir.build_ir(PROTOCOL)
+        return super().setUp()
+
+    def get_member(self, index_name, name):
+        domain_position, position = self.ir[index_name][name]
+        category = {
+            'typeIndex': 'types',
+            'commandIndex': 'commands',
+            'eventIndex': 'events',
+        }[index_name]
+        return self.ir['domains'][domain_position][category][position]
+
+    def test_keeps_the_protocol(self):
+        self.assertEqual(strip_ir(self.ir['domains']), PROTOCOL['domains'])
+        self.assertEqual(self.ir['version'], PROTOCOL['version'])
+
+    def test_does_not_modify_the_protocol(self):
+        protocol = copy.deepcopy(PROTOCOL)
+        protocol_ir.build_ir(protocol)
+        self.assertEqual(protocol, PROTOCOL)
+
+    def test_resolves_refs_in_the_same_domain(self):
+        frame = self.get_member('typeIndex', 'Page.Frame')
+        self.assertEqual(frame['properties'][0]['$resolvedRef'],
+                         'Page.FrameId')
+        self.assertEqual(frame['properties'][0]['$refType'], 'string')
+        frame_navigated = self.get_member('eventIndex', 'Page.frameNavigated')
+        self.assertEqual(frame_navigated['parameters'][0]['$resolvedRef'],
+                         'Page.Frame')
+        self.assertEqual(frame_navigated['parameters'][0]['$refType'],
+                         'object')
+
+    def test_resolves_refs_across_domains(self):
+        get_frame_owner = self.get_member('commandIndex', 'DOM.getFrameOwner')
+        self.assertEqual(get_frame_owner['parameters'][0]['$resolvedRef'],
+                         'Page.FrameId')
+        self.assertEqual(get_frame_owner['parameters'][0]['$refType'],
+                         'string')
+        self.assertEqual(get_frame_owner['returns'][0]['items'], {
+            '$ref': 'NodeId',
+            '$resolvedRef': 'DOM.NodeId',
+            '$refType': 'integer'
+        })
+
+    def test_rejects_unknown_refs(self):
+        protocol = copy.deepcopy(PROTOCOL)
+        protocol['domains'][1]['commands'][0]['parameters'][0][
+            '$ref'] = 'Page.Missing'
+        with self.assertRaises(ValueError):
+            protocol_ir.build_ir(protocol)
+
+    def test_indexes_members(self):
+        self.assertEqual(self.ir['domainIndex'], {'Page': 0, 'DOM': 1})
+        self.assertEqual(self.ir['typeIndex'], {
+            'Page.FrameId': [0, 0],
+            'Page.Frame': [0, 1],
+            'DOM.NodeId': [1, 0],
+        })
+        self.assertEqual(self.ir['commandIndex'], {
+            'Page.navigate': [0, 0],
+            'DOM.getFrameOwner': [1, 0],
+        })
+        self.assertEqual(self.ir['eventIndex'], {
+            'Page.frameNavigated': [0, 0],
+        })
+
+    def test_names_enums(self):
+        self.assertEqual(
+            self.ir['enumIndex'], {
+                'Page.FrameState': ['loading', 'done'],
+                'Page.NavigateRequestTransitionType': ['link', 'typed'],
+            })
+        navigate = self.get_member('commandIndex', 'Page.navigate')
+        self.assertEqual(navigate['parameters'][0]['enumName'],
+                         'Page.NavigateRequestTransitionType')
+
+    def test_ensure_ir_builds_the_ir_once(self):
+        self.assertIs(protocol_ir.ensure_ir(self.ir), self.ir)
+        self.assertEqual(protocol_ir.ensure_ir(PROTOCOL), self.ir)
+
+
+class LoadIrTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.protocol_location = path.join(self.directory, 'protocol.json')
+        self.cache_location = path.join(self.directory, 'cache', 'ir.json')
+        self.write_protocol(PROTOCOL)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def write_protocol(self, protocol):
+        with open(self.protocol_location, 'w', encoding='utf-8') as fp:
+            json.dump(protocol, fp)
+
+    def read_cache(self):
+        with open(self.cache_location, encoding='utf-8') as fp:
+            return json.load(fp)
+
+    def write_cache(self, ir):
+        with open(self.cache_location, 'w', encoding='utf-8') as fp:
+            json.dump(ir, fp)
+
+    def test_loads_the_ir(self):
+        ir = protocol_ir.load_ir(self.protocol_location)
+        self.assertEqual(strip_ir(ir['domains']), PROTOCOL['domains'])
+        self.assertIsNotNone(ir['source'])
+
+    def test_reuses_the_cached_ir(self):
+        ir = protocol_ir.load_ir(self.protocol_location, self.cache_location)
+        self.assertEqual(self.read_cache(), ir)
+        # Tells the cached IR apart from a newly built one.
+        ir['cached'] = True
+        self.write_cache(ir)
+        self.assertTrue(
+            protocol_ir.load_ir(self.protocol_location,
+                                self.cache_location)['cached'])
+
+    def test_rebuilds_the_ir_of_a_changed_protocol(self):
+        ir = protocol_ir.load_ir(self.protocol_location, self.cache_location)
+        ir['cached'] = True
+        self.write_cache(ir)
+        protocol = copy.deepcopy(PROTOCOL)
+        protocol['domains'].pop()
+        self.write_protocol(protocol)
+
+        ir = protocol_ir.load_ir(self.protocol_location, self.cache_location)
+        self.assertNotIn('cached', ir)
+        self.assertEqual(list(ir['domainIndex']), ['Page'])
+        self.assertEqual(self.read_cache(), ir)
+
+    def test_rebuilds_the_ir_of_another_version(self):
+        ir = protocol_ir.load_ir(self.protocol_location, self.cache_location)
+        ir['irVersion'] = 'other'
+        self.write_cache(ir)
+        self.assertEqual(
+            protocol_ir.load_ir(self.protocol_location,
+                                self.cache_location)['irVersion'],
+            protocol_ir.compute_ir_version())
+
+    def test_ignores_invalid_caches(self):
+        os.makedirs(path.dirname(self.cache_location))
+        with open(self.cache_location, 'w', encoding='utf-8') as fp:
+            fp.write('not json')
+        ir = protocol_ir.load_ir(self.protocol_location, self.cache_location)
+        self.assertEqual(strip_ir(ir['domains']), PROTOCOL['domains'])
+        self.assertEqual(self.read_cache(), ir)
+
+    def test_reads_an_ir_as_is(self):
+        ir = protocol_ir.build_ir(PROTOCOL)
+        self.write_protocol(ir)
+        self.assertEqual(protocol_ir.load_ir(self.protocol_location), ir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,10 +39,20 @@
 # even though the local build would succeed.
 
 import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
 import os.path as path
 import os
 import subprocess
 import sys
+import threading
+import time
+import traceback
 
 _CURRENT_DIR = path.join(path.dirname(__file__))
 
@@ -53,21 +63,92 @@ try:
 finally:
     sys.path = old_sys_path
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where no peak RSS is reported.
+    resource = None
+
 ROOT_DIRECTORY = path.join(path.dirname(path.abspath(__file__)), '..', '..')
 
 V8_DIRECTORY_PATH = path.join(ROOT_DIRECTORY, 'v8')
-PROTOCOL_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'public', 'devtools_protocol')
+PROTOCOL_LOCATION = path.join(ROOT_DIRECTORY, 'third_party', 'blink', 'public',
+                              'devtools_protocol')
 SCRIPTS_BUILD_PATH = path.join(ROOT_DIRECTORY, 'scripts', 'build')
 
 GENERATE_ARIA_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'generate_aria.py')
-GENERATE_SUPPORTED_CSS_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'generate_supported_css.py')
-GENERATE_PROTOCOL_DEFINITIONS_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'code_generator_frontend.py')
-CONCATENATE_PROTOCOL_SCRIPT = path.join(ROOT_DIRECTORY, 'third_party', 'inspector_protocol', 'concatenate_protocols.py')
+GENERATE_SUPPORTED_CSS_SCRIPT = path.join(SCRIPTS_BUILD_PATH,
+                                          'generate_supported_css.py')
+GENERATE_PROTOCOL_DEFINITIONS_SCRIPT = path.join(SCRIPTS_BUILD_PATH,
+                                                 'code_generator_frontend.py')
+GENERATE_PROTOCOL_IR_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'protocol_ir.py')
+PROTOCOL_DIFF_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'protocol_diff.py')
+GENERATED_FILE_SCRIPT = path.join(SCRIPTS_BUILD_PATH, 'generated_file.py')
+CONCATENATE_PROTOCOL_SCRIPT = path.join(ROOT_DIRECTORY, 'third_party',
+                                        'inspector_protocol',
+                                        'concatenate_protocols.py')
 GENERATE_DEPRECATIONS_SCRIPT = path.join(SCRIPTS_BUILD_PATH,
                                          'generate_deprecations.py')
+PROTOCOL_TYPESCRIPT_PATH = path.join(ROOT_DIRECTORY, 'scripts',
+                                     'protocol_typescript')
+GENERATE_PROTOCOL_TYPESCRIPT_SCRIPT = path.join(PROTOCOL_TYPESCRIPT_PATH,
+                                                'protocol_dts_generator.ts')
+PROTOCOL_SCHEMA_DEFINITIONS = path.join(PROTOCOL_TYPESCRIPT_PATH,
+                                        'protocol_schema.d.ts')
+# tsc writes the compiled generator next to its source, as the generator
+# locates its outputs relative to itself.
+COMPILED_PROTOCOL_TYPESCRIPT_SCRIPT = path.join(PROTOCOL_TYPESCRIPT_PATH,
+                                                'protocol_dts_generator.js')
+PYJSON5_DIRECTORY = path.join(ROOT_DIRECTORY, 'third_party', 'pyjson5', 'src',
+                              'json5')
+
+BLINK_RENDERER_CORE_PATH = path.join(ROOT_DIRECTORY, 'third_party', 'blink',
+                                     'renderer', 'core')
+ARIA_PROPERTIES_LOCATION = path.join(BLINK_RENDERER_CORE_PATH, 'html',
+                                     'aria_properties.json5')
+CSS_PROPERTIES_LOCATION = path.join(BLINK_RENDERER_CORE_PATH, 'css',
+                                    'css_properties.json5')
+DEPRECATIONS_LOCATION = path.join(BLINK_RENDERER_CORE_PATH, 'frame',
+                                  'deprecation', 'deprecation.json5')
+PROTOCOL_JSON_LOCATION = path.join(PROTOCOL_LOCATION, 'browser_protocol.json')
+# The location of browser_protocol.json in the repository, for `git show`.
+COMMITTED_PROTOCOL_JSON_PATH = path.relpath(PROTOCOL_JSON_LOCATION,
+                                            ROOT_DIRECTORY).replace(
+                                                os.sep, '/')
+PROTOCOL_PDL_LOCATIONS = [
+    path.join(PROTOCOL_LOCATION, 'browser_protocol.pdl'),
+    path.join(V8_DIRECTORY_PATH, 'include', 'js_protocol.pdl'),
+]
+
+FRONTEND_GENERATED_PATH = path.join(ROOT_DIRECTORY, 'front_end', 'generated')
+
+# Caches of the generators that make regenerating after a protocol roll cheaper.
+CACHE_DIRECTORY = path.join(ROOT_DIRECTORY, '.protocol_resources_cache')
+PROTOCOL_DEFINITIONS_CACHE = path.join(CACHE_DIRECTORY,
+                                       'code_generator_frontend.json')
+# The normalized protocol that all protocol generators read.
+PROTOCOL_IR_LOCATION = path.join(CACHE_DIRECTORY, 'protocol_ir.json')
+# The protocol in the HEAD commit, and how the .pdl files changed it since.
+PREVIOUS_PROTOCOL_LOCATION = path.join(CACHE_DIRECTORY,
+                                       'browser_protocol.previous.json')
+PROTOCOL_CHANGE_SET_LOCATION = path.join(CACHE_DIRECTORY,
+                                         'protocol_change_set.json')
+PROTOCOL_CHANGE_SUMMARY_LOCATION = path.join(CACHE_DIRECTORY,
+                                             'protocol_changes.txt')
+# Digests of the inputs and outputs of every step when it last succeeded.
+STAMPS_DIRECTORY = path.join(CACHE_DIRECTORY, 'stamps')
+
+# How the Python generators run: in worker processes that keep the generator
+# modules loaded, in this process, or as a new interpreter per step. Without
+# parallel jobs, worker processes only add the cost of starting them.
+PYTHON_EXECUTORS = ['process-pool', 'in-process', 'subprocess']
 
 NODE_LOCATION = devtools_paths.node_path()
 TSC_LOCATION = devtools_paths.typescript_compiler_path()
+# Changes with the version of TypeScript, which may compile the generator
+# differently.
+TYPESCRIPT_PACKAGE_LOCATION = path.join(devtools_paths.node_modules_path(),
+                                        'typescript', 'package.json')
 
 
 def parse_options(cli_args):
@@ -76,82 +157,634 @@ def parse_options(cli_args):
         '--node-path',
         default=NODE_LOCATION,
     )
-    return parser.parse_args(cli_args)
-
-def popen(arguments, cwd=ROOT_DIRECTORY, env=os.environ.copy()):
-    process = subprocess.Popen([sys.executable] + arguments, cwd=cwd, env=env)
-
-    process.communicate()
-
-    if process.returncode != 0:
-        sys.exit(process.returncode)
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of steps to run in parallel',
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Run every step, even if its inputs and outputs are unchanged',
+    )
+    parser.add_argument(
+        '--python-executor',
+        choices=PYTHON_EXECUTORS,
+        help='Where the Python generators run, defaults to process-pool '
+        'with more than one job and to in-process otherwise',
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print the wall time, CPU time, peak RSS and bytes written of '
+        'every step',
+    )
+    parser.add_argument(
+        '--profile-json',
+        help='Write the profile of every step to this file',
+    )
+    options = parser.parse_args(cli_args)
+    if not options.python_executor:
+        options.python_executor = ('process-pool'
+                                   if options.jobs > 1 else 'in-process')
+    return options
+
+
+class ThreadOutput(object):
+    """Replaces sys.stdout and sys.stderr to capture the output of the
+    generators that run on a thread of this process, as the streams are
+    shared by all threads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        return (getattr(self.local, 'buffer', None) or self.stream).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def capture_output(buffer):
+    if isinstance(sys.stdout, ThreadOutput):
+        sys.stdout.local.buffer = buffer
+        sys.stderr.local.buffer = buffer
+        try:
+            yield
+        finally:
+            sys.stdout.local.buffer = None
+            sys.stderr.local.buffer = None
+    else:
+        with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(
+                buffer):
+            yield
+
+
+# Resource usage of the processes that run the step of the current thread,
+# next to the CPU time of the thread itself. See run_step.
+_step_usage = threading.local()
+
+
+# Returns the peak RSS of a process in KiB from its resource usage.
+def get_peak_rss(rusage):
+    # macOS reports bytes, Linux reports KiB.
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss // 1024
+    return rusage.ru_maxrss
+
+
+def record_usage(cpu_time, peak_rss):
+    usage = getattr(_step_usage, 'usage', None)
+    if usage is not None:
+        usage['cpuTime'] += cpu_time
+        usage['peakRss'] = max(usage['peakRss'], peak_rss)
+
+
+# Runs `command` and returns its exit code and its output, including stderr.
+# The resource usage of the process is recorded for the current step.
+def run_process(command, cwd=ROOT_DIRECTORY, env=None):
+    process = subprocess.Popen(command,
+                               cwd=cwd,
+                               env=env,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    if not hasattr(os, 'wait4'):
+        stdout, _ = process.communicate()
+        return process.returncode, stdout
+    with process.stdout:
+        stdout = process.stdout.read()
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    record_usage(rusage.ru_utime + rusage.ru_stime, get_peak_rss(rusage))
+    return process.returncode, stdout
+
+
+# Imports a generator script, which stays loaded together with the modules it
+# imports (e.g. json5 or protocol_ir) for the next steps of this process.
+def load_script(script):
+    directory = path.dirname(path.abspath(script))
+    if directory not in sys.path:
+        sys.path.append(directory)
+    return importlib.import_module(path.splitext(path.basename(script))[0])
+
+
+# Runs the `main` function of a Python script with `arguments` and returns its
+# exit code, its output, the CPU time it took and the peak RSS of this process.
+def run_script_main(script, arguments):
+    start_cpu_time = time.thread_time()
+    buffer = io.StringIO()
+    with capture_output(buffer):
+        try:
+            returncode = load_script(script).main(arguments)
+        except SystemExit as exit_exception:
+            returncode = exit_exception.code
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc(file=buffer)
+            returncode = 1
+    if isinstance(returncode, str):
+        buffer.write(returncode + '\n')
+        returncode = 1
+    peak_rss = (get_peak_rss(resource.getrusage(resource.RUSAGE_SELF))
+                if resource else 0)
+    return (returncode or 0, buffer.getvalue(),
+            time.thread_time() - start_cpu_time, peak_rss)
+
+
+# Runs a Python script with the executor chosen in `options`. `arguments`
+# starts with the script.
+def run_python(arguments, options):
+    if options.python_executor == 'subprocess':
+        return popen(arguments)
+    if options.python_executor == 'process-pool':
+        returncode, output, cpu_time, peak_rss = options.process_pool.submit(
+            run_script_main, arguments[0], arguments[1:]).result()
+        record_usage(cpu_time, peak_rss)
+    else:
+        # The CPU time of this thread is already part of the step, and the
+        # peak RSS is the one of this process.
+        returncode, output, _, peak_rss = run_script_main(
+            arguments[0], arguments[1:])
+        record_usage(0, peak_rss)
+    return returncode, output
+
+
+# Runs a Python script and returns its exit code and output.
+def popen(arguments, cwd=ROOT_DIRECTORY, env=None):
+    returncode, stdout = run_process([sys.executable] + arguments, cwd, env)
+    return returncode, stdout.decode('utf-8', 'replace')
+
+
+# Returns the contents of browser_protocol.json in the HEAD commit, or None if
+# they are not available, e.g. outside of a git checkout.
+def read_committed_protocol():
+    try:
+        return subprocess.check_output(
+            ['git', 'show', 'HEAD:' + COMMITTED_PROTOCOL_JSON_PATH],
+            cwd=ROOT_DIRECTORY,
+            stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# The output of unaffected domains can only be reused if the change set
+# compares against the protocol that the output was generated from. Presubmit
+# guarantees that the committed output was generated from the committed
+# protocol by the committed generator, so this holds if neither the generator
+# nor the output are modified and the change set compares against the
+# committed protocol.
+def can_reuse_protocol_definitions():
+    paths = [
+        GENERATE_PROTOCOL_DEFINITIONS_SCRIPT, GENERATE_PROTOCOL_IR_SCRIPT,
+        path.join(FRONTEND_GENERATED_PATH, 'InspectorBackendCommands.js')
+    ]
+    try:
+        if subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--'] + paths,
+                           cwd=ROOT_DIRECTORY) != 0:
+            return False
+    except OSError:
+        return False
+    committed_protocol = read_committed_protocol()
+    if committed_protocol is None:
+        return False
+    try:
+        with open(PREVIOUS_PROTOCOL_LOCATION, 'rb') as previous_file:
+            return previous_file.read() == committed_protocol
+    except IOError:
+        return False
 
 
 def runTsc(file_to_compile, options):
-    process = subprocess.Popen(
-        [options.node_path, TSC_LOCATION, file_to_compile],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
     # TypeScript does not correctly write to stderr because of https://github.com/microsoft/TypeScript/issues/33849
-    return process.returncode, stdout + stderr
+    return run_process([options.node_path, TSC_LOCATION, file_to_compile],
+                       cwd=None)
 
 
-def runNode(file_to_execute, options):
-    process = subprocess.Popen([options.node_path, file_to_execute],
-                               stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
-    return process.returncode, stdout + stderr
+def runNode(file_to_execute, options, arguments=None):
+    return run_process([options.node_path, file_to_execute] +
+                       (arguments or []),
+                       cwd=None)
 
 
-def generate_protocol_typescript_definitions(options):
-    generator_script_to_compile = path.join(ROOT_DIRECTORY, 'scripts', 'protocol_typescript', 'protocol_dts_generator.ts')
-
-    # first run TSC to convert the script from TS to JS
+# Only runs when the sources of the generator or the version of TypeScript
+# changed, see the stamps of run_step.
+def compile_protocol_typescript_generator(options):
     typescript_found_errors, typescript_stderr = runTsc(
-        generator_script_to_compile, options)
+        GENERATE_PROTOCOL_TYPESCRIPT_SCRIPT, options)
 
     if typescript_found_errors:
-        print('')
-        print('TypeScript compilation failed on %s' % generator_script_to_compile)
-        print('')
-        print(typescript_stderr)
-        print('')
-        return 1
+        return 1, ('TypeScript compilation failed on %s\n\n%s' %
+                   (GENERATE_PROTOCOL_TYPESCRIPT_SCRIPT,
+                    typescript_stderr.decode('utf-8', 'replace')))
+    return 0, ''
 
-    outputted_file_path = generator_script_to_compile.replace('.ts', '.js')
 
-    node_found_errors, node_stderr = runNode(outputted_file_path, options)
+def generate_protocol_typescript_definitions(options):
+    node_found_errors, node_stderr = runNode(
+        COMPILED_PROTOCOL_TYPESCRIPT_SCRIPT, options, [PROTOCOL_IR_LOCATION])
 
     if node_found_errors:
-        print('')
-        print('Generating protocol typedefs failed')
-        print('')
-        print(node_stderr)
-        print('')
-        return 1
+        return 1, ('Generating protocol typedefs failed\n\n%s' %
+                   node_stderr.decode('utf-8', 'replace'))
+    return 0, ''
+
+
+def concatenate_protocols(options):
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    return run_python([CONCATENATE_PROTOCOL_SCRIPT] + PROTOCOL_PDL_LOCATIONS +
+                      [PROTOCOL_JSON_LOCATION], options)
+
+
+# Compares the protocol to the one in the HEAD commit, which the committed
+# output was generated from. Regenerating again therefore still reports all
+# changes since HEAD. Outside of a git checkout, the protocol is compared to
+# itself and no output is reused, see can_reuse_protocol_definitions.
+def diff_protocols(options):
+    previous_protocol = read_committed_protocol()
+    if previous_protocol is None:
+        with open(PROTOCOL_JSON_LOCATION, 'rb') as protocol_file:
+            previous_protocol = protocol_file.read()
+    with open(PREVIOUS_PROTOCOL_LOCATION, 'wb') as previous_file:
+        previous_file.write(previous_protocol)
+    return run_python([
+        PROTOCOL_DIFF_SCRIPT, PREVIOUS_PROTOCOL_LOCATION, PROTOCOL_IR_LOCATION,
+        '--output', PROTOCOL_CHANGE_SET_LOCATION, '--summary',
+        PROTOCOL_CHANGE_SUMMARY_LOCATION
+    ], options)
+
+
+def generate_protocol_definitions(options):
+    arguments = [
+        GENERATE_PROTOCOL_DEFINITIONS_SCRIPT, '--input', PROTOCOL_IR_LOCATION,
+        '--cache-file', PROTOCOL_DEFINITIONS_CACHE
+    ]
+    if can_reuse_protocol_definitions():
+        arguments += ['--change-set', PROTOCOL_CHANGE_SET_LOCATION]
+    return run_python(arguments, options)
+
+
+def run_script(arguments):
+    return lambda options: run_python(arguments, options)
+
+
+class Step(object):
+    """A generator that reads `inputs` and writes `outputs`.
+
+    `run` is called with the options of this script and returns the exit code
+    and the output of the step."""
+
+    def __init__(self, name, run, inputs, outputs):
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+def create_steps():
+    return [
+        Step('generate_aria',
+             run_script([GENERATE_ARIA_SCRIPT]),
+             inputs=[
+                 GENERATE_ARIA_SCRIPT, ARIA_PROPERTIES_LOCATION,
+                 PYJSON5_DIRECTORY, GENERATED_FILE_SCRIPT
+             ],
+             outputs=[path.join(FRONTEND_GENERATED_PATH,
+                                'ARIAProperties.js')]),
+        Step('generate_supported_css',
+             run_script([GENERATE_SUPPORTED_CSS_SCRIPT]),
+             inputs=[
+                 GENERATE_SUPPORTED_CSS_SCRIPT, CSS_PROPERTIES_LOCATION,
+                 PYJSON5_DIRECTORY, GENERATED_FILE_SCRIPT
+             ],
+             outputs=[
+                 path.join(FRONTEND_GENERATED_PATH,
+                           'SupportedCSSProperties.js')
+             ]),
+        Step('generate_deprecations',
+             run_script([GENERATE_DEPRECATIONS_SCRIPT]),
+             inputs=[
+                 GENERATE_DEPRECATIONS_SCRIPT, DEPRECATIONS_LOCATION,
+                 PYJSON5_DIRECTORY, GENERATED_FILE_SCRIPT
+             ],
+             outputs=[path.join(FRONTEND_GENERATED_PATH, 'Deprecation.ts')]),
+        Step('concatenate_protocols',
+             concatenate_protocols,
+             inputs=[CONCATENATE_PROTOCOL_SCRIPT] + PROTOCOL_PDL_LOCATIONS,
+             outputs=[PROTOCOL_JSON_LOCATION]),
+        Step('protocol_ir',
+             run_script([
+                 GENERATE_PROTOCOL_IR_SCRIPT, '--input',
+                 PROTOCOL_JSON_LOCATION, '--output', PROTOCOL_IR_LOCATION
+             ]),
+             inputs=[GENERATE_PROTOCOL_IR_SCRIPT, PROTOCOL_JSON_LOCATION],
+             outputs=[PROTOCOL_IR_LOCATION]),
+        Step('protocol_diff',
+             diff_protocols,
+             inputs=[
+                 PROTOCOL_DIFF_SCRIPT, GENERATE_PROTOCOL_IR_SCRIPT,
+                 PROTOCOL_IR_LOCATION
+             ],
+             outputs=[
+                 PREVIOUS_PROTOCOL_LOCATION, PROTOCOL_CHANGE_SET_LOCATION,
+                 PROTOCOL_CHANGE_SUMMARY_LOCATION
+             ]),
+        Step('code_generator_frontend',
+             generate_protocol_definitions,
+             inputs=[
+                 GENERATE_PROTOCOL_DEFINITIONS_SCRIPT,
+                 GENERATE_PROTOCOL_IR_SCRIPT, PROTOCOL_DIFF_SCRIPT,
+                 GENERATED_FILE_SCRIPT, PROTOCOL_IR_LOCATION,
+                 PROTOCOL_CHANGE_SET_LOCATION
+             ],
+             outputs=[
+                 path.join(FRONTEND_GENERATED_PATH,
+                           'InspectorBackendCommands.js')
+             ]),
+        Step('compile_protocol_dts_generator',
+             compile_protocol_typescript_generator,
+             inputs=[
+                 GENERATE_PROTOCOL_TYPESCRIPT_SCRIPT,
+                 PROTOCOL_SCHEMA_DEFINITIONS, TYPESCRIPT_PACKAGE_LOCATION
+             ],
+             outputs=[COMPILED_PROTOCOL_TYPESCRIPT_SCRIPT]),
+        Step(
+            'protocol_dts_generator',
+            generate_protocol_typescript_definitions,
+            inputs=[COMPILED_PROTOCOL_TYPESCRIPT_SCRIPT, PROTOCOL_IR_LOCATION],
+            outputs=[
+                path.join(FRONTEND_GENERATED_PATH, 'protocol.ts'),
+                path.join(FRONTEND_GENERATED_PATH, 'protocol-mapping.d.ts'),
+                path.join(FRONTEND_GENERATED_PATH, 'protocol-proxy-api.d.ts'),
+            ]),
+    ]
+
+
+# Returns the names of the steps that write an input of each step.
+def compute_dependencies(steps):
+    producers = {}
+    for step in steps:
+        for output in step.outputs:
+            if output in producers:
+                raise ValueError('%s is written by both %s and %s' %
+                                 (output, producers[output], step.name))
+            producers[output] = step.name
+    return {
+        step.name: {
+            producers[step_input]
+            for step_input in step.inputs
+            if producers.get(step_input, step.name) != step.name
+        }
+        for step in steps
+    }
+
+
+# Returns the digest of a file, or of all files in a directory, and None if
+# it doesn't exist.
+def compute_digest(location):
+    if path.isdir(location):
+        digest = hashlib.sha256()
+        for directory, directory_names, file_names in os.walk(location):
+            directory_names[:] = sorted(name for name in directory_names
+                                        if name != '__pycache__')
+            for file_name in sorted(file_names):
+                file_location = path.join(directory, file_name)
+                digest.update(
+                    path.relpath(file_location, location).encode('utf-8'))
+                digest.update(compute_digest(file_location).encode('utf-8'))
+        return digest.hexdigest()
+    try:
+        with open(location, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except IOError:
+        return None
+
+
+def compute_digests(locations):
+    return {
+        path.relpath(location, ROOT_DIRECTORY): compute_digest(location)
+        for location in locations
+    }
+
+
+def get_stamp_location(step):
+    return path.join(STAMPS_DIRECTORY, '%s.json' % step.name)
+
+
+def read_stamp(step):
+    try:
+        with open(get_stamp_location(step), 'r',
+                  encoding='utf-8') as stamp_file:
+            return json.load(stamp_file)
+    except (IOError, ValueError):
+        return None
+
+
+def write_stamp(step, input_digests):
+    stamp_location = get_stamp_location(step)
+    os.makedirs(STAMPS_DIRECTORY, exist_ok=True)
+    temp_location = '%s.%d.tmp' % (stamp_location, os.getpid())
+    with open(temp_location, 'w', encoding='utf-8') as stamp_file:
+        json.dump(
+            {
+                'inputs': input_digests,
+                'outputs': compute_digests(step.outputs),
+            },
+            stamp_file,
+            indent=2,
+            sort_keys=True)
+    os.replace(temp_location, stamp_location)
+
+
+# A step is up to date if its inputs are the same as when it last succeeded
+# and nothing changed its outputs since.
+def is_up_to_date(step, input_digests):
+    stamp = read_stamp(step)
+    if not stamp or stamp.get('inputs') != input_digests:
+        return False
+    output_digests = compute_digests(step.outputs)
+    return None not in output_digests.values() and stamp.get(
+        'outputs') == output_digests
+
+
+def get_output_states(step):
+    states = {}
+    for output in step.outputs:
+        try:
+            stat = os.stat(output)
+            states[output] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            states[output] = None
+    return states
+
+
+# Returns the size of the outputs that were written since `states_before`.
+def count_bytes_written(states_before, states_after):
+    return sum(state[1] for output, state in states_after.items()
+               if state and state != states_before[output])
+
+
+# Runs `step` unless it is up to date. Returns its exit code, its output,
+# whether it was up to date and its profile. The CPU time of a step is the
+# time of the thread that runs it, plus the time of the processes it starts.
+# Steps that run in this process report the peak RSS of this process.
+def run_step(step, options):
+    profile = {
+        'status': 'up to date',
+        'wallTime': 0,
+        'cpuTime': 0,
+        'peakRss': 0,
+        'bytesWritten': 0,
+    }
+    _step_usage.usage = profile
+    start_time = time.perf_counter()
+    start_cpu_time = time.thread_time()
+    output_states = get_output_states(step)
+    up_to_date = False
+    try:
+        input_digests = compute_digests(step.inputs)
+        if not options.force and is_up_to_date(step, input_digests):
+            up_to_date = True
+            returncode, output = 0, ''
+        else:
+            returncode, output = step.run(options)
+            if returncode == 0:
+                write_stamp(step, input_digests)
+    except Exception:  # pylint: disable=broad-except
+        returncode, output = 1, traceback.format_exc()
+    finally:
+        _step_usage.usage = None
+    if not up_to_date:
+        profile['status'] = 'ran' if returncode == 0 else 'failed'
+    profile['wallTime'] = time.perf_counter() - start_time
+    profile['cpuTime'] += time.thread_time() - start_cpu_time
+    profile['bytesWritten'] = count_bytes_written(output_states,
+                                                  get_output_states(step))
+    return returncode, output, up_to_date, profile
+
+
+# Runs every step once the steps it depends on succeeded, up to `jobs` steps
+# at a time. Steps that depend on a failed step are skipped. The output of the
+# steps is printed in the order of `steps`, regardless of when they finish.
+# Returns the names of the steps that failed, of the steps that were skipped
+# and of the steps that were up to date, and the profile of every step.
+def run_steps(steps, options):
+    dependencies = compute_dependencies(steps)
+    pending = list(steps)
+    running = {}
+    finished = {}
+    failed = []
+    skipped = []
+    up_to_date = []
+    profiles = {}
+    next_to_print = 0
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(options.jobs, 1)) as executor:
+        while pending or running:
+            for step in list(pending):
+                step_dependencies = dependencies[step.name]
+                unavailable_dependencies = [
+                    dependency for dependency in step_dependencies
+                    if dependency in failed or dependency in skipped
+                ]
+                if unavailable_dependencies:
+                    pending.remove(step)
+                    skipped.append(step.name)
+                    profiles[step.name] = {'status': 'skipped'}
+                    finished[step.name] = (
+                        None, 'Skipped %s, which depends on %s\n' %
+                        (step.name, ', '.join(
+                            sorted(unavailable_dependencies))))
+                elif step_dependencies.issubset(finished):
+                    pending.remove(step)
+                    running[executor.submit(run_step, step, options)] = step
+
+            if running:
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    (returncode, output, step_up_to_date,
+                     profiles[step.name]) = future.result()
+                    if step_up_to_date:
+                        up_to_date.append(step.name)
+                    if returncode != 0:
+                        failed.append(step.name)
+                        output += '\n%s failed with exit code %d\n' % (
+                            step.name, returncode)
+                    finished[step.name] = (returncode, output)
+
+            while (next_to_print < len(steps)
+                   and steps[next_to_print].name in finished):
+                _, output = finished[steps[next_to_print].name]
+                if output:
+                    sys.stdout.write(output)
+                    sys.stdout.flush()
+                next_to_print += 1
+    return failed, skipped, up_to_date, profiles
+
+
+def format_profile(profile):
+    lines = [
+        '%-32s %-10s %9s %9s %15s %13s' %
+        ('Step', 'Status', 'Wall (s)', 'CPU (s)', 'Peak RSS (MiB)',
+         'Written (KiB)')
+    ]
+    for step_profile in profile['steps']:
+        if step_profile['status'] == 'skipped':
+            lines.append('%-32s %-10s' %
+                         (step_profile['name'], step_profile['status']))
+            continue
+        lines.append('%-32s %-10s %9.2f %9.2f %15.1f %13.1f' %
+                     (step_profile['name'], step_profile['status'],
+                      step_profile['wallTime'], step_profile['cpuTime'],
+                      step_profile['peakRss'] / 1024,
+                      step_profile['bytesWritten'] / 1024))
+    lines.append('Total wall time: %.2fs' % profile['wallTime'])
+    return '\n'.join(lines)
 
 
 # Generate the required `front_end/generated` files that are based on files living in Blink
 def main():
     options = parse_options(sys.argv[1:])
-
-    popen([GENERATE_ARIA_SCRIPT])
-    popen([GENERATE_SUPPORTED_CSS_SCRIPT])
-    popen([GENERATE_DEPRECATIONS_SCRIPT])
-
-    popen([CONCATENATE_PROTOCOL_SCRIPT] + [
-        path.join(PROTOCOL_LOCATION, 'browser_protocol.pdl'),
-        path.join(V8_DIRECTORY_PATH, 'include', 'js_protocol.pdl'),
-        # output_file
-        path.join(PROTOCOL_LOCATION, 'browser_protocol.json'),
-    ])
-
-    popen([GENERATE_PROTOCOL_DEFINITIONS_SCRIPT])
-
-    generate_protocol_typescript_definitions(options)
+    start_time = time.perf_counter()
+    steps = create_steps()
+    if options.python_executor == 'process-pool':
+        # Spawned workers don't inherit the threads and locks of this process.
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max(options.jobs, 1),
+                mp_context=multiprocessing.get_context('spawn')) as pool:
+            options.process_pool = pool
+            failed, skipped, up_to_date, profiles = run_steps(steps, options)
+    else:
+        if options.python_executor == 'in-process':
+            sys.stdout = ThreadOutput(sys.stdout)
+            sys.stderr = ThreadOutput(sys.stderr)
+        failed, skipped, up_to_date, profiles = run_steps(steps, options)
+
+    profile = {
+        'wallTime': time.perf_counter() - start_time,
+        'jobs': options.jobs,
+        'pythonExecutor': options.python_executor,
+        'steps': [dict(profiles[step.name], name=step.name) for step in steps],
+    }
+    if options.profile:
+        print(format_profile(profile))
+    if options.profile_json:
+        with open(options.profile_json, 'w', encoding='utf-8') as profile_file:
+            json.dump(profile, profile_file, indent=2)
+    if up_to_date:
+        print('%d of %d steps were up to date: %s' %
+              (len(up_to_date), len(steps), ', '.join(up_to_date)))
+    if failed:
+        print('Failed to generate protocol resources: %s (skipped %s)' %
+              (', '.join(failed), ', '.join(skipped) or 'nothing'))
+        return 1
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
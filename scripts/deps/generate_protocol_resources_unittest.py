@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from io import StringIO
+from os import path
+
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+generate_protocol_resources = __import__('generate_protocol_resources')
+Step = generate_protocol_resources.Step
+
+
+class RunStepsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.orig_stamps_directory = generate_protocol_resources.STAMPS_DIRECTORY
+        generate_protocol_resources.STAMPS_DIRECTORY = path.join(
+            self.directory, 'stamps')
+        self.orig_stdout = sys.stdout
+        self.stdout = StringIO()
+        sys.stdout = self.stdout
+        self.runs = []
+        return super().setUp()
+
+    def tearDown(self):
+        sys.stdout = self.orig_stdout
+        generate_protocol_resources.STAMPS_DIRECTORY = self.orig_stamps_directory
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def get_location(self, name):
+        return path.join(self.directory, name)
+
+    def write_file(self, name, contents):
+        with open(self.get_location(name), 'w', encoding='utf-8') as file:
+            file.write(contents)
+
+    # Returns a step that copies the contents of its inputs to its output.
+    def create_step(self, name, inputs, output, returncode=0, before=None):
+        def run(options):
+            if before:
+                before()
+            self.runs.append(name)
+            contents = ''
+            for step_input in inputs:
+                with open(self.get_location(step_input), 'r',
+                          encoding='utf-8') as file:
+                    contents += file.read()
+            self.write_file(output, contents + name)
+            return returncode, '%s output\n' % name
+
+        return Step(
+            name,
+            run,
+            inputs=[self.get_location(step_input) for step_input in inputs],
+            outputs=[self.get_location(output)])
+
+    def run_steps(self, steps, jobs=4, force=False):
+        return generate_protocol_resources.run_steps(
+            steps, argparse.Namespace(jobs=jobs, force=force))
+
+    def test_runs_steps_after_their_dependencies(self):
+        self.write_file('source', 'source')
+        steps = [
+            self.create_step('c', ['b.out', 'a.out'], 'c.out'),
+            self.create_step('b', ['a.out'], 'b.out'),
+            self.create_step('a', ['source'], 'a.out'),
+        ]
+        self.assertEqual(
+            generate_protocol_resources.compute_dependencies(steps), {
+                'a': set(),
+                'b': {'a'},
+                'c': {'a', 'b'},
+            })
+        failed, skipped, up_to_date, _ = self.run_steps(steps)
+        self.assertEqual((failed, skipped, up_to_date), ([], [], []))
+        self.assertEqual(self.runs, ['a', 'b', 'c'])
+        with open(self.get_location('c.out'), 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'sourceabsourceac')
+
+    def test_rejects_outputs_of_multiple_steps(self):
+        steps = [
+            self.create_step('a', [], 'out'),
+            self.create_step('b', [], 'out'),
+        ]
+        with self.assertRaises(ValueError):
+            self.run_steps(steps)
+
+    def test_skips_dependents_of_failed_steps(self):
+        self.write_file('source', 'source')
+        steps = [
+            self.create_step('a', ['source'], 'a.out', returncode=1),
+            self.create_step('b', ['a.out'], 'b.out'),
+            self.create_step('c', ['b.out'], 'c.out'),
+            self.create_step('d', ['source'], 'd.out'),
+        ]
+        failed, skipped, _, profiles = self.run_steps(steps)
+        self.assertEqual(failed, ['a'])
+        self.assertEqual(skipped, ['b', 'c'])
+        self.assertEqual(sorted(self.runs), ['a', 'd'])
+        self.assertEqual(profiles['a']['status'], 'failed')
+        self.assertEqual(profiles['c']['status'], 'skipped')
+        self.assertEqual(profiles['d']['status'], 'ran')
+        self.assertEqual(
+            self.stdout.getvalue(), 'a output\n'
+            '\n'
+            'a failed with exit code 1\n'
+            'Skipped b, which depends on a\n'
+            'Skipped c, which depends on b\n'
+            'd output\n')
+
+    def test_prints_output_in_order_of_steps(self):
+        fast_step_finished = threading.Event()
+        steps = [
+            self.create_step('slow', [],
+                             'slow.out',
+                             before=lambda: fast_step_finished.wait(10)),
+            self.create_step('fast', [], 'fast.out'),
+        ]
+        fast_step = steps[1]
+        run_fast_step = fast_step.run
+
+        def run_and_signal(options):
+            result = run_fast_step(options)
+            fast_step_finished.set()
+            return result
+
+        fast_step.run = run_and_signal
+        self.run_steps(steps, jobs=2)
+        self.assertEqual(self.runs, ['fast', 'slow'])
+        self.assertEqual(self.stdout.getvalue(), 'slow output\nfast output\n')
+
+    def test_skips_up_to_date_steps(self):
+        self.write_file('source', 'source')
+        steps = [
+            self.create_step('a', ['source'], 'a.out'),
+            self.create_step('b', ['a.out'], 'b.out'),
+        ]
+        self.run_steps(steps)
+        _, _, up_to_date, profiles = self.run_steps(steps)
+        self.assertEqual(self.runs, ['a', 'b'])
+        self.assertEqual(up_to_date, ['a', 'b'])
+        self.assertEqual(profiles['b']['status'], 'up to date')
+
+    def test_reruns_steps_when_an_input_changes(self):
+        self.write_file('source', 'source')
+        steps = [
+            self.create_step('a', ['source'], 'a.out'),
+            self.create_step('b', ['a.out'], 'b.out'),
+        ]
+        self.run_steps(steps)
+        self.write_file('source', 'changed')
+        _, _, up_to_date, _ = self.run_steps(steps)
+        self.assertEqual(self.runs, ['a', 'b', 'a', 'b'])
+        self.assertEqual(up_to_date, [])
+
+    def test_reruns_steps_when_an_output_changes(self):
+        self.write_file('source', 'source')
+        steps = [
+            self.create_step('a', ['source'], 'a.out'),
+            self.create_step('b', ['source'], 'b.out'),
+        ]
+        self.run_steps(steps)
+        self.write_file('a.out', 'edited')
+        _, _, up_to_date, _ = self.run_steps(steps)
+        self.assertEqual(self.runs, ['a', 'b', 'a'])
+        self.assertEqual(up_to_date, ['b'])
+
+    def test_reruns_failed_steps(self):
+        self.write_file('source', 'source')
+        steps = [self.create_step('a', ['source'], 'a.out', returncode=1)]
+        self.run_steps(steps)
+        self.run_steps(steps)
+        self.assertEqual(self.runs, ['a', 'a'])
+
+    def test_force_reruns_up_to_date_steps(self):
+        self.write_file('source', 'source')
+        steps = [self.create_step('a', ['source'], 'a.out')]
+        self.run_steps(steps)
+        _, _, up_to_date, _ = self.run_steps(steps, force=True)
+        self.assertEqual(self.runs, ['a', 'a'])
+        self.assertEqual(up_to_date, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -152,6 +152,19 @@ def generate_protocol_resources(options):
                           cwd=options.devtools_dir)
 
 
+def read_protocol_changes(options):
+    """Returns the summary of the protocol changes of the roll, written by
+    generate_protocol_resources.py."""
+    summary_location = os.path.join(options.devtools_dir,
+                                    '.protocol_resources_cache',
+                                    'protocol_changes.txt')
+    try:
+        with open(summary_location, encoding='utf-8') as summary_file:
+            return summary_file.read()
+    except OSError:
+        return None
+
+
 def run_git_cl_format(options):
     print('running `git cl format` to format generated TS files')
     subprocess.check_call(['git', 'cl', 'format', '--js', '--full'],
@@ -199,12 +212,12 @@ def update_deps_revision(options):
         cwd=options.devtools_dir,
     )
     if options.output:
+        output = {'old_revision': old_revision, 'new_revision': new_revision}
+        protocol_changes = read_protocol_changes(options)
+        if protocol_changes:
+            output['protocol_changes'] = protocol_changes
         with open(options.output, 'w', encoding='utf-8') as f:
-            json.dump(
-                {
-                    'old_revision': old_revision,
-                    'new_revision': new_revision
-                }, f)
+            json.dump(output, f)
 
 
 if __name__ == '__main__':
@@ -217,6 +230,9 @@ if __name__ == '__main__':
     generate_signatures(OPTIONS)
     generate_dom_pinned_properties(OPTIONS)
     generate_protocol_resources(OPTIONS)
+    PROTOCOL_CHANGES = read_protocol_changes(OPTIONS)
+    if PROTOCOL_CHANGES:
+        print(PROTOCOL_CHANGES)
     if files_changed(OPTIONS):
         run_git_cl_format(OPTIONS)
         run_eslint(OPTIONS)
@@ -11,8 +11,12 @@ import * as path from 'path';
 
 import {type Protocol} from './protocol_schema.js';
 
-const PROTOCOL_JSON_PATH = path.resolve(
-    __dirname, path.join('..', '..', 'third_party', 'blink', 'public', 'devtools_protocol', 'browser_protocol.json'));
+// The protocol can also be passed as the normalized protocol written by
+// scripts/build/protocol_ir.py, which has the same shape.
+const PROTOCOL_JSON_PATH = process.argv[2] ?
+    path.resolve(process.argv[2]) :
+    path.resolve(
+        __dirname, path.join('..', '..', 'third_party', 'blink', 'public', 'devtools_protocol', 'browser_protocol.json'));
 
 const protocolJson = require(PROTOCOL_JSON_PATH);
 const removedDomains = new Set(['Console']);
@@ -123,7 +127,7 @@ const getPropertyDef = (interfaceName: string, prop: Protocol.PropertyType): str
   const propName = prop.name.includes('.') ? `'${prop.name}'` : prop.name;
   let type: string;
   if (isPropertyInlineEnum(prop)) {
-    type = interfaceName + toTitleCase(prop.name);
+    type = getInlineEnumName(interfaceName, prop);
   } else {
     type = getPropertyType(interfaceName, prop);
   }
@@ -199,6 +203,15 @@ const emitInlineEnumsForEvents = (event: Protocol.Event) => {
   emitInlineEnums(toEventPayloadName(event.name), event.parameters);
 };
 
+// The normalized protocol already names the enums, qualified with the domain.
+const getInlineEnumName = (prefix: string, prop: Protocol.PropertyType): string => {
+  const {enumName} = prop as Protocol.StringType;
+  if (enumName) {
+    return enumName.substring(enumName.indexOf('.') + 1);
+  }
+  return prefix + toTitleCase(prop.name);
+};
+
 const emitInlineEnums = (prefix: string, propertyTypes?: Protocol.PropertyType[]) => {
   if (!propertyTypes) {
     return;
@@ -206,7 +219,7 @@ const emitInlineEnums = (prefix: string, propertyTypes?: Protocol.PropertyType[]
   for (const type of propertyTypes) {
     if (isPropertyInlineEnum(type)) {
       emitLine();
-      const enumName = prefix + toTitleCase(type.name);
+      const enumName = getInlineEnumName(prefix, type);
       emitEnum(enumName, (type as Protocol.StringType).enum);
     }
   }
@@ -56,6 +56,8 @@ export module Protocol {
     type: 'string';
     /** Possible values of a string. */
     enum?: string[];
+    /** Name of the enum, qualified with the domain (normalized protocol only) */
+    enumName?: string;
   }
 
   export interface PrimitiveType {
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Local content-addressed cache for the outputs of `ts_library` actions.
+
+Entries are keyed by a digest of everything that determines the outputs of a
+compilation (see `compute_action_cache_key` in ts_library.py) and contain the
+generated `.js`, `.d.ts` and `.js.map` files. The cache can be shared between
+out directories, which makes switching branches or cleaning an out directory
+much cheaper.
+
+The cache is bounded in size. Whenever an entry is used its timestamp is
+updated and the least recently used entries are evicted once the cache grows
+beyond its maximum size.
+
+Run this script directly to print the hit/miss statistics of a cache.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from os import path
+
+ENTRIES_DIRECTORY_NAME = 'entries'
+TEMPORARY_DIRECTORY_NAME = 'tmp'
+MANIFEST_FILE_NAME = 'manifest.json'
+STATS_FILE_NAME = 'stats.log'
+LAST_EVICTION_FILE_NAME = 'last_eviction'
+
+# Walking the entire cache is expensive, so we only do it every so often.
+EVICTION_INTERVAL_SECONDS = 5 * 60
+
+DEFAULT_MAX_SIZE_MB = 2048
+
+
+class ActionCache:
+
+    def __init__(self, directory, max_size_bytes):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.entries_directory = path.join(directory, ENTRIES_DIRECTORY_NAME)
+        self.temporary_directory = path.join(directory,
+                                             TEMPORARY_DIRECTORY_NAME)
+        os.makedirs(self.entries_directory, exist_ok=True)
+        os.makedirs(self.temporary_directory, exist_ok=True)
+
+    def _entry_directory(self, key):
+        return path.join(self.entries_directory, key[:2], key)
+
+    def _record(self, event):
+        # Appends of a single short line are atomic, so concurrent actions can
+        # safely record their events without any locking.
+        with open(path.join(self.directory, STATS_FILE_NAME), 'a') as fp:
+            fp.write(event + '\n')
+
+    # Restores the outputs recorded for `key` into `output_directory`. Returns
+    # False if there is no (complete) entry for `key`.
+    #
+    # If `preserve_unchanged_files` is set, outputs whose content is already
+    # identical on disk are left alone, so that their timestamps are preserved
+    # for Ninja.
+    def restore(self, key, output_directory, preserve_unchanged_files):
+        entry_directory = self._entry_directory(key)
+        manifest_location = path.join(entry_directory, MANIFEST_FILE_NAME)
+        try:
+            with open(manifest_location, encoding="utf8") as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            self._record('miss')
+            return False
+
+        try:
+            for file_name in manifest['files']:
+                cached_location = path.join(entry_directory, file_name)
+                output_location = path.join(output_directory, file_name)
+                if preserve_unchanged_files and files_are_identical(
+                        cached_location, output_location):
+                    continue
+                os.makedirs(path.dirname(output_location), exist_ok=True)
+                # Copy to a temporary file first, so that an interrupted
+                # restore never leaves truncated outputs behind.
+                temporary_location = output_location + '.action_cache'
+                shutil.copyfile(cached_location, temporary_location)
+                os.replace(temporary_location, output_location)
+        except OSError:
+            # The entry was evicted while we were restoring it.
+            self._record('miss')
+            return False
+
+        os.utime(manifest_location)
+        self._record('hit')
+        return True
+
+    # Stores `file_names` (relative to `output_directory`) as the outputs for
+    # `key`.
+    def store(self, key, output_directory, file_names):
+        entry_directory = self._entry_directory(key)
+        if path.exists(entry_directory):
+            return
+        staging_directory = tempfile.mkdtemp(dir=self.temporary_directory)
+        try:
+            size = 0
+            for file_name in file_names:
+                staged_location = path.join(staging_directory, file_name)
+                os.makedirs(path.dirname(staged_location), exist_ok=True)
+                shutil.copyfile(path.join(output_directory, file_name),
+                                staged_location)
+                size += os.stat(staged_location).st_size
+            with open(path.join(staging_directory, MANIFEST_FILE_NAME),
+                      'w',
+                      encoding="utf8") as fp:
+                json.dump({'files': file_names, 'size': size}, fp)
+            os.makedirs(path.dirname(entry_directory), exist_ok=True)
+            try:
+                os.rename(staging_directory, entry_directory)
+            except OSError:
+                # A concurrent action stored the same entry first.
+                pass
+        finally:
+            shutil.rmtree(staging_directory, ignore_errors=True)
+        self._record('store')
+        self.maybe_evict()
+
+    def _list_entries(self):
+        entries = []
+        for shard in os.scandir(self.entries_directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                manifest_location = path.join(entry.path, MANIFEST_FILE_NAME)
+                try:
+                    last_used = os.stat(manifest_location).st_mtime
+                    with open(manifest_location, encoding="utf8") as fp:
+                        size = json.load(fp)['size']
+                except (OSError, ValueError, KeyError):
+                    continue
+                entries.append((last_used, size, entry.path))
+        return entries
+
+    def maybe_evict(self):
+        last_eviction_location = path.join(self.directory,
+                                           LAST_EVICTION_FILE_NAME)
+        try:
+            last_eviction = os.stat(last_eviction_location).st_mtime
+        except OSError:
+            last_eviction = 0
+        if time.time() - last_eviction < EVICTION_INTERVAL_SECONDS:
+            return
+        with open(last_eviction_location, 'w'):
+            pass
+        self.evict()
+
+    # Removes the least recently used entries until the cache fits in its
+    # maximum size again.
+    def evict(self):
+        entries = self._list_entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_directory in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            shutil.rmtree(entry_directory, ignore_errors=True)
+            total_size -= size
+            self._record('evict')
+
+    def statistics(self):
+        counts = {'hit': 0, 'miss': 0, 'store': 0, 'evict': 0}
+        try:
+            with open(path.join(self.directory, STATS_FILE_NAME)) as fp:
+                for line in fp:
+                    event = line.strip()
+                    if event in counts:
+                        counts[event] += 1
+        except OSError:
+            pass
+        entries = self._list_entries()
+        lookups = counts['hit'] + counts['miss']
+        return {
+            'hits': counts['hit'],
+            'misses': counts['miss'],
+            'hit_rate': counts['hit'] / lookups if lookups else 0.0,
+            'stores': counts['store'],
+            'evictions': counts['evict'],
+            'entries': len(entries),
+            'size_bytes': sum(size for _, size, _ in entries),
+            'max_size_bytes': self.max_size_bytes,
+        }
+
+    def clear_statistics(self):
+        try:
+            os.remove(path.join(self.directory, STATS_FILE_NAME))
+        except OSError:
+            pass
+
+
+def files_are_identical(first_location, second_location):
+    try:
+        if os.stat(first_location).st_size != os.stat(second_location).st_size:
+            return False
+        with open(first_location, 'rb') as first, open(second_location,
+                                                       'rb') as second:
+            while True:
+                first_chunk = first.read(1024 * 1024)
+                if first_chunk != second.read(1024 * 1024):
+                    return False
+                if not first_chunk:
+                    return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Inspect the ts_library action cache')
+    parser.add_argument('directory', help='Location of the action cache')
+    parser.add_argument('--max-size-mb',
+                        type=int,
+                        default=DEFAULT_MAX_SIZE_MB,
+                        help='Evict entries until the cache fits in this size')
+    parser.add_argument('--evict',
+                        action='store_true',
+                        help='Evict least recently used entries now')
+    parser.add_argument('--clear-stats',
+                        action='store_true',
+                        help='Reset the hit/miss statistics')
+    opts = parser.parse_args()
+
+    cache = ActionCache(opts.directory, opts.max_size_mb * 1024 * 1024)
+    if opts.evict:
+        cache.evict()
+    print(json.dumps(cache.statistics(), indent=2))
+    if opts.clear_stats:
+        cache.clear_statistics()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
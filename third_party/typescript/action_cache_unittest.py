@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+action_cache = __import__('action_cache')
+
+KEY = 'ab' + '0' * 62
+OTHER_KEY = 'cd' + '0' * 62
+
+
+class ActionCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = path.join(self.directory, 'cache')
+        self.output_directory = path.join(self.directory, 'out')
+        self.cache = action_cache.ActionCache(self.cache_directory,
+                                              max_size_bytes=1024)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def write_output(self, file_name, contents):
+        location = path.join(self.output_directory, file_name)
+        os.makedirs(path.dirname(location), exist_ok=True)
+        with open(location, 'w', encoding='utf-8') as fp:
+            fp.write(contents)
+
+    def read_output(self, file_name):
+        with open(path.join(self.output_directory, file_name),
+                  encoding='utf-8') as fp:
+            return fp.read()
+
+    def get_entry_directory(self, key):
+        return path.join(self.cache_directory,
+                         action_cache.ENTRIES_DIRECTORY_NAME, key[:2], key)
+
+    def test_restores_stored_outputs(self):
+        self.write_output('a.js', 'a')
+        self.write_output('nested/a.d.ts', 'declare const a')
+        self.cache.store(KEY, self.output_directory, ['a.js', 'nested/a.d.ts'])
+        shutil.rmtree(self.output_directory)
+
+        self.assertTrue(
+            self.cache.restore(KEY,
+                               self.output_directory,
+                               preserve_unchanged_files=False))
+        self.assertEqual(self.read_output('a.js'), 'a')
+        self.assertEqual(self.read_output('nested/a.d.ts'), 'declare const a')
+
+    def test_misses_unknown_keys(self):
+        self.assertFalse(
+            self.cache.restore(KEY,
+                               self.output_directory,
+                               preserve_unchanged_files=False))
+        self.assertEqual(self.cache.statistics()['misses'], 1)
+
+    def test_misses_incomplete_entries(self):
+        self.write_output('a.js', 'a')
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+        os.remove(path.join(self.get_entry_directory(KEY), 'a.js'))
+        self.assertFalse(
+            self.cache.restore(KEY,
+                               self.output_directory,
+                               preserve_unchanged_files=False))
+
+    def test_preserves_timestamps_of_unchanged_files(self):
+        self.write_output('a.js', 'a')
+        self.write_output('b.js', 'b')
+        self.cache.store(KEY, self.output_directory, ['a.js', 'b.js'])
+        self.write_output('b.js', 'changed')
+        for file_name in ['a.js', 'b.js']:
+            os.utime(path.join(self.output_directory, file_name), ns=(0, 0))
+
+        self.assertTrue(
+            self.cache.restore(KEY,
+                               self.output_directory,
+                               preserve_unchanged_files=True))
+        self.assertEqual(
+            os.stat(path.join(self.output_directory, 'a.js')).st_mtime_ns, 0)
+        self.assertNotEqual(
+            os.stat(path.join(self.output_directory, 'b.js')).st_mtime_ns, 0)
+        self.assertEqual(self.read_output('b.js'), 'b')
+
+    def test_keeps_existing_entries(self):
+        self.write_output('a.js', 'a')
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+        self.write_output('a.js', 'changed')
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+
+        self.assertTrue(
+            self.cache.restore(KEY,
+                               self.output_directory,
+                               preserve_unchanged_files=False))
+        self.assertEqual(self.read_output('a.js'), 'a')
+
+    def test_evicts_least_recently_used_entries(self):
+        self.write_output('a.js', 'a' * 600)
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+        self.cache.store(OTHER_KEY, self.output_directory, ['a.js'])
+        manifest_location = path.join(self.get_entry_directory(KEY),
+                                      action_cache.MANIFEST_FILE_NAME)
+        os.utime(manifest_location, (0, 0))
+
+        self.cache.evict()
+        self.assertFalse(path.exists(self.get_entry_directory(KEY)))
+        self.assertTrue(path.exists(self.get_entry_directory(OTHER_KEY)))
+        statistics = self.cache.statistics()
+        self.assertEqual(statistics['entries'], 1)
+        self.assertEqual(statistics['size_bytes'], 600)
+        self.assertEqual(statistics['evictions'], 1)
+
+    def test_restoring_marks_entries_as_used(self):
+        self.write_output('a.js', 'a' * 600)
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+        self.cache.store(OTHER_KEY, self.output_directory, ['a.js'])
+        for key in [KEY, OTHER_KEY]:
+            os.utime(
+                path.join(self.get_entry_directory(key),
+                          action_cache.MANIFEST_FILE_NAME), (0, 0))
+        self.cache.restore(KEY,
+                           self.output_directory,
+                           preserve_unchanged_files=False)
+
+        self.cache.evict()
+        self.assertTrue(path.exists(self.get_entry_directory(KEY)))
+        self.assertFalse(path.exists(self.get_entry_directory(OTHER_KEY)))
+
+    def test_statistics(self):
+        self.write_output('a.js', 'a')
+        self.cache.store(KEY, self.output_directory, ['a.js'])
+        self.cache.restore(KEY,
+                           self.output_directory,
+                           preserve_unchanged_files=False)
+        self.cache.restore(OTHER_KEY,
+                           self.output_directory,
+                           preserve_unchanged_files=False)
+        statistics = self.cache.statistics()
+        self.assertEqual(statistics['hits'], 1)
+        self.assertEqual(statistics['misses'], 1)
+        self.assertEqual(statistics['hit_rate'], 0.5)
+        self.assertEqual(statistics['stores'], 1)
+        with open(
+                path.join(self.get_entry_directory(KEY),
+                          action_cache.MANIFEST_FILE_NAME)) as fp:
+            self.assertEqual(json.load(fp), {'files': ['a.js'], 'size': 1})
+
+        self.cache.clear_statistics()
+        self.assertEqual(self.cache.statistics()['hits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
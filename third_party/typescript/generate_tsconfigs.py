@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Writes the tsconfigs of many ts_library targets in a single process.
+
+Every ts_library target records the arguments of its `ts_library.py`
+invocation as `ts_library_args` metadata, which `gn gen` collects in
+`gen/ts_library_args.json`. This script writes the tsconfig of every target in
+that file exactly like `ts_library.py --tsconfig-only` would, but only parses
+`tsconfig.base.json` once and doesn't start a Python process per target.
+Unchanged tsconfigs are not rewritten, so Ninja doesn't consider them dirty.
+
+This makes all tsconfigs of an out directory available right after `gn gen`,
+e.g. for editors and code indexing, without building anything.
+
+Example:
+  generate_tsconfigs.py -C out/Default gen/ts_library_args.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from os import path
+
+import ts_library
+
+
+def parse_options(cli_args):
+    parser = argparse.ArgumentParser(
+        description='Write the tsconfigs of many ts_library targets')
+    parser.add_argument(
+        '-C',
+        '--out-directory',
+        default='.',
+        help='Out directory the ts_library arguments are relative to')
+    parser.add_argument(
+        'manifest',
+        help='JSON list of ts_library.py arguments, relative to -C')
+    return parser.parse_args(cli_args)
+
+
+def read_manifest(manifest_location):
+    with open(manifest_location, encoding="utf8") as fp:
+        manifest = json.load(fp)
+    # Entries are either argument lists or GN scopes with an `args` list.
+    return [
+        entry['args'] if isinstance(entry, dict) else entry
+        for entry in manifest
+    ]
+
+
+def main(cli_args):
+    opts = parse_options(cli_args)
+    # ts_library.py resolves all paths against the out directory, as that is
+    # where GN runs its actions.
+    os.chdir(opts.out_directory)
+
+    base_tsconfig = ts_library.load_base_tsconfig()
+    written = 0
+    failed = 0
+    for args in read_manifest(opts.manifest):
+        target_opts = ts_library.parse_options(args)
+        tsconfig = ts_library.create_tsconfig(
+            target_opts, ts_library.read_sources(target_opts), base_tsconfig)
+        tsconfig_output_location = path.join(
+            os.getcwd(), target_opts.tsconfig_output_location)
+        os.makedirs(path.dirname(tsconfig_output_location), exist_ok=True)
+        if ts_library.maybe_update_tsconfig_file(tsconfig_output_location,
+                                                 tsconfig) == 1:
+            failed += 1
+        else:
+            written += 1
+
+    print('Generated %d tsconfigs (%d failed)' % (written, failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
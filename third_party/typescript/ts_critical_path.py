@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Critical path analysis of the ts_library targets of an out directory.
+
+The project references in the tsconfigs generated by `ts_library.py` form the
+dependency graph of the TypeScript targets. Combined with the compile time of
+every target, taken from `.ninja_log` or from a trace written with
+`devtools_ts_trace_file`, this computes:
+
+  * the critical path, i.e. the chain of targets that bounds the build time
+    even with unlimited parallelism,
+  * the slack of every target, i.e. how much longer it could take without
+    making the build slower, and
+  * the targets on the critical path that would shorten the build the most if
+    they were split into two independent halves.
+
+Example:
+  ts_critical_path.py -C out/Default
+  ts_critical_path.py -C out/Default --trace-file /tmp/ts_trace.json --gn-hints
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from os import path
+
+import ts_library_batch
+import ts_trace
+
+TSCONFIG_SUFFIX = '-tsconfig.json'
+
+
+def parse_options(cli_args):
+    parser = argparse.ArgumentParser(
+        description='Find the critical path through the ts_library targets')
+    parser.add_argument('-C',
+                        '--out-directory',
+                        default='.',
+                        help='Out directory to analyze')
+    parser.add_argument(
+        '--trace-file',
+        help='Take compile times from this trace instead of .ninja_log')
+    parser.add_argument('--top',
+                        type=int,
+                        default=10,
+                        help='Number of split candidates to show')
+    parser.add_argument('--gn-hints',
+                        action='store_true',
+                        help='Print GN pool hints for the critical path')
+    parser.add_argument('--json',
+                        action='store_true',
+                        help='Print the analysis as JSON')
+    return parser.parse_args(cli_args)
+
+
+# Returns a map of every generated tsconfig in `out_directory` (relative to it)
+# to the tsconfigs it references.
+def load_dependency_graph(out_directory):
+    graph = {}
+    pending = []
+    for directory, _, file_names in os.walk(path.join(out_directory, 'gen')):
+        for file_name in file_names:
+            if file_name.endswith(TSCONFIG_SUFFIX):
+                pending.append(path.join(directory, file_name))
+
+    while pending:
+        tsconfig_location = path.normpath(pending.pop())
+        target = path.relpath(tsconfig_location, out_directory)
+        if target in graph:
+            continue
+        try:
+            tsconfig = ts_library_batch.read_tsconfig(tsconfig_location)
+        except (OSError, ValueError):
+            continue
+        references = ts_library_batch.get_reference_locations(
+            tsconfig_location, tsconfig)
+        graph[target] = [
+            path.relpath(reference, out_directory) for reference in references
+        ]
+        pending.extend(references)
+
+    # Drop references to tsconfigs that don't exist (yet).
+    return {
+        target: [dep for dep in deps if dep in graph]
+        for target, deps in graph.items()
+    }
+
+
+# Reads the duration in seconds of every action from a `.ninja_log`, keyed by
+# its outputs. Later entries override earlier ones, as ninja appends to the log.
+def read_ninja_log_durations(ninja_log_location):
+    durations = {}
+    with open(ninja_log_location, encoding='utf-8') as fp:
+        for line in fp:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 4:
+                continue
+            duration_ms = int(fields[1]) - int(fields[0])
+            durations[path.normpath(fields[3])] = duration_ms / 1000
+    return durations
+
+
+def read_trace_durations(trace_file_location):
+    durations = {}
+    for event in ts_trace.summarize_targets(
+            ts_trace.load_trace_events(trace_file_location)):
+        durations[path.normpath(event['name'] +
+                                TSCONFIG_SUFFIX)] = event['args']['wallTime']
+    return durations
+
+
+def topological_order(graph):
+    order = []
+    visited = set()
+
+    def visit(target):
+        if target in visited:
+            return
+        visited.add(target)
+        for dep in graph[target]:
+            visit(dep)
+        order.append(target)
+
+    for target in sorted(graph):
+        visit(target)
+    return order
+
+
+# Returns the earliest time at which every target can finish with unlimited
+# parallelism.
+def compute_finish_times(graph, order, durations):
+    finish_times = {}
+    for target in order:
+        start = max([finish_times[dep] for dep in graph[target]] + [0.0])
+        finish_times[target] = start + durations.get(target, 0.0)
+    return finish_times
+
+
+class CriticalPathAnalysis:
+
+    def __init__(self, graph, durations):
+        self.graph = graph
+        self.durations = durations
+        self.order = topological_order(graph)
+        self.finish_times = compute_finish_times(graph, self.order, durations)
+        self.build_time = max(list(self.finish_times.values()) + [0.0])
+        self.slack = self._compute_slack()
+        self.critical_path = self._compute_critical_path()
+
+    def duration(self, target):
+        return self.durations.get(target, 0.0)
+
+    def _compute_slack(self):
+        dependents = {target: [] for target in self.graph}
+        for target, deps in self.graph.items():
+            for dep in deps:
+                dependents[dep].append(target)
+        # The latest time at which every target can finish without delaying
+        # the build.
+        latest_finish_times = {}
+        for target in reversed(self.order):
+            latest_finish_times[target] = min([
+                latest_finish_times[dependent] - self.duration(dependent)
+                for dependent in dependents[target]
+            ] + [self.build_time])
+        return {
+            target: latest_finish_times[target] - self.finish_times[target]
+            for target in self.graph
+        }
+
+    def _compute_critical_path(self):
+        if not self.graph:
+            return []
+        target = max(self.graph, key=lambda t: self.finish_times[t])
+        critical_path = [target]
+        while self.graph[target]:
+            target = max(self.graph[target],
+                         key=lambda t: self.finish_times[t])
+            critical_path.append(target)
+        return list(reversed(critical_path))
+
+    # Estimates how much faster the build would be if `target` were split into
+    # two halves that can be compiled in parallel.
+    def split_gain(self, target):
+        durations = dict(self.durations)
+        durations[target] = self.duration(target) / 2
+        finish_times = compute_finish_times(self.graph, self.order, durations)
+        return self.build_time - max(finish_times.values())
+
+    def split_candidates(self):
+        candidates = [(self.split_gain(target), target)
+                      for target in self.critical_path]
+        return sorted([(gain, target)
+                       for gain, target in candidates if gain > 0],
+                      reverse=True)
+
+
+def get_target_name(target):
+    return target[:-len(TSCONFIG_SUFFIX)] if target.endswith(
+        TSCONFIG_SUFFIX) else target
+
+
+# ts_library writes its tsconfig to `<target_gen_dir>/<target name>-tsconfig.json`,
+# so the GN label can be derived from it (unless `typescript_config_name` is
+# set).
+def get_gn_label(target):
+    directory, name = path.split(get_target_name(target))
+    parts = directory.replace(os.sep, '/').split('/')
+    if parts[0] == 'gen':
+        parts = parts[1:]
+    return '//%s:%s' % ('/'.join(parts), name)
+
+
+def print_report(analysis, top, gn_hints):
+    print('Build time with unlimited parallelism: %.1fs (%d targets)' %
+          (analysis.build_time, len(analysis.graph)))
+    print('')
+    print('Critical path:')
+    for target in analysis.critical_path:
+        print('  %8.2fs  %8.2fs  %s' %
+              (analysis.duration(target), analysis.finish_times[target],
+               get_target_name(target)))
+
+    print('')
+    print('Targets that shorten the build most when split in two:')
+    candidates = analysis.split_candidates()[:top]
+    if not candidates:
+        print('  (none)')
+    for gain, target in candidates:
+        print('  %9s  %s' % ('-%.2fs' % gain, get_target_name(target)))
+
+    print('')
+    print('Targets with the least slack:')
+    by_slack = sorted(analysis.graph,
+                      key=lambda t: (analysis.slack[t], -analysis.duration(t)))
+    for target in by_slack[:top]:
+        print('  %8.2fs slack  %s' %
+              (analysis.slack[target], get_target_name(target)))
+
+    if gn_hints:
+        print('')
+        print(
+            '# GN hints: keep the critical path out of restricted pools, and')
+        print('# consider a restricted pool for expensive targets with slack.')
+        for target in analysis.critical_path:
+            print('# critical: %s' % get_gn_label(target))
+        for target in sorted(analysis.graph,
+                             key=lambda t: -analysis.duration(t))[:top]:
+            if analysis.slack[target] > analysis.duration(target):
+                print('# pool candidate (%.1fs slack): %s' %
+                      (analysis.slack[target], get_gn_label(target)))
+
+
+def main(cli_args):
+    opts = parse_options(cli_args)
+    out_directory = path.abspath(opts.out_directory)
+
+    graph = load_dependency_graph(out_directory)
+    if opts.trace_file:
+        durations = read_trace_durations(opts.trace_file)
+    else:
+        durations = read_ninja_log_durations(
+            path.join(out_directory, '.ninja_log'))
+    analysis = CriticalPathAnalysis(graph, durations)
+
+    if opts.json:
+        print(
+            json.dumps(
+                {
+                    'buildTime':
+                    analysis.build_time,
+                    'criticalPath':
+                    [{
+                        'target': get_target_name(target),
+                        'label': get_gn_label(target),
+                        'duration': analysis.duration(target),
+                        'finishTime': analysis.finish_times[target],
+                    } for target in analysis.critical_path],
+                    'splitCandidates': [{
+                        'target': get_target_name(target),
+                        'gain': gain,
+                    } for gain, target in analysis.split_candidates()],
+                    'slack': {
+                        get_target_name(target): slack
+                        for target, slack in analysis.slack.items()
+                    },
+                },
+                indent=2))
+    else:
+        print_report(analysis, opts.top, opts.gn_hints)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,12 +3,18 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 import argparse
+import copy
+import hashlib
 import json
 import logging
 import os
+import re
 import shlex
+import shutil
+import socket
 import subprocess
 import sys
+import time
 
 from os import path
 
@@ -18,6 +24,12 @@ ROOT_DIRECTORY_OF_REPOSITORY = path.join(_CURRENT_DIR, '..', '..')
 NODE_MODULES_DIRECTORY = path.join(ROOT_DIRECTORY_OF_REPOSITORY,
                                    'node_modules')
 TSC_LOCATION = path.join(NODE_MODULES_DIRECTORY, 'typescript', 'bin', 'tsc')
+TYPESCRIPT_LIBRARY_LOCATION = path.join(NODE_MODULES_DIRECTORY, 'typescript',
+                                        'lib', 'typescript.js')
+TSC_SERVER_LOCATION = path.join(_CURRENT_DIR, 'tsc_server.js')
+TSC_COMPILER_LOCATION = path.join(_CURRENT_DIR, 'tsc_compiler.js')
+TYPESCRIPT_PACKAGE_JSON_LOCATION = path.join(NODE_MODULES_DIRECTORY,
+                                             'typescript', 'package.json')
 
 try:
     old_sys_path = sys.path[:]
@@ -25,14 +37,49 @@ try:
     import devtools_paths
 finally:
     sys.path = old_sys_path
+import action_cache
+import ts_trace
+
 NODE_LOCATION = devtools_paths.node_path()
 ESBUILD_LOCATION = devtools_paths.esbuild_path()
+ESBUILD_MODULE_LOCATION = path.join(NODE_MODULES_DIRECTORY, 'esbuild', 'lib',
+                                    'main.js')
 
 BASE_TS_CONFIG_LOCATION = path.join(ROOT_DIRECTORY_OF_REPOSITORY, 'config',
                                     'typescript', 'tsconfig.base.json')
 TYPES_NODE_MODULES_DIRECTORY = path.join(NODE_MODULES_DIRECTORY, '@types')
 RESOURCES_INSPECTOR_PATH = path.join(os.getcwd(), 'resources', 'inspector')
 
+# The compile server is shared by all ts_library actions of an out directory.
+# GN runs all actions with the out directory as the current working directory.
+TSC_SERVER_STATE_DIRECTORY = path.join(os.getcwd(), 'tsc_server')
+TSC_SERVER_INFO_FILE = path.join(TSC_SERVER_STATE_DIRECTORY, 'server.json')
+TSC_SERVER_LOCK_FILE = path.join(TSC_SERVER_STATE_DIRECTORY, 'server.lock')
+TSC_SERVER_LOG_FILE = path.join(TSC_SERVER_STATE_DIRECTORY, 'server.log')
+TSC_SERVER_STARTUP_TIMEOUT_SECONDS = 30
+TSC_SERVER_CONNECT_TIMEOUT_SECONDS = 5
+# A server that doesn't answer a request within this time is considered
+# unavailable, e.g. because a worker is stuck, and the action compiles itself.
+TSC_SERVER_REQUEST_TIMEOUT_SECONDS = 300
+
+# npm rewrites this file whenever the installed packages change.
+NODE_MODULES_LOCK_FILE_LOCATION = path.join(NODE_MODULES_DIRECTORY,
+                                            '.package-lock.json')
+REMOTE_TOOLCHAIN_INPUTS_DIRECTORY = path.join(os.getcwd(), 'tsc_remote_inputs')
+# Bump this whenever `compute_remote_toolchain_inputs` changes.
+REMOTE_TOOLCHAIN_INPUTS_VERSION = '1'
+DECLARATION_FILE_NAME_PATTERN = re.compile(r'\.d\.[cm]?ts$')
+TYPES_REFERENCE_DIRECTIVE_PATTERN = re.compile(
+    r'^///\s*<reference\s+types\s*=\s*["\']([^"\']+)["\']', re.MULTILINE)
+
+# See `restore_tsbuildinfo_file`.
+TSBUILDINFO_STORE_DIRECTORY = path.join(os.getcwd(), 'tsbuildinfo_store')
+TSBUILDINFO_STORE_FILE_NAME = 'tsbuildinfo'
+TSBUILDINFO_STORE_MANIFEST_NAME = 'outputs.json'
+
+# Bump this whenever the inputs of `compute_action_cache_key` change.
+ACTION_CACHE_KEY_VERSION = '2'
+
 GLOBAL_TYPESCRIPT_DEFINITION_FILES = [
     # legacy definitions used to help us bridge Closure and TypeScript
     path.join(ROOT_DIRECTORY_OF_REPOSITORY, 'front_end', 'legacy',
@@ -45,12 +92,19 @@ GLOBAL_TYPESCRIPT_DEFINITION_FILES = [
     path.join(NODE_MODULES_DIRECTORY, '@types', 'filesystem', 'index.d.ts'),
 ]
 
+# The declaration files above and the default `lib` files are shared by almost
+# all targets. The compile server and batch compilations parse and bind them
+# once, using a tsconfig with the compiler options of a regular target.
+GLOBAL_TYPINGS_TSCONFIG_NAME = 'global_typings-tsconfig.json'
+GLOBAL_TYPINGS_LIB = ['esnext', 'dom', 'dom.iterable']
+
 logging.basicConfig(
     level=logging.DEBUG if os.environ.get('TSC_DEBUG') else logging.WARNING)
 
 
-def runTsc(tsconfig_location):
-    cmd = [NODE_LOCATION, TSC_LOCATION, '-p', tsconfig_location]
+def runTsc(tsconfig_location, extra_args=None):
+    cmd = [NODE_LOCATION, TSC_LOCATION, '-p', tsconfig_location] + (extra_args
+                                                                    or [])
     logging.info("runTsc: %s", ' '.join(cmd))
     process = subprocess.Popen(cmd,
                                stdout=subprocess.PIPE,
@@ -61,38 +115,145 @@ def runTsc(tsconfig_location):
     return process.returncode, stdout + stderr
 
 
-def runTscRemote(tsconfig_location, all_ts_files, rewrapper_binary,
-                 rewrapper_cfg, rewrapper_exec_root, test_only):
-    relative_ts_file_paths = [
-        path.relpath(x, rewrapper_exec_root) for x in all_ts_files
-    ]
+# Runs tsc with `--extendedDiagnostics` and records the duration of the compiler
+# phases and the memory usage of this target in the shared trace file.
+def runTscWithTracing(tsconfig_location, trace_file_location):
+    start_time = time.time()
+    returncode, output = runTsc(tsconfig_location,
+                                extra_args=['--extendedDiagnostics'])
+    wall_time = time.time() - start_time
+    output, statistics = ts_trace.split_extended_diagnostics(output)
+    target_name = path.relpath(tsconfig_location)
+    if target_name.endswith('-tsconfig.json'):
+        target_name = target_name[:-len('-tsconfig.json')]
+    ts_trace.append_trace_events(
+        trace_file_location,
+        ts_trace.create_trace_events(target_name, start_time, wall_time,
+                                     statistics))
+    return returncode, output
+
+
+# Remote compilations upload every file that tsc reads. Listing the TypeScript
+# toolchain and the `@types` packages is expensive, so the list is computed once
+# per toolchain revision and `types` option and cached in the out directory.
+def compute_remote_toolchain_inputs_key(rewrapper_exec_root, compiler_options):
+    key = hashlib.sha1()
+    key.update(
+        ('%s;%s;%s;%s;' %
+         (REMOTE_TOOLCHAIN_INPUTS_VERSION, rewrapper_exec_root, os.getcwd(),
+          json.dumps([
+              compiler_options.get('typeRoots'),
+              compiler_options.get('types')
+          ]))).encode())
+    for location in [
+            NODE_LOCATION, TYPESCRIPT_PACKAGE_JSON_LOCATION,
+            NODE_MODULES_LOCK_FILE_LOCATION
+    ]:
+        stat = os.stat(location)
+        key.update(('%s:%d:%d;' %
+                    (location, stat.st_mtime_ns, stat.st_size)).encode())
+    return key.hexdigest()
+
+
+# Collects the files of the `@types` packages in `types` and of all `@types`
+# packages they depend on, either through their package.json or through
+# `/// <reference types="..." />` directives.
+def collect_types_closure(types):
+    pending = list(types)
+    visited = set()
+    files = []
+    while pending:
+        type_name = pending.pop()
+        if type_name in visited:
+            continue
+        visited.add(type_name)
+        package_directory = path.join(TYPES_NODE_MODULES_DIRECTORY, type_name)
+        if not path.isdir(package_directory):
+            continue
+
+        with open(path.join(package_directory, 'package.json'),
+                  encoding="utf8") as fp:
+            package_json = json.load(fp)
+        for dependency in package_json.get('dependencies', {}):
+            if dependency.startswith('@types/'):
+                pending.append(dependency[len('@types/'):])
+
+        for directory, _, file_names in os.walk(package_directory):
+            for file_name in file_names:
+                location = path.join(directory, file_name)
+                if file_name == 'package.json':
+                    files.append(location)
+                elif DECLARATION_FILE_NAME_PATTERN.search(file_name):
+                    files.append(location)
+                    with open(location, encoding="utf8") as fp:
+                        pending.extend(
+                            TYPES_REFERENCE_DIRECTIVE_PATTERN.findall(
+                                fp.read()))
+    return sorted(files)
 
-    tsc_lib_directory = path.join(NODE_MODULES_DIRECTORY, 'typescript', 'lib')
-    all_d_ts_files = [
+
+def compute_remote_toolchain_inputs(rewrapper_exec_root, compiler_options):
+    tsc_directory = path.join(NODE_MODULES_DIRECTORY, 'typescript')
+    tsc_lib_directory = path.join(tsc_directory, 'lib')
+    inputs = [
+        path.relpath(NODE_LOCATION, os.getcwd()),
+        path.relpath(TSC_LOCATION, os.getcwd()),
+        path.relpath(path.join(tsc_lib_directory, 'tsc.js'),
+                     rewrapper_exec_root),
+    ] + [
         path.relpath(path.join(tsc_lib_directory, f), rewrapper_exec_root)
-        for f in os.listdir(tsc_lib_directory) if f.endswith('.d.ts')
+        for f in sorted(os.listdir(tsc_lib_directory)) if f.endswith('.d.ts')
     ]
 
-    if test_only:
-        # TODO(crbug.com/1139220): Measure whats more performant:
-        #     1) Just specify the `node_modules/@types` directory as an input and upload all files.
-        #     2) Recursively walk `node_modules/@types` and collect all *.d.ts files and list them
-        #        explicitly.
-        all_d_ts_files.append(
-            path.relpath(TYPES_NODE_MODULES_DIRECTORY, rewrapper_exec_root))
+    if compiler_options.get('typeRoots'):
+        types = compiler_options.get('types')
+        if types:
+            inputs += [
+                path.relpath(location, rewrapper_exec_root)
+                for location in collect_types_closure(types)
+            ]
+        else:
+            # Without an explicit `types` list, tsc includes every package.
+            inputs.append(
+                path.relpath(TYPES_NODE_MODULES_DIRECTORY,
+                             rewrapper_exec_root))
+    return inputs
+
+
+def get_remote_toolchain_inputs(rewrapper_exec_root, compiler_options):
+    key = compute_remote_toolchain_inputs_key(rewrapper_exec_root,
+                                              compiler_options)
+    cache_location = path.join(REMOTE_TOOLCHAIN_INPUTS_DIRECTORY,
+                               key + '.json')
+    try:
+        with open(cache_location, encoding="utf8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        pass
+
+    inputs = compute_remote_toolchain_inputs(rewrapper_exec_root,
+                                             compiler_options)
+    os.makedirs(REMOTE_TOOLCHAIN_INPUTS_DIRECTORY, exist_ok=True)
+    # Write atomically, as concurrent actions might compute the same list.
+    temporary_location = '%s.%d' % (cache_location, os.getpid())
+    with open(temporary_location, 'w', encoding="utf8") as fp:
+        json.dump(inputs, fp)
+    os.replace(temporary_location, cache_location)
+    return inputs
 
+
+def runTscRemote(tsconfig_location, all_ts_files, rewrapper_binary,
+                 rewrapper_cfg, rewrapper_exec_root, compiler_options):
+    relative_ts_file_paths = [
+        path.relpath(x, rewrapper_exec_root) for x in all_ts_files
+    ]
     relative_node_location = path.relpath(NODE_LOCATION, os.getcwd())
     relative_tsc_location = path.relpath(TSC_LOCATION, os.getcwd())
     relative_tsconfig_location = path.relpath(tsconfig_location, os.getcwd())
-    relative_tsc_directory = path.relpath(
-        path.join(NODE_MODULES_DIRECTORY, 'typescript'), rewrapper_exec_root)
 
-    inputs = ','.join([
-        relative_node_location,
-        relative_tsc_location,
-        path.join(relative_tsc_directory, 'lib', 'tsc.js'),
-        path.relpath(tsconfig_location, os.getcwd()),
-    ] + relative_ts_file_paths + all_d_ts_files)
+    inputs = ','.join(
+        get_remote_toolchain_inputs(rewrapper_exec_root, compiler_options) +
+        [relative_tsconfig_location] + relative_ts_file_paths)
 
     process = subprocess.Popen([
         rewrapper_binary, '-cfg', rewrapper_cfg, '-exec_root',
@@ -110,6 +271,210 @@ def runTscRemote(tsconfig_location, all_ts_files, rewrapper_binary,
     return process.returncode, stdout + stderr
 
 
+# The compile server needs to be restarted whenever Node, the TypeScript compiler,
+# esbuild or the server itself changes, so we key a running server on all of
+# them. Builds that skip type checking don't need TypeScript and vice versa, so
+# missing files are allowed.
+def compute_tsc_server_key():
+    key = hashlib.sha1()
+    for location in [
+            NODE_LOCATION, TYPESCRIPT_LIBRARY_LOCATION, TSC_SERVER_LOCATION,
+            TSC_COMPILER_LOCATION, ESBUILD_LOCATION, ESBUILD_MODULE_LOCATION
+    ]:
+        try:
+            stat = os.stat(location)
+        except FileNotFoundError:
+            key.update(('%s:missing;' % location).encode())
+            continue
+        key.update(('%s:%d:%d;' %
+                    (location, stat.st_mtime_ns, stat.st_size)).encode())
+    return key.hexdigest()
+
+
+def read_tsc_server_info():
+    try:
+        with open(TSC_SERVER_INFO_FILE, encoding="utf8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_tsc_server_info(info):
+    # Only remove the file if it still describes the server we talked to, as a
+    # concurrent action could have started a new server in the meantime.
+    if read_tsc_server_info() == info:
+        try:
+            os.remove(TSC_SERVER_INFO_FILE)
+        except OSError:
+            pass
+
+
+def send_tsc_server_request(port,
+                            request,
+                            timeout=TSC_SERVER_REQUEST_TIMEOUT_SECONDS):
+    address = ('127.0.0.1', port)
+    with socket.create_connection(
+            address, timeout=TSC_SERVER_CONNECT_TIMEOUT_SECONDS) as connection:
+        connection.settimeout(timeout)
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def acquire_tsc_server_lock():
+    try:
+        os.close(
+            os.open(TSC_SERVER_LOCK_FILE,
+                    os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    # Clean up after an action that crashed while starting the server.
+    try:
+        lock_age = time.time() - os.stat(TSC_SERVER_LOCK_FILE).st_mtime
+        if lock_age > TSC_SERVER_STARTUP_TIMEOUT_SECONDS:
+            os.remove(TSC_SERVER_LOCK_FILE)
+    except OSError:
+        pass
+    return False
+
+
+# Writes the tsconfig that lists the declaration files shared by all targets to
+# `output_directory` and returns its location.
+def write_global_typings_tsconfig(output_directory):
+    with open(BASE_TS_CONFIG_LOCATION, encoding="utf8") as fp:
+        tsconfig = json.load(fp)
+    tsconfig['files'] = [
+        path.relpath(location, output_directory)
+        for location in GLOBAL_TYPESCRIPT_DEFINITION_FILES
+    ]
+    tsconfig['compilerOptions'].update({
+        'lib': GLOBAL_TYPINGS_LIB,
+        'typeRoots': [],
+        'skipLibCheck': True,
+        'composite': False,
+        'declaration': False,
+        'noEmit': True,
+    })
+    tsconfig_location = path.join(output_directory,
+                                  GLOBAL_TYPINGS_TSCONFIG_NAME)
+    os.makedirs(output_directory, exist_ok=True)
+    if maybe_update_tsconfig_file(tsconfig_location, tsconfig) == 1:
+        return None
+    return tsconfig_location
+
+
+def start_tsc_server(key):
+    # The server must not inherit the stdout/stderr pipes of this action, as
+    # Ninja waits for those to be closed before it considers an action done.
+    with open(TSC_SERVER_LOG_FILE, 'a') as log_file:
+        if sys.platform == 'win32':
+            platform_options = {
+                'creationflags':
+                subprocess.DETACHED_PROCESS
+                | subprocess.CREATE_NEW_PROCESS_GROUP
+            }
+        else:
+            platform_options = {'start_new_session': True}
+        cmd = [
+            NODE_LOCATION, TSC_SERVER_LOCATION, '--state-directory',
+            TSC_SERVER_STATE_DIRECTORY, '--key', key, '--typescript',
+            TYPESCRIPT_LIBRARY_LOCATION, '--esbuild-binary', ESBUILD_LOCATION
+        ]
+        global_typings_location = write_global_typings_tsconfig(
+            TSC_SERVER_STATE_DIRECTORY)
+        if global_typings_location:
+            cmd += ['--global-typings', global_typings_location]
+        logging.info('start_tsc_server: %s', ' '.join(cmd))
+        subprocess.Popen(cmd,
+                         stdin=subprocess.DEVNULL,
+                         stdout=log_file,
+                         stderr=subprocess.STDOUT,
+                         close_fds=True,
+                         **platform_options)
+
+
+# Returns the port of a compile server for this out directory, starting one if
+# necessary. Returns None if no server could be started in time.
+def ensure_tsc_server():
+    os.makedirs(TSC_SERVER_STATE_DIRECTORY, exist_ok=True)
+    key = compute_tsc_server_key()
+    deadline = time.time() + TSC_SERVER_STARTUP_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        info = read_tsc_server_info()
+        if info is not None:
+            if info.get('key') == key:
+                return info['port']
+            # The server was started for an older toolchain.
+            try:
+                send_tsc_server_request(
+                    info['port'], {'command': 'shutdown'},
+                    timeout=TSC_SERVER_CONNECT_TIMEOUT_SECONDS)
+            except (OSError, ValueError):
+                pass
+            remove_tsc_server_info(info)
+            continue
+        if acquire_tsc_server_lock():
+            try:
+                start_tsc_server(key)
+                while time.time() < deadline:
+                    info = read_tsc_server_info()
+                    if info is not None and info.get('key') == key:
+                        return info['port']
+                    time.sleep(0.05)
+            finally:
+                # Other actions remove the lock if they consider it stale.
+                try:
+                    os.remove(TSC_SERVER_LOCK_FILE)
+                except FileNotFoundError:
+                    pass
+        else:
+            time.sleep(0.05)
+    return None
+
+
+# Sends a request to the persistent compile server of this out directory.
+# Returns None if the server is unavailable, in which case the caller should
+# fall back to running the compiler itself.
+def run_on_tsc_server(request):
+    for _ in range(2):
+        port = ensure_tsc_server()
+        if port is None:
+            logging.info('run_on_tsc_server: unable to start compile server')
+            return None
+        try:
+            response = send_tsc_server_request(port, request)
+        except ConnectionRefusedError:
+            # The server died without cleaning up after itself. Retry once with
+            # a fresh server.
+            remove_tsc_server_info(read_tsc_server_info())
+            continue
+        except socket.timeout:
+            logging.info('run_on_tsc_server: no response within %ds',
+                         TSC_SERVER_REQUEST_TIMEOUT_SECONDS)
+            return None
+        except (OSError, ValueError) as e:
+            logging.info('run_on_tsc_server: %s', e)
+            return None
+        if 'error' in response:
+            logging.info('run_on_tsc_server: %s', response['error'])
+            return None
+        return response['exitCode'], response['output']
+    return None
+
+
+def runTscOnServer(tsconfig_location):
+    return run_on_tsc_server({
+        'command': 'compile',
+        'tsconfig': tsconfig_location
+    })
+
+
 # To ensure that Ninja only rebuilds dependents when the actual content/public API of a TypeScript target changes,
 # we need to make sure that the config only changes when it needs to. Therefore, if the content would be equivalent
 # to what is already on disk, we don't write and allow Ninja to short-circuit if it can.
@@ -134,23 +499,45 @@ def maybe_update_tsconfig_file(tsconfig_output_location, tsconfig):
     return 0
 
 
-# Obtain the timestamps and original content of any previously generated TypeScript files, if any.
+def hash_file(location):
+    digest = hashlib.sha256()
+    with open(location, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Obtain the timestamps and content hashes of the previously generated TypeScript files, as recorded
+# in the manifest written by the previous compilation. Entries are only used if the file on disk still
+# has the recorded timestamp and size, i.e. if it wasn't touched since.
 # This will be used later in `maybe_reset_timestamps_on_generated_files` to potentially reset
 # file timestamps for Ninja.
-def compute_previous_generated_file_metadata(sources,
-                                             tsconfig_output_directory):
-    gen_files = {}
-    for src_fname in sources:
-        for ext in ['.d.ts', '.js', '.js.map']:
-            gen_fname = os.path.basename(src_fname.replace('.ts', ext))
-            gen_path = os.path.join(tsconfig_output_directory, gen_fname)
-            if os.path.exists(gen_path):
-                mtime = os.stat(gen_path).st_mtime
-                with open(gen_path, encoding="utf8") as fp:
-                    contents = fp.read()
-                gen_files[gen_fname] = (mtime, contents)
+def get_generated_file_manifest_location(tsconfig_output_location):
+    return tsconfig_output_location + '.outputs.json'
 
-    return gen_files
+
+def read_generated_file_manifest(manifest_location, tsconfig_output_directory):
+    try:
+        with open(manifest_location, encoding="utf8") as fp:
+            manifest = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+    valid_entries = {}
+    for gen_fname, entry in manifest.items():
+        try:
+            stat = os.stat(path.join(tsconfig_output_directory, gen_fname))
+        except OSError:
+            continue
+        if stat.st_mtime_ns == entry['mtime_ns'] and stat.st_size == entry[
+                'size']:
+            valid_entries[gen_fname] = entry
+    return valid_entries
+
+
+def write_generated_file_manifest(manifest_location, manifest):
+    with open(manifest_location, 'w', encoding="utf8") as fp:
+        json.dump(manifest, fp, sort_keys=True, indent=2)
 
 
 # Ninja and TypeScript use different mechanism to determine whether a file is "new". TypeScript
@@ -162,17 +549,37 @@ def compute_previous_generated_file_metadata(sources,
 # This also means that if the public API of a target changes, it does run the immediate dependents
 # of the target. However, if there is no functional change in the immediate dependents, the timestamps
 # of the immediate dependent would be properly reset and any transitive dependents would not be rerun.
-def maybe_reset_timestamps_on_generated_files(
-        previously_generated_file_metadata, tsconfig_output_directory):
-    for gen_fname in previously_generated_file_metadata:
+#
+# Rather than keeping the previous contents in memory, we compare content hashes against the manifest
+# of the previous compilation. The new outputs are hashed while streaming them from disk, so memory
+# usage doesn't grow with the size of the target. Returns the manifest for the current outputs.
+def maybe_reset_timestamps_on_generated_files(previous_manifest,
+                                              generated_file_names,
+                                              tsconfig_output_directory):
+    manifest = {}
+    for gen_fname in generated_file_names:
         gen_path = os.path.join(tsconfig_output_directory, gen_fname)
-        if os.path.exists(gen_path):
-            old_mtime, old_contents = previously_generated_file_metadata[
-                gen_fname]
-            with open(gen_path, encoding="utf8") as fp:
-                new_contents = fp.read()
-            if new_contents == old_contents:
-                os.utime(gen_path, (old_mtime, old_mtime))
+        if not os.path.exists(gen_path):
+            continue
+        digest = hash_file(gen_path)
+        previous_entry = previous_manifest.get(gen_fname)
+        if previous_entry is not None and previous_entry['sha256'] == digest:
+            os.utime(gen_path,
+                     ns=(previous_entry['mtime_ns'],
+                         previous_entry['mtime_ns']))
+        stat = os.stat(gen_path)
+        manifest[gen_fname] = {
+            'sha256': digest,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+        }
+    return manifest
+
+
+def compute_generated_file_manifest(generated_file_names,
+                                    tsconfig_output_directory):
+    return maybe_reset_timestamps_on_generated_files({}, generated_file_names,
+                                                     tsconfig_output_directory)
 
 
 # TypeScript generates `.tsbuildinfo` files for its incremental compilation. These files are used for
@@ -197,9 +604,191 @@ def remove_generated_tsbuildinfo_file(tsbuildinfo_output_location):
         os.remove(tsbuildinfo_output_location)
 
 
+# With `--tsbuildinfo-store`, the `.tsbuildinfo` file is moved out of the way
+# after each compilation instead of being deleted, together with a manifest of
+# the outputs it describes. Before the next compilation of the target, it is
+# only put back if all of these outputs still exist with the recorded contents.
+# That makes it safe against `ninja -t clean` and any other change to the
+# outputs, while unchanged files don't need to be type checked and emitted
+# again.
+def get_tsbuildinfo_store_entry(tsconfig_output_location):
+    target_key = hashlib.sha1(
+        path.relpath(tsconfig_output_location).encode('utf-8')).hexdigest()
+    return path.join(TSBUILDINFO_STORE_DIRECTORY, target_key)
+
+
+def remove_tsbuildinfo_store_entry(store_entry):
+    shutil.rmtree(store_entry, ignore_errors=True)
+
+
+def restore_tsbuildinfo_file(store_entry, tsbuildinfo_output_location,
+                             generated_file_names, tsconfig_output_directory):
+    try:
+        with open(path.join(store_entry, TSBUILDINFO_STORE_MANIFEST_NAME),
+                  encoding="utf8") as fp:
+            manifest = json.load(fp)
+    except (OSError, ValueError):
+        return False
+
+    if sorted(manifest) != sorted(generated_file_names):
+        return False
+    for gen_fname, entry in manifest.items():
+        gen_path = path.join(tsconfig_output_directory, gen_fname)
+        try:
+            stat = os.stat(gen_path)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        # Only hash outputs that were touched since they were recorded.
+        if stat.st_mtime_ns != entry['mtime_ns'] and hash_file(
+                gen_path) != entry['sha256']:
+            return False
+
+    try:
+        shutil.copyfile(path.join(store_entry, TSBUILDINFO_STORE_FILE_NAME),
+                        tsbuildinfo_output_location)
+    except OSError:
+        return False
+    return True
+
+
+def store_tsbuildinfo_file(store_entry, tsbuildinfo_output_location,
+                           generated_file_manifest):
+    # Invalidate the entry first, so that an interrupted update never pairs a
+    # `.tsbuildinfo` file with the outputs of another compilation.
+    remove_tsbuildinfo_store_entry(store_entry)
+    if not path.exists(tsbuildinfo_output_location):
+        return
+    os.makedirs(store_entry, exist_ok=True)
+    os.replace(tsbuildinfo_output_location,
+               path.join(store_entry, TSBUILDINFO_STORE_FILE_NAME))
+    write_generated_file_manifest(
+        path.join(store_entry, TSBUILDINFO_STORE_MANIFEST_NAME),
+        generated_file_manifest)
+
+
+# Returns the files (relative to the output directory) that tsc generates for
+# the given sources. Declaration files don't generate any output.
+def get_generated_file_names(sources, front_end_directory, no_emit):
+    extensions = ['.d.ts'] if no_emit else ['.js', '.js.map', '.d.ts']
+    generated_file_names = []
+    for src_fname in sources:
+        if src_fname.endswith('.d.ts'):
+            continue
+        file_name_without_extension = path.splitext(
+            path.relpath(src_fname, front_end_directory))[0]
+        generated_file_names += [
+            file_name_without_extension + ext for ext in extensions
+        ]
+    return generated_file_names
+
+
+# Returns all tsconfig files of the (transitive) project references, together with
+# the declaration files they contribute to the compilation of a dependent. These
+# are either the generated `.d.ts` files or `.d.ts` sources.
+def collect_dependency_declaration_files(tsconfig_location, tsconfig):
+    tsconfig_directory = path.dirname(tsconfig_location)
+    pending = [
+        path.normpath(path.join(tsconfig_directory, reference['path']))
+        for reference in tsconfig.get('references', [])
+    ]
+    visited = set()
+    declaration_files = []
+    while pending:
+        dependency_tsconfig_location = pending.pop()
+        if dependency_tsconfig_location in visited:
+            continue
+        visited.add(dependency_tsconfig_location)
+        declaration_files.append(dependency_tsconfig_location)
+
+        with open(dependency_tsconfig_location, encoding="utf8") as fp:
+            dependency_tsconfig = json.load(fp)
+        dependency_directory = path.dirname(dependency_tsconfig_location)
+        root_directory = path.join(
+            dependency_directory,
+            dependency_tsconfig['compilerOptions'].get('rootDir', '.'))
+        for file_name in dependency_tsconfig.get('files', []):
+            source = path.normpath(path.join(dependency_directory, file_name))
+            if source.endswith('.d.ts'):
+                declaration_files.append(source)
+            else:
+                declaration_files.append(
+                    path.join(
+                        dependency_directory,
+                        path.splitext(path.relpath(source, root_directory))[0]
+                        + '.d.ts'))
+        pending += [
+            path.normpath(path.join(dependency_directory, reference['path']))
+            for reference in dependency_tsconfig.get('references', [])
+        ]
+    return sorted(set(declaration_files))
+
+
+# Returns the files that determine the outputs of tsc, besides the tsconfig
+# itself, as pairs of a label and their location: the compiler version, the
+# contents of all files in the compilation, the declaration outputs of all
+# dependencies and the `@types` packages in use. Typings can also be resolved
+# from other packages, e.g. through `typeRoots` or `paths`, so they also include
+# the lock file that npm rewrites whenever any installed package changes.
+def collect_action_cache_inputs(tsconfig_location, tsconfig):
+    tsconfig_directory = path.dirname(tsconfig_location)
+    inputs = [
+        ('typescript', TYPESCRIPT_PACKAGE_JSON_LOCATION),
+        ('node_modules', NODE_MODULES_LOCK_FILE_LOCATION),
+    ]
+    for file_name in tsconfig['files']:
+        inputs.append(
+            ('file:' + file_name, path.join(tsconfig_directory, file_name)))
+    for location in collect_dependency_declaration_files(
+            tsconfig_location, tsconfig):
+        inputs.append(
+            ('dependency:' + path.relpath(location, tsconfig_directory),
+             location))
+
+    compiler_options = tsconfig['compilerOptions']
+    if compiler_options.get('typeRoots'):
+        # Without an explicit `types` list, tsc includes every package.
+        types = compiler_options.get('types') or sorted(
+            os.listdir(TYPES_NODE_MODULES_DIRECTORY))
+        for type_name in types:
+            inputs.append(('types:' + type_name,
+                           path.join(TYPES_NODE_MODULES_DIRECTORY, type_name,
+                                     'package.json')))
+    return inputs
+
+
+# The action cache key covers the generated tsconfig and the contents of the
+# files of `collect_action_cache_inputs`. All paths are relative to the
+# tsconfig, so that out directories with the same layout share cache entries.
+#
+# Returns None if the key can't be computed, e.g. because an output of a
+# dependency is missing.
+def compute_action_cache_key(tsconfig_location, tsconfig):
+    digest = hashlib.sha256()
+
+    def add(label, value):
+        digest.update(('%s\0%s\0' % (label, value)).encode('utf-8'))
+
+    try:
+        add('version', ACTION_CACHE_KEY_VERSION)
+        add('tsconfig', json.dumps(tsconfig, sort_keys=True))
+        for label, location in collect_action_cache_inputs(
+                tsconfig_location, tsconfig):
+            add(label, hash_file(location))
+    except (OSError, ValueError, KeyError) as e:
+        logging.info('compute_action_cache_key: %s', e)
+        return None
+
+    return digest.hexdigest()
+
+
+def get_esbuild_tsconfig_location():
+    return path.join(ROOT_DIRECTORY_OF_REPOSITORY, 'tsconfig.json')
+
+
 def runEsbuild(opts):
-    ts_config_location = path.join(ROOT_DIRECTORY_OF_REPOSITORY,
-                                   'tsconfig.json')
+    ts_config_location = get_esbuild_tsconfig_location()
     cmd = [
         ESBUILD_LOCATION,
         '--tsconfig=' + ts_config_location,
@@ -218,7 +807,31 @@ def runEsbuild(opts):
     return p.returncode
 
 
-def main():
+# Transpiles with the esbuild service of the compile server, which avoids
+# starting esbuild for every target and rebuilds targets incrementally. The
+# outputs are the same as those of `runEsbuild`, which the caller should fall
+# back to if this returns None.
+def runEsbuildOnServer(opts, sources):
+    result = run_on_tsc_server({
+        'command':
+        'esbuild',
+        'sources': [path.abspath(source) for source in sources],
+        'outdir':
+        path.abspath(path.dirname(opts.tsconfig_output_location)),
+        'tsconfig':
+        path.abspath(get_esbuild_tsconfig_location()),
+        'format':
+        'cjs' if opts.module == 'commonjs' else None,
+    })
+    if result is None:
+        return None
+    returncode, output = result
+    if output:
+        sys.stderr.write(output)
+    return returncode
+
+
+def parse_options(cli_args):
     parser = argparse.ArgumentParser()
     parser.add_argument('-s',
                         '--sources',
@@ -247,6 +860,14 @@ def main():
     parser.add_argument('--rewrapper-cfg', required=False)
     parser.add_argument('--rewrapper-exec-root', required=False)
     parser.add_argument('--use-esbuild', action='store_true')
+    parser.add_argument('--use-esbuild-server', action='store_true')
+    parser.add_argument('--use-tsc-server', action='store_true')
+    parser.add_argument('--trace-file', required=False)
+    parser.add_argument('--tsbuildinfo-store', action='store_true')
+    parser.add_argument('--action-cache-dir', required=False)
+    parser.add_argument('--action-cache-max-size-mb',
+                        type=int,
+                        default=action_cache.DEFAULT_MAX_SIZE_MB)
     parser.add_argument('--tsconfig-only', action='store_true')
     parser.set_defaults(test_only=False,
                         no_emit=False,
@@ -254,14 +875,26 @@ def main():
                         reset_timestamps=False,
                         module='esnext')
 
-    opts = parser.parse_args()
+    return parser.parse_args(cli_args)
+
+
+def load_base_tsconfig():
     with open(BASE_TS_CONFIG_LOCATION) as root_tsconfig:
-        try:
-            tsconfig = json.loads(root_tsconfig.read())
-        except Exception as e:
-            print('Encountered error while loading root tsconfig:')
-            print(e)
-            return 1
+        return json.loads(root_tsconfig.read())
+
+
+def read_sources(opts):
+    sources = opts.sources or []
+    if len(sources) == 0 and opts.sources_list:
+        sources = shlex.split(opts.sources_list.read())
+    return sources
+
+
+# Creates the tsconfig of a target from the parsed `tsconfig.base.json`, which is
+# left untouched. Paths in `opts` are relative to the current working directory,
+# i.e. the out directory.
+def create_tsconfig(opts, sources, base_tsconfig):
+    tsconfig = copy.deepcopy(base_tsconfig)
     tsconfig_output_location = path.join(os.getcwd(),
                                          opts.tsconfig_output_location)
     tsconfig_output_directory = path.dirname(tsconfig_output_location)
@@ -272,10 +905,6 @@ def main():
         return path.relpath(path.join(os.getcwd(), file_to_resolve),
                             tsconfig_output_directory)
 
-    sources = opts.sources or []
-    if len(sources) == 0 and opts.sources_list:
-        sources = shlex.split(opts.sources_list.read())
-
     all_ts_files = sources + GLOBAL_TYPESCRIPT_DEFINITION_FILES
     tsconfig['files'] = [
         get_relative_path_from_output_directory(x) for x in all_ts_files
@@ -314,6 +943,27 @@ def main():
     tsconfig['compilerOptions']['lib'] = ['esnext'] + (
         opts.is_web_worker and ['webworker', 'webworker.iterable']
         or ['dom', 'dom.iterable'])
+    return tsconfig
+
+
+def main(cli_args=None):
+    opts = parse_options(cli_args)
+    try:
+        base_tsconfig = load_base_tsconfig()
+    except ValueError as e:
+        print('Encountered error while loading root tsconfig:')
+        print(e)
+        return 1
+    tsconfig_output_location = path.join(os.getcwd(),
+                                         opts.tsconfig_output_location)
+    tsconfig_output_directory = path.dirname(tsconfig_output_location)
+    tsbuildinfo_name = path.basename(tsconfig_output_location) + '.tsbuildinfo'
+    generated_file_manifest_location = get_generated_file_manifest_location(
+        tsconfig_output_location)
+
+    sources = read_sources(opts)
+    all_ts_files = sources + GLOBAL_TYPESCRIPT_DEFINITION_FILES
+    tsconfig = create_tsconfig(opts, sources, base_tsconfig)
 
     if maybe_update_tsconfig_file(tsconfig_output_location, tsconfig) == 1:
         return 1
@@ -328,11 +978,42 @@ def main():
         return 0
 
     if opts.use_esbuild:
+        if opts.use_esbuild_server:
+            returncode = runEsbuildOnServer(opts, sources)
+            if returncode is not None:
+                return returncode
         return runEsbuild(opts)
 
-    previously_generated_file_metadata = compute_previous_generated_file_metadata(
-        sources, tsconfig_output_directory)
+    generated_file_names = get_generated_file_names(sources,
+                                                    opts.front_end_directory,
+                                                    opts.no_emit)
+    previous_generated_file_manifest = {}
+    if opts.reset_timestamps:
+        previous_generated_file_manifest = read_generated_file_manifest(
+            generated_file_manifest_location, tsconfig_output_directory)
 
+    cache = None
+    cache_key = None
+    if opts.action_cache_dir:
+        cache = action_cache.ActionCache(
+            opts.action_cache_dir, opts.action_cache_max_size_mb * 1024 * 1024)
+        cache_key = compute_action_cache_key(tsconfig_output_location,
+                                             tsconfig)
+        if cache_key is not None and cache.restore(
+                cache_key,
+                tsconfig_output_directory,
+                preserve_unchanged_files=opts.reset_timestamps):
+            if opts.reset_timestamps:
+                write_generated_file_manifest(
+                    generated_file_manifest_location,
+                    maybe_reset_timestamps_on_generated_files(
+                        previous_generated_file_manifest, generated_file_names,
+                        tsconfig_output_directory))
+            return 0
+
+    tsbuildinfo_output_location = path.join(tsconfig_output_directory,
+                                            tsbuildinfo_name)
+    tsbuildinfo_store_entry = None
     use_remote_execution = opts.use_remoteexec and (opts.deps is None
                                                     or len(opts.deps) == 0)
     if use_remote_execution:
@@ -342,17 +1023,52 @@ def main():
             rewrapper_binary=opts.rewrapper_binary,
             rewrapper_cfg=opts.rewrapper_cfg,
             rewrapper_exec_root=opts.rewrapper_exec_root,
-            test_only=opts.test_only)
+            compiler_options=tsconfig['compilerOptions'])
     else:
-        found_errors, stderr = runTsc(
-            tsconfig_location=tsconfig_output_location)
+        server_result = None
+        # Tracing relies on the statistics printed by `tsc` itself.
+        if opts.use_tsc_server and not opts.trace_file:
+            server_result = runTscOnServer(
+                tsconfig_location=tsconfig_output_location)
+        if server_result is not None:
+            found_errors, stderr = server_result
+        else:
+            # Only a `tsc` process reads and writes the `.tsbuildinfo` file.
+            if opts.tsbuildinfo_store:
+                tsbuildinfo_store_entry = get_tsbuildinfo_store_entry(
+                    tsconfig_output_location)
+                restore_tsbuildinfo_file(tsbuildinfo_store_entry,
+                                         tsbuildinfo_output_location,
+                                         generated_file_names,
+                                         tsconfig_output_directory)
+            if opts.trace_file:
+                found_errors, stderr = runTscWithTracing(
+                    tsconfig_location=tsconfig_output_location,
+                    trace_file_location=opts.trace_file)
+            else:
+                found_errors, stderr = runTsc(
+                    tsconfig_location=tsconfig_output_location)
 
+    generated_file_manifest = None
     if opts.reset_timestamps:
-        maybe_reset_timestamps_on_generated_files(
-            previously_generated_file_metadata, tsconfig_output_directory)
+        generated_file_manifest = maybe_reset_timestamps_on_generated_files(
+            previous_generated_file_manifest, generated_file_names,
+            tsconfig_output_directory)
+        write_generated_file_manifest(generated_file_manifest_location,
+                                      generated_file_manifest)
+
+    if tsbuildinfo_store_entry is not None:
+        if found_errors:
+            remove_tsbuildinfo_store_entry(tsbuildinfo_store_entry)
+        else:
+            if generated_file_manifest is None:
+                generated_file_manifest = compute_generated_file_manifest(
+                    generated_file_names, tsconfig_output_directory)
+            store_tsbuildinfo_file(tsbuildinfo_store_entry,
+                                   tsbuildinfo_output_location,
+                                   generated_file_manifest)
 
-    remove_generated_tsbuildinfo_file(
-        path.join(tsconfig_output_directory, tsbuildinfo_name))
+    remove_generated_tsbuildinfo_file(tsbuildinfo_output_location)
 
     if found_errors:
         print('')
@@ -363,6 +1079,11 @@ def main():
         print('')
         return 1
 
+    if cache_key is not None and all(
+            path.exists(path.join(tsconfig_output_directory, file_name))
+            for file_name in generated_file_names):
+        cache.store(cache_key, tsconfig_output_directory, generated_file_names)
+
     return 0
 
 
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Compiles a set of ts_library targets in a single TypeScript process.
+
+Each target is identified by the tsconfig that `ts_library.py` generated for
+it. The targets are compiled in the order of their project references and
+share parsed declaration files, so the TypeScript `lib` files and the global
+definition files are only parsed once for the entire batch. All dependencies
+outside of the batch must already have been built.
+
+Every target produces exactly the outputs of an individual `ts_library` action
+and compilation errors are reported per target. Targets that depend on a
+target that failed to compile are skipped.
+
+With `--declarations-only --skip-up-to-date`, the batch only type checks and
+emits declarations for targets whose inputs changed since they were last
+checked successfully. This is how the type check runs when
+`devtools_ts_split_typecheck` is enabled: the `ts_library` actions only
+transpile, and the `typecheck` action in the root BUILD.gn checks all targets
+off the critical path of the build.
+
+Example:
+  ts_library_batch.py -C out/Default \\
+      gen/front_end/core/common/common-tsconfig.json \\
+      gen/front_end/core/sdk/sdk-tsconfig.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from os import path
+
+import ts_library
+
+TSC_BATCH_LOCATION = path.join(path.dirname(path.abspath(__file__)),
+                               'tsc_batch.js')
+
+
+def parse_options(cli_args):
+    parser = argparse.ArgumentParser(
+        description='Compile multiple ts_library targets in one process')
+    parser.add_argument(
+        '-C',
+        '--out-directory',
+        default='.',
+        help='Out directory the tsconfig paths are relative to')
+    parser.add_argument('--tsconfigs-list',
+                        type=argparse.FileType('r'),
+                        help='File with one generated tsconfig per line')
+    parser.add_argument('--reset_timestamps',
+                        action='store_true',
+                        help='Preserve timestamps of unchanged outputs')
+    parser.add_argument('--declarations-only',
+                        action='store_true',
+                        help='Emit declarations, but no JavaScript')
+    parser.add_argument('--skip-up-to-date',
+                        action='store_true',
+                        help='Skip targets whose inputs did not change')
+    parser.add_argument('--stamp',
+                        help='File to touch when all targets compiled')
+    parser.add_argument('--depfile',
+                        help='Depfile listing the inputs for the stamp')
+    parser.add_argument('tsconfigs',
+                        nargs='*',
+                        help='Generated tsconfig files of the targets')
+    return parser.parse_args(cli_args)
+
+
+def read_tsconfig(tsconfig_location):
+    with open(tsconfig_location, encoding="utf8") as fp:
+        return json.load(fp)
+
+
+def get_reference_locations(tsconfig_location, tsconfig):
+    tsconfig_directory = path.dirname(tsconfig_location)
+    return [
+        path.normpath(path.join(tsconfig_directory, reference['path']))
+        for reference in tsconfig.get('references', [])
+    ]
+
+
+# Orders the targets so that every target comes after its dependencies within
+# the batch, keeping the order given on the command line where possible.
+def sort_targets(tsconfigs):
+    dependencies = {
+        tsconfig_location: [
+            reference for reference in get_reference_locations(
+                tsconfig_location, tsconfig) if reference in tsconfigs
+        ]
+        for tsconfig_location, tsconfig in tsconfigs.items()
+    }
+    ordered = []
+    state = {}
+
+    def visit(tsconfig_location):
+        if state.get(tsconfig_location) == 'done':
+            return
+        if state.get(tsconfig_location) == 'visiting':
+            raise ValueError('Cyclic project references involving %s' %
+                             tsconfig_location)
+        state[tsconfig_location] = 'visiting'
+        for dependency in dependencies[tsconfig_location]:
+            visit(dependency)
+        state[tsconfig_location] = 'done'
+        ordered.append(tsconfig_location)
+
+    for tsconfig_location in tsconfigs:
+        visit(tsconfig_location)
+    return [(tsconfig_location, dependencies[tsconfig_location])
+            for tsconfig_location in ordered]
+
+
+def get_generated_file_names_for_tsconfig(tsconfig_location,
+                                          tsconfig,
+                                          declarations_only=False):
+    tsconfig_directory = path.dirname(tsconfig_location)
+    compiler_options = tsconfig['compilerOptions']
+    sources = [
+        path.join(tsconfig_directory, file_name)
+        for file_name in tsconfig.get('files', [])
+    ]
+    no_emit = declarations_only or compiler_options.get(
+        'emitDeclarationOnly', False)
+    return ts_library.get_generated_file_names(
+        sources,
+        path.join(tsconfig_directory, compiler_options.get('rootDir', '.')),
+        no_emit)
+
+
+# Records the inputs a target was last checked successfully with, see
+# `--skip-up-to-date`.
+def get_typecheck_stamp_location(tsconfig_location):
+    return tsconfig_location + '.typecheck'
+
+
+def read_typecheck_stamp(tsconfig_location):
+    try:
+        with open(get_typecheck_stamp_location(tsconfig_location),
+                  encoding="utf8") as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def write_typecheck_stamp(tsconfig_location, key):
+    stamp_location = get_typecheck_stamp_location(tsconfig_location)
+    if key is None:
+        try:
+            os.remove(stamp_location)
+        except OSError:
+            pass
+        return
+    with open(stamp_location, 'w', encoding="utf8") as fp:
+        fp.write(key)
+
+
+# Returns whether the outputs of a target still exist: the files the batch
+# emits for it and the files recorded in its digest manifest. They may have been
+# deleted since the target was checked, e.g. by `ninja -t clean`.
+def outputs_exist(tsconfig_location, tsconfig, declarations_only):
+    tsconfig_directory = path.dirname(tsconfig_location)
+    generated_file_names = get_generated_file_names_for_tsconfig(
+        tsconfig_location, tsconfig, declarations_only)
+    try:
+        with open(ts_library.get_generated_file_manifest_location(
+                tsconfig_location),
+                  encoding="utf8") as fp:
+            generated_file_names += list(json.load(fp))
+    except (OSError, ValueError):
+        pass
+    return all(
+        path.exists(path.join(tsconfig_directory, gen_fname))
+        for gen_fname in generated_file_names)
+
+
+# A target is up to date if it was checked with the same inputs before, its
+# outputs still exist and none of its dependencies in the batch needs to be
+# checked again.
+def find_outdated_targets(targets, tsconfigs, declarations_only):
+    outdated = set()
+    for tsconfig_location, deps in targets:
+        tsconfig = tsconfigs[tsconfig_location]
+        key = ts_library.compute_action_cache_key(tsconfig_location, tsconfig)
+        if (key is None or key != read_typecheck_stamp(tsconfig_location)
+                or not outputs_exist(tsconfig_location, tsconfig,
+                                     declarations_only)
+                or any(dep in outdated for dep in deps)):
+            outdated.add(tsconfig_location)
+    return outdated
+
+
+# Lists the same inputs as the action cache key of every target, so that Ninja
+# runs the batch again when any of them changes.
+def write_depfile(depfile_location, stamp_location, out_directory, tsconfigs):
+    inputs = set()
+    for tsconfig_location, tsconfig in tsconfigs.items():
+        inputs.add(path.relpath(tsconfig_location, out_directory))
+        for _, location in ts_library.collect_action_cache_inputs(
+                tsconfig_location, tsconfig):
+            inputs.add(path.relpath(location, out_directory))
+    with open(depfile_location, 'w', encoding="utf8") as fp:
+        fp.write('%s: %s\n' % (stamp_location, ' '.join(
+            location.replace(' ', '\\ ') for location in sorted(inputs))))
+
+
+def main(cli_args):
+    opts = parse_options(cli_args)
+    out_directory = path.abspath(opts.out_directory)
+
+    tsconfig_paths = list(opts.tsconfigs)
+    if opts.tsconfigs_list:
+        tsconfig_paths += opts.tsconfigs_list.read().split()
+
+    tsconfigs = {}
+    for tsconfig_path in tsconfig_paths:
+        tsconfig_location = path.normpath(
+            path.join(out_directory, tsconfig_path))
+        tsconfigs[tsconfig_location] = read_tsconfig(tsconfig_location)
+    targets = sort_targets(tsconfigs)
+
+    up_to_date = 0
+    if opts.skip_up_to_date:
+        outdated_targets = find_outdated_targets(targets, tsconfigs,
+                                                 opts.declarations_only)
+        up_to_date = len(targets) - len(outdated_targets)
+        targets = [(tsconfig_location, deps)
+                   for tsconfig_location, deps in targets
+                   if tsconfig_location in outdated_targets]
+
+    previous_manifests = {}
+    if opts.reset_timestamps:
+        for tsconfig_location, _ in targets:
+            previous_manifests[
+                tsconfig_location] = ts_library.read_generated_file_manifest(
+                    ts_library.get_generated_file_manifest_location(
+                        tsconfig_location), path.dirname(tsconfig_location))
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json',
+                                     delete=False) as batch_manifest:
+        compiler_options = {}
+        if opts.declarations_only:
+            compiler_options['emitDeclarationOnly'] = True
+        json.dump([{
+            'tsconfig': tsconfig_location,
+            'deps': deps,
+            'compilerOptions': compiler_options,
+        } for tsconfig_location, deps in targets], batch_manifest)
+
+    failed = 0
+    skipped = 0
+    try:
+        cmd = [
+            ts_library.NODE_LOCATION, TSC_BATCH_LOCATION,
+            path.abspath(ts_library.TYPESCRIPT_LIBRARY_LOCATION),
+            batch_manifest.name
+        ]
+        global_typings_location = ts_library.write_global_typings_tsconfig(
+            out_directory)
+        if global_typings_location:
+            cmd.append(global_typings_location)
+        process = subprocess.Popen(cmd,
+                                   cwd=out_directory,
+                                   stdout=subprocess.PIPE,
+                                   universal_newlines=True)
+        for line in process.stdout:
+            result = json.loads(line)
+            tsconfig_location = result['tsconfig']
+            relative_tsconfig_location = path.relpath(tsconfig_location,
+                                                      out_directory)
+            if opts.skip_up_to_date:
+                # Check again in the next run unless the target compiled.
+                write_typecheck_stamp(
+                    tsconfig_location,
+                    None if result['exitCode'] or result['skippedBecauseOf']
+                    else ts_library.compute_action_cache_key(
+                        tsconfig_location, tsconfigs[tsconfig_location]))
+
+            if result['skippedBecauseOf']:
+                skipped += 1
+                print(
+                    'Skipped %s, because %s failed to compile' %
+                    (relative_tsconfig_location,
+                     path.relpath(result['skippedBecauseOf'], out_directory)))
+                continue
+
+            if opts.reset_timestamps:
+                ts_library.write_generated_file_manifest(
+                    ts_library.get_generated_file_manifest_location(
+                        tsconfig_location),
+                    ts_library.maybe_reset_timestamps_on_generated_files(
+                        previous_manifests[tsconfig_location],
+                        get_generated_file_names_for_tsconfig(
+                            tsconfig_location, tsconfigs[tsconfig_location]),
+                        path.dirname(tsconfig_location)))
+
+            if result['exitCode']:
+                failed += 1
+                print('')
+                print('TypeScript compilation failed. Used tsconfig %s' %
+                      relative_tsconfig_location)
+                print('')
+                print(result['output'])
+                print('')
+        process.wait()
+    finally:
+        os.remove(batch_manifest.name)
+
+    if opts.skip_up_to_date:
+        print('Compiled %d targets (%d failed, %d skipped, %d up to date)' %
+              (len(targets) - skipped, failed, skipped, up_to_date))
+    else:
+        print('Compiled %d targets (%d failed, %d skipped)' %
+              (len(targets) - skipped, failed, skipped))
+    if failed or skipped or process.returncode:
+        return 1
+
+    if opts.stamp:
+        if opts.depfile:
+            write_depfile(opts.depfile, opts.stamp, out_directory, tsconfigs)
+        with open(opts.stamp, 'w'):
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+ts_library = __import__('ts_library')
+ts_library_batch = __import__('ts_library_batch')
+
+
+class TsLibraryBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original_locations = {}
+        for name, file_name in [
+            ('TYPESCRIPT_PACKAGE_JSON_LOCATION',
+             'node_modules/typescript/package.json'),
+            ('NODE_MODULES_LOCK_FILE_LOCATION',
+             'node_modules/.package-lock.json'),
+        ]:
+            self.original_locations[name] = getattr(ts_library, name)
+            setattr(ts_library, name, self.get_location(file_name))
+        self.write_file('node_modules/typescript/package.json', '5.0')
+        self.write_file('node_modules/.package-lock.json', '{}')
+        self.tsconfigs = {}
+        return super().setUp()
+
+    def tearDown(self):
+        for name, location in self.original_locations.items():
+            setattr(ts_library, name, location)
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def get_location(self, file_name):
+        return path.join(self.directory, file_name)
+
+    def write_file(self, file_name, contents):
+        location = self.get_location(file_name)
+        os.makedirs(path.dirname(location), exist_ok=True)
+        with open(location, 'w', encoding='utf-8') as fp:
+            fp.write(contents)
+        return location
+
+    # Adds a target with a single source `front_end/<name>.ts`, whose tsconfig
+    # is `out/gen/<name>-tsconfig.json`.
+    def add_target(self, name, deps=()):
+        self.write_file('front_end/%s.ts' % name, 'export {};')
+        tsconfig = {
+            'compilerOptions': {
+                'rootDir': '../../front_end'
+            },
+            'files': ['../../front_end/%s.ts' % name],
+            'references': [{
+                'path': './%s-tsconfig.json' % dep
+            } for dep in deps],
+        }
+        tsconfig_location = self.write_file('out/gen/%s-tsconfig.json' % name,
+                                            json.dumps(tsconfig))
+        self.tsconfigs[tsconfig_location] = tsconfig
+        return tsconfig_location
+
+    # Writes the declarations of a target and marks it as checked.
+    def check_target(self, name):
+        self.write_file('out/gen/%s.d.ts' % name, 'export {};')
+        tsconfig_location = self.get_location('out/gen/%s-tsconfig.json' %
+                                              name)
+        ts_library_batch.write_typecheck_stamp(
+            tsconfig_location,
+            ts_library.compute_action_cache_key(
+                tsconfig_location, self.tsconfigs[tsconfig_location]))
+
+    def get_names(self, tsconfig_locations):
+        return [
+            path.basename(location)[:-len('-tsconfig.json')]
+            for location in tsconfig_locations
+        ]
+
+    def find_outdated_targets(self):
+        return sorted(
+            self.get_names(
+                ts_library_batch.find_outdated_targets(
+                    ts_library_batch.sort_targets(self.tsconfigs),
+                    self.tsconfigs,
+                    declarations_only=True)))
+
+    def test_sorts_targets_after_their_dependencies(self):
+        self.add_target('app', deps=['ui', 'core'])
+        self.add_target('ui', deps=['core'])
+        self.add_target('core')
+        self.add_target('other')
+        targets = ts_library_batch.sort_targets(self.tsconfigs)
+        self.assertEqual(self.get_names(location for location, _ in targets),
+                         ['core', 'ui', 'app', 'other'])
+        self.assertEqual([sorted(self.get_names(deps)) for _, deps in targets],
+                         [[], ['core'], ['core', 'ui'], []])
+
+    def test_ignores_dependencies_outside_of_the_batch(self):
+        self.add_target('core')
+        self.add_target('ui', deps=['core'])
+        del self.tsconfigs[self.get_location('out/gen/core-tsconfig.json')]
+        self.assertEqual(ts_library_batch.sort_targets(self.tsconfigs),
+                         [(self.get_location('out/gen/ui-tsconfig.json'), [])])
+
+    def test_rejects_cyclic_references(self):
+        self.add_target('a', deps=['b'])
+        self.add_target('b', deps=['a'])
+        with self.assertRaises(ValueError):
+            ts_library_batch.sort_targets(self.tsconfigs)
+
+    def test_unchecked_targets_are_outdated(self):
+        self.add_target('core')
+        self.assertEqual(self.find_outdated_targets(), ['core'])
+
+    def test_checked_targets_are_up_to_date(self):
+        self.add_target('core')
+        self.add_target('ui', deps=['core'])
+        self.check_target('core')
+        self.check_target('ui')
+        self.assertEqual(self.find_outdated_targets(), [])
+
+    def test_changed_targets_and_their_dependents_are_outdated(self):
+        self.add_target('core')
+        self.add_target('ui', deps=['core'])
+        self.add_target('other')
+        for name in ['core', 'ui', 'other']:
+            self.check_target(name)
+        self.write_file('front_end/core.ts', 'export const a = 1;')
+        self.assertEqual(self.find_outdated_targets(), ['core', 'ui'])
+
+    def test_targets_with_missing_outputs_are_outdated(self):
+        self.add_target('core')
+        self.check_target('core')
+        os.remove(self.get_location('out/gen/core.d.ts'))
+        self.assertEqual(self.find_outdated_targets(), ['core'])
+
+    def test_targets_with_missing_manifest_outputs_are_outdated(self):
+        core = self.add_target('core')
+        self.check_target('core')
+        ts_library.write_generated_file_manifest(
+            ts_library.get_generated_file_manifest_location(core),
+            {'core.js': {}})
+        self.assertEqual(self.find_outdated_targets(), ['core'])
+
+    def test_failed_targets_are_outdated(self):
+        core = self.add_target('core')
+        self.check_target('core')
+        ts_library_batch.write_typecheck_stamp(core, None)
+        self.assertEqual(self.find_outdated_targets(), ['core'])
+
+    def test_depfile_lists_action_cache_inputs(self):
+        self.add_target('core')
+        self.add_target('ui', deps=['core'])
+        self.check_target('core')
+        depfile_location = self.get_location('out/typecheck.d')
+        ts_library_batch.write_depfile(depfile_location, 'typecheck.stamp',
+                                       self.get_location('out'),
+                                       self.tsconfigs)
+        with open(depfile_location, encoding='utf-8') as fp:
+            target, inputs = fp.read().split(': ')
+        self.assertEqual(target, 'typecheck.stamp')
+        self.assertEqual(inputs.split(), [
+            '../front_end/core.ts',
+            '../front_end/ui.ts',
+            '../node_modules/.package-lock.json',
+            '../node_modules/typescript/package.json',
+            'gen/core-tsconfig.json',
+            'gen/core.d.ts',
+            'gen/ui-tsconfig.json',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
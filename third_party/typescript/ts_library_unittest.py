@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# Copyright 2024 The DevTools Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from os import path
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+
+ts_library = __import__('ts_library')
+
+
+class TsLibraryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def get_location(self, file_name):
+        return path.join(self.directory, file_name)
+
+    def write_file(self, file_name, contents):
+        location = self.get_location(file_name)
+        os.makedirs(path.dirname(location), exist_ok=True)
+        with open(location, 'w', encoding='utf-8') as fp:
+            fp.write(contents)
+        return location
+
+    def write_tsconfig(self, file_name, tsconfig):
+        return self.write_file(file_name, json.dumps(tsconfig))
+
+
+class ActionCacheKeyTestCase(TsLibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.original_locations = {}
+        for name, file_name in [
+            ('TYPESCRIPT_PACKAGE_JSON_LOCATION',
+             'node_modules/typescript/package.json'),
+            ('NODE_MODULES_LOCK_FILE_LOCATION',
+             'node_modules/.package-lock.json'),
+            ('TYPES_NODE_MODULES_DIRECTORY', 'node_modules/@types'),
+        ]:
+            self.original_locations[name] = getattr(ts_library, name)
+            setattr(ts_library, name, self.get_location(file_name))
+        self.write_file('node_modules/typescript/package.json', '5.0')
+        self.write_file('node_modules/.package-lock.json', '{}')
+        self.write_file('node_modules/@types/node/package.json', '1.0')
+        self.write_file('node_modules/@types/chai/package.json', '1.0')
+
+        self.write_file('front_end/dep/dep.ts', 'export const a = 1;')
+        self.write_file('out/gen/dep/dep.d.ts', 'export const a: number;')
+        self.write_tsconfig(
+            'out/gen/dep/dep-tsconfig.json', {
+                'compilerOptions': {
+                    'rootDir': '../../../front_end/dep'
+                },
+                'files': ['../../../front_end/dep/dep.ts'],
+            })
+        self.write_file('front_end/main/main.ts', 'import "../dep/dep.js";')
+        self.tsconfig = {
+            'compilerOptions': {
+                'rootDir': '../../../front_end/main',
+                'typeRoots': ['../../../node_modules/@types'],
+                'types': ['chai'],
+            },
+            'files': ['../../../front_end/main/main.ts'],
+            'references': [{
+                'path': '../dep/dep-tsconfig.json'
+            }],
+        }
+        self.tsconfig_location = self.write_tsconfig(
+            'out/gen/main/main-tsconfig.json', self.tsconfig)
+
+    def tearDown(self):
+        for name, location in self.original_locations.items():
+            setattr(ts_library, name, location)
+        super().tearDown()
+
+    def compute_key(self):
+        return ts_library.compute_action_cache_key(self.tsconfig_location,
+                                                   self.tsconfig)
+
+    def assert_key_changes(self, file_name, contents):
+        key = self.compute_key()
+        self.assertIsNotNone(key)
+        self.write_file(file_name, contents)
+        self.assertNotEqual(self.compute_key(), key)
+
+    def test_key_is_stable(self):
+        self.assertEqual(self.compute_key(), self.compute_key())
+
+    def test_key_covers_sources(self):
+        self.assert_key_changes('front_end/main/main.ts', 'changed')
+
+    def test_key_covers_tsconfig(self):
+        key = self.compute_key()
+        self.tsconfig['compilerOptions']['strict'] = True
+        self.assertNotEqual(self.compute_key(), key)
+
+    def test_key_covers_dependency_declarations(self):
+        self.assert_key_changes('out/gen/dep/dep.d.ts', 'changed')
+
+    def test_key_covers_typescript_version(self):
+        self.assert_key_changes('node_modules/typescript/package.json', '5.1')
+
+    def test_key_covers_installed_packages(self):
+        self.assert_key_changes('node_modules/.package-lock.json', 'changed')
+
+    def test_key_covers_used_types_packages(self):
+        self.assert_key_changes('node_modules/@types/chai/package.json', '2.0')
+
+    def test_key_ignores_unused_types_packages(self):
+        key = self.compute_key()
+        self.write_file('node_modules/@types/node/package.json', '2.0')
+        self.assertEqual(self.compute_key(), key)
+
+    def test_key_covers_all_types_packages_without_types(self):
+        del self.tsconfig['compilerOptions']['types']
+        self.assert_key_changes('node_modules/@types/node/package.json', '2.0')
+
+    def test_key_is_independent_of_the_out_directory(self):
+        key = self.compute_key()
+        shutil.copytree(self.get_location('out'),
+                        self.get_location('other_out'))
+        self.assertEqual(
+            ts_library.compute_action_cache_key(
+                self.get_location('other_out/gen/main/main-tsconfig.json'),
+                self.tsconfig), key)
+
+    def test_no_key_without_dependency_outputs(self):
+        os.remove(self.get_location('out/gen/dep/dep.d.ts'))
+        self.assertIsNone(self.compute_key())
+
+    def test_inputs_list_hashed_files(self):
+        inputs = [
+            path.relpath(location, self.directory)
+            for _, location in ts_library.collect_action_cache_inputs(
+                self.tsconfig_location, self.tsconfig)
+        ]
+        self.assertEqual(
+            sorted(path.normpath(location) for location in inputs), [
+                'front_end/main/main.ts',
+                'node_modules/.package-lock.json',
+                'node_modules/@types/chai/package.json',
+                'node_modules/typescript/package.json',
+                'out/gen/dep/dep-tsconfig.json',
+                'out/gen/dep/dep.d.ts',
+            ])
+
+
+class GeneratedFileManifestTestCase(TsLibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_file('a.js', 'a')
+        self.write_file('a.d.ts', 'declare const a')
+        tsconfig_location = self.get_location('a-tsconfig.json')
+        self.manifest_location = (
+            ts_library.get_generated_file_manifest_location(tsconfig_location))
+
+    def set_mtime(self, file_name, mtime_ns):
+        os.utime(self.get_location(file_name), ns=(mtime_ns, mtime_ns))
+
+    def get_mtime(self, file_name):
+        return os.stat(self.get_location(file_name)).st_mtime_ns
+
+    def record_manifest(self):
+        ts_library.write_generated_file_manifest(
+            self.manifest_location,
+            ts_library.compute_generated_file_manifest(['a.js', 'a.d.ts'],
+                                                       self.directory))
+        return ts_library.read_generated_file_manifest(self.manifest_location,
+                                                       self.directory)
+
+    def test_records_outputs(self):
+        self.set_mtime('a.js', 1000)
+        manifest = self.record_manifest()
+        self.assertEqual(sorted(manifest), ['a.d.ts', 'a.js'])
+        self.assertEqual(manifest['a.js']['mtime_ns'], 1000)
+        self.assertEqual(manifest['a.js']['size'], 1)
+
+    def test_resets_timestamps_of_unchanged_outputs(self):
+        self.set_mtime('a.js', 1000)
+        self.set_mtime('a.d.ts', 1000)
+        previous_manifest = self.record_manifest()
+        # tsc writes all outputs again, but only changes the declarations.
+        self.write_file('a.js', 'a')
+        self.write_file('a.d.ts', 'declare const b')
+
+        manifest = ts_library.maybe_reset_timestamps_on_generated_files(
+            previous_manifest, ['a.js', 'a.d.ts'], self.directory)
+        self.assertEqual(self.get_mtime('a.js'), 1000)
+        self.assertNotEqual(self.get_mtime('a.d.ts'), 1000)
+        self.assertEqual(manifest['a.js']['mtime_ns'], 1000)
+        self.assertEqual(manifest['a.d.ts']['mtime_ns'],
+                         self.get_mtime('a.d.ts'))
+
+    def test_ignores_outputs_touched_since_they_were_recorded(self):
+        self.set_mtime('a.js', 1000)
+        self.record_manifest()
+        self.set_mtime('a.js', 2000)
+        self.assertEqual(
+            sorted(
+                ts_library.read_generated_file_manifest(
+                    self.manifest_location, self.directory)), ['a.d.ts'])
+
+    def test_ignores_missing_outputs(self):
+        self.record_manifest()
+        os.remove(self.get_location('a.d.ts'))
+        self.assertEqual(
+            sorted(
+                ts_library.read_generated_file_manifest(
+                    self.manifest_location, self.directory)), ['a.js'])
+        self.assertEqual(
+            sorted(
+                ts_library.compute_generated_file_manifest(['a.js', 'a.d.ts'],
+                                                           self.directory)),
+            ['a.js'])
+
+    def test_ignores_invalid_manifests(self):
+        self.write_file(path.basename(self.manifest_location), 'not json')
+        self.assertEqual(
+            ts_library.read_generated_file_manifest(self.manifest_location,
+                                                    self.directory), {})
+
+
+class TsbuildinfoStoreTestCase(TsLibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.original_store_directory = ts_library.TSBUILDINFO_STORE_DIRECTORY
+        ts_library.TSBUILDINFO_STORE_DIRECTORY = self.get_location('store')
+        self.write_file('a.js', 'a')
+        self.write_file('a.d.ts', 'declare const a')
+        self.tsbuildinfo_location = self.write_file('a.tsbuildinfo', 'info')
+        self.store_entry = ts_library.get_tsbuildinfo_store_entry(
+            self.get_location('a-tsconfig.json'))
+
+    def tearDown(self):
+        ts_library.TSBUILDINFO_STORE_DIRECTORY = self.original_store_directory
+        super().tearDown()
+
+    def store(self):
+        ts_library.store_tsbuildinfo_file(
+            self.store_entry, self.tsbuildinfo_location,
+            ts_library.compute_generated_file_manifest(['a.js', 'a.d.ts'],
+                                                       self.directory))
+
+    def restore(self, generated_file_names=('a.js', 'a.d.ts')):
+        return ts_library.restore_tsbuildinfo_file(self.store_entry,
+                                                   self.tsbuildinfo_location,
+                                                   list(generated_file_names),
+                                                   self.directory)
+
+    def test_moves_tsbuildinfo_into_the_store(self):
+        self.store()
+        self.assertFalse(path.exists(self.tsbuildinfo_location))
+        self.assertTrue(
+            path.exists(
+                path.join(self.store_entry,
+                          ts_library.TSBUILDINFO_STORE_FILE_NAME)))
+
+    def test_restores_tsbuildinfo_of_unchanged_outputs(self):
+        self.store()
+        self.assertTrue(self.restore())
+        with open(self.tsbuildinfo_location, encoding='utf-8') as fp:
+            self.assertEqual(fp.read(), 'info')
+
+    def test_restores_tsbuildinfo_of_touched_outputs(self):
+        self.store()
+        os.utime(self.get_location('a.js'), ns=(1000, 1000))
+        self.assertTrue(self.restore())
+
+    def test_rejects_missing_outputs(self):
+        self.store()
+        os.remove(self.get_location('a.d.ts'))
+        self.assertFalse(self.restore())
+        self.assertFalse(path.exists(self.tsbuildinfo_location))
+
+    def test_rejects_changed_outputs(self):
+        self.store()
+        self.write_file('a.js', 'b')
+        os.utime(self.get_location('a.js'), ns=(1000, 1000))
+        self.assertFalse(self.restore())
+
+    def test_rejects_outputs_of_other_sources(self):
+        self.store()
+        self.write_file('b.js', 'b')
+        self.assertFalse(self.restore(['a.js', 'a.d.ts', 'b.js']))
+
+    def test_rejects_missing_entries(self):
+        self.assertFalse(self.restore())
+
+    def test_removes_entry_without_tsbuildinfo(self):
+        self.store()
+        self.write_file('a.js', 'b')
+        self.store()
+        self.assertFalse(path.exists(self.store_entry))
+        self.assertFalse(self.restore())
+
+    def test_targets_have_separate_entries(self):
+        self.assertNotEqual(
+            self.store_entry,
+            ts_library.get_tsbuildinfo_store_entry(
+                self.get_location('b-tsconfig.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
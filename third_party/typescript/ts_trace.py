@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Copyright 2024 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""
+Build-wide tracing of the TypeScript compiler phases of ts_library targets.
+
+When tracing is enabled, `ts_library.py` runs tsc with `--extendedDiagnostics`
+and appends the parse, bind, check and emit times and the memory usage of
+every target to a shared trace file in the Trace Event Format. The file can be
+loaded in the DevTools Performance panel, Perfetto or chrome://tracing.
+
+All actions of a build append to the same file concurrently, so the file uses
+the JSON Array Format without the closing bracket, which trace viewers accept.
+
+Run this script directly to rank the targets in a trace file by check time or
+peak memory.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+TRACE_CATEGORY = 'ts_library'
+TRACE_PROCESS_ID = 1
+
+# Matches the statistics that `tsc --extendedDiagnostics` prints, e.g.
+# "Check time:    1.23s" or "Memory used:   123456K".
+EXTENDED_DIAGNOSTICS_LINE = re.compile(
+    r'^(?P<name>[A-Za-z][\w /]*?):\s+(?P<value>\d+(\.\d+)?)(?P<unit>s|K)?\s*$')
+
+# The phases of a compilation in the order in which tsc runs them.
+COMPILATION_PHASES = ['Program', 'Bind', 'Check', 'Emit']
+
+
+# Splits the output of `tsc --extendedDiagnostics` into the regular compiler
+# output and a dictionary of statistics. Times are in seconds, memory in KB.
+def split_extended_diagnostics(output):
+    statistics = {}
+    remaining_lines = []
+    for line in output.splitlines():
+        match = EXTENDED_DIAGNOSTICS_LINE.match(line)
+        if match:
+            statistics[match.group('name')] = float(match.group('value'))
+        else:
+            remaining_lines.append(line)
+    return '\n'.join(remaining_lines), statistics
+
+
+def create_trace_events(target_name, start_time, wall_time, statistics):
+    start_us = start_time * 1e6
+    thread_id = os.getpid()
+    lines = statistics.get('Lines of TypeScript', 0) + statistics.get(
+        'Lines of JavaScript', 0)
+    target_args = {
+        'wallTime': wall_time,
+        'files': statistics.get('Files'),
+        'lines': lines,
+        'memoryUsedKB': statistics.get('Memory used'),
+        'parseTime': statistics.get('Parse time'),
+        'bindTime': statistics.get('Bind time'),
+        'checkTime': statistics.get('Check time'),
+        'emitTime': statistics.get('Emit time'),
+        'totalTime': statistics.get('Total time'),
+    }
+    events = [{
+        'name': 'thread_name',
+        'ph': 'M',
+        'pid': TRACE_PROCESS_ID,
+        'tid': thread_id,
+        'args': {
+            'name': target_name
+        },
+    }, {
+        'name': target_name,
+        'cat': TRACE_CATEGORY,
+        'ph': 'X',
+        'pid': TRACE_PROCESS_ID,
+        'tid': thread_id,
+        'ts': start_us,
+        'dur': wall_time * 1e6,
+        'args': target_args,
+    }]
+
+    # Everything that is not accounted for in the total time of tsc is spent
+    # starting Node and loading the compiler.
+    phase_start_us = start_us + max(
+        0.0, wall_time - statistics.get('Total time', 0.0)) * 1e6
+    for phase in COMPILATION_PHASES:
+        duration = statistics.get('%s time' % phase)
+        if duration is None:
+            continue
+        events.append({
+            'name': phase,
+            'cat': TRACE_CATEGORY,
+            'ph': 'X',
+            'pid': TRACE_PROCESS_ID,
+            'tid': thread_id,
+            'ts': phase_start_us,
+            'dur': duration * 1e6,
+        })
+        if phase == 'Program' and 'Parse time' in statistics:
+            # Parsing happens as part of creating the program.
+            events.append({
+                'name': 'Parse',
+                'cat': TRACE_CATEGORY,
+                'ph': 'X',
+                'pid': TRACE_PROCESS_ID,
+                'tid': thread_id,
+                'ts': phase_start_us,
+                'dur': statistics['Parse time'] * 1e6,
+            })
+        phase_start_us += duration * 1e6
+
+    if 'Memory used' in statistics:
+        events.append({
+            'name': 'tsc memory',
+            'cat': TRACE_CATEGORY,
+            'ph': 'C',
+            'pid': TRACE_PROCESS_ID,
+            'tid': thread_id,
+            'ts': start_us,
+            'args': {
+                'usedKB': statistics['Memory used']
+            },
+        })
+    return events
+
+
+def append_trace_events(trace_file_location, events):
+    # Exactly one action gets to start the JSON array.
+    try:
+        header = os.open(trace_file_location,
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(header, b'[\n')
+        os.close(header)
+    except FileExistsError:
+        pass
+
+    # Write all events with a single append, so that concurrent actions don't
+    # interleave their events.
+    data = ''.join(json.dumps(event) + ',\n' for event in events)
+    trace_file = os.open(trace_file_location, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(trace_file, data.encode('utf-8'))
+    finally:
+        os.close(trace_file)
+
+
+def load_trace_events(trace_file_location):
+    with open(trace_file_location, encoding='utf-8') as fp:
+        contents = fp.read().strip()
+    if not contents.endswith(']'):
+        contents = contents.rstrip(',') + ']'
+    events = json.loads(contents)
+    if isinstance(events, dict):
+        events = events.get('traceEvents', [])
+    return events
+
+
+def summarize_targets(events):
+    return [
+        event for event in events if event.get('cat') == TRACE_CATEGORY
+        and event.get('ph') == 'X' and 'wallTime' in event.get('args', {})
+    ]
+
+
+def format_seconds(value):
+    return '-' if value is None else '%.2fs' % value
+
+
+def format_memory(value):
+    return '-' if value is None else '%.0fMB' % (value / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rank ts_library targets in a TypeScript trace')
+    parser.add_argument('trace_file')
+    parser.add_argument('--sort',
+                        choices=['check', 'memory', 'wall'],
+                        default='check',
+                        help='Metric to rank the targets by')
+    parser.add_argument('--top',
+                        type=int,
+                        default=20,
+                        help='Number of targets to show')
+    opts = parser.parse_args()
+
+    targets = summarize_targets(load_trace_events(opts.trace_file))
+    sort_keys = {
+        'check': 'checkTime',
+        'memory': 'memoryUsedKB',
+        'wall': 'wallTime',
+    }
+    sort_key = sort_keys[opts.sort]
+    targets.sort(key=lambda event: event['args'].get(sort_key) or 0,
+                 reverse=True)
+
+    print('%-60s %8s %8s %8s %8s %8s %9s' %
+          ('target', 'wall', 'parse', 'bind', 'check', 'emit', 'memory'))
+    for event in targets[:opts.top]:
+        args = event['args']
+        columns = [format_seconds(args['wallTime'])] + [
+            format_seconds(args.get(key))
+            for key in ['parseTime', 'bindTime', 'checkTime', 'emitTime']
+        ] + [format_memory(args.get('memoryUsedKB'))]
+        print('%-60s %8s %8s %8s %8s %8s %9s' %
+              tuple([event['name']] + columns))
+
+    total_check_time = sum(event['args'].get('checkTime') or 0
+                           for event in targets)
+    peak_memory = max(
+        [event['args'].get('memoryUsedKB') or 0 for event in targets] + [0])
+    print('')
+    print('%d targets, %.1fs total check time, %s peak memory' %
+          (len(targets), total_check_time, format_memory(peak_memory)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
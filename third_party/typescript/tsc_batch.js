@@ -0,0 +1,57 @@
+// Copyright 2024 The Chromium Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+// @ts-check
+
+/**
+ * Compiles a batch of `ts_library` targets in a single process, so that the
+ * TypeScript `lib` files, the global definition files and the declarations of
+ * shared dependencies are only parsed once for the entire batch.
+ *
+ * Usage: node tsc_batch.js <path to typescript.js> <batch manifest> [<global typings tsconfig>]
+ *
+ * The batch manifest is a JSON array of `{tsconfig, deps, compilerOptions}`
+ * objects in dependency order, where `deps` lists the tsconfigs of the
+ * dependencies that are part of the same batch and the optional
+ * `compilerOptions` override those of the tsconfig. The declaration files of
+ * the optional global typings tsconfig are preloaded and kept for the entire
+ * batch. Targets whose dependencies failed to compile are
+ * skipped. For every target, one line of JSON is written to stdout:
+ *
+ *   {"tsconfig": "...", "exitCode": 0, "output": "", "skippedBecauseOf": null}
+ */
+
+const fs = require('fs');
+
+const {SourceFileCache, compileProject, preloadDeclarations} = require('./tsc_compiler.js');
+
+const [, , typescriptLocation, manifestLocation, globalTypingsLocation] = process.argv;
+const ts = require(typescriptLocation);
+/** @type {Array<{tsconfig: string, deps: string[], compilerOptions?: object}>} */
+const targets = JSON.parse(fs.readFileSync(manifestLocation, 'utf8'));
+
+const cache = new SourceFileCache();
+if (globalTypingsLocation) {
+  preloadDeclarations(ts, globalTypingsLocation, cache);
+}
+/** @type {Set<string>} */
+const failedTargets = new Set();
+
+for (const {tsconfig, deps, compilerOptions} of targets) {
+  const failedDependency = deps.find(dep => failedTargets.has(dep)) ?? null;
+  let result;
+  if (failedDependency) {
+    result = {exitCode: 1, output: ''};
+  } else {
+    try {
+      result = compileProject(ts, tsconfig, cache, compilerOptions);
+    } catch (error) {
+      result = {exitCode: 1, output: `Failed to compile ${tsconfig}:\n${error.stack}`};
+    }
+  }
+  if (result.exitCode !== 0) {
+    failedTargets.add(tsconfig);
+  }
+  process.stdout.write(JSON.stringify({tsconfig, ...result, skippedBecauseOf: failedDependency}) + '\n');
+}
@@ -0,0 +1,266 @@
+// Copyright 2024 The Chromium Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+// @ts-check
+
+/**
+ * In-process equivalent of `tsc -p <tsconfig>` that can share parsed
+ * declaration files between compilations. The `lib.*.d.ts` files, the global
+ * definition files and the `.d.ts` outputs of dependencies are identical for
+ * most `ts_library` targets, so keeping their parsed `SourceFile`s around
+ * avoids re-parsing them for every target.
+ *
+ * Only declaration files are cached. These are validated against their mtime
+ * and size before reuse, which is also what Ninja uses to determine freshness.
+ *
+ * The declaration files that every target includes (the `lib` files and the
+ * global definition files) can be preloaded with `preloadDeclarations`. These
+ * are parsed and bound once and are never evicted from the cache.
+ */
+
+const fs = require('fs');
+
+const DEFAULT_MAX_CACHED_FILES = 10000;
+
+// Exit codes used by `tsc` itself, see `ExitStatus` in the TypeScript compiler.
+const EXIT_STATUS_SUCCESS = 0;
+const EXIT_STATUS_DIAGNOSTICS_PRESENT_OUTPUTS_SKIPPED = 1;
+const EXIT_STATUS_DIAGNOSTICS_PRESENT_OUTPUTS_GENERATED = 2;
+
+class SourceFileCache {
+  /**
+   * @param {number=} maxEntries
+   */
+  constructor(maxEntries = DEFAULT_MAX_CACHED_FILES) {
+    this.maxEntries = maxEntries;
+    /** @type {Map<string, {fileName: string, mtimeMs: number, size: number, sourceFile: any}>} */
+    this.entries = new Map();
+    /** @type {Set<string>} */
+    this.pinnedFileNames = new Set();
+    this.hits = 0;
+    this.misses = 0;
+  }
+
+  /**
+   * @param {string} key
+   * @param {string} fileName
+   */
+  get(key, fileName) {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+    let stat;
+    try {
+      stat = fs.statSync(fileName);
+    } catch {
+      this.entries.delete(key);
+      this.misses++;
+      return undefined;
+    }
+    if (stat.mtimeMs !== entry.mtimeMs || stat.size !== entry.size) {
+      this.entries.delete(key);
+      this.misses++;
+      return undefined;
+    }
+    // Re-insert to mark the entry as most recently used.
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.hits++;
+    return entry.sourceFile;
+  }
+
+  /**
+   * @param {string} key
+   * @param {string} fileName
+   * @param {any} sourceFile
+   */
+  set(key, fileName, sourceFile) {
+    let stat;
+    try {
+      stat = fs.statSync(fileName);
+    } catch {
+      return;
+    }
+    this.entries.set(key, {fileName, mtimeMs: stat.mtimeMs, size: stat.size, sourceFile});
+    if (this.entries.size <= this.maxEntries) {
+      return;
+    }
+    for (const [oldestKey, entry] of this.entries) {
+      if (!this.pinnedFileNames.has(entry.fileName)) {
+        this.entries.delete(oldestKey);
+        return;
+      }
+    }
+  }
+
+  /**
+   * Exempts all cached versions of `fileName` from eviction.
+   *
+   * @param {string} fileName
+   */
+  pin(fileName) {
+    this.pinnedFileNames.add(fileName);
+  }
+}
+
+/**
+ * The parse and bind results of a declaration file depend on a handful of
+ * compiler options. Files are only shared between programs that agree on them.
+ *
+ * @param {any} options
+ */
+function compilationSettingsKey(options) {
+  return JSON.stringify([
+    options.target,
+    options.module,
+    options.moduleResolution,
+    options.strict,
+    options.alwaysStrict,
+    options.allowJs,
+    options.checkJs,
+    options.experimentalDecorators,
+    options.useDefineForClassFields,
+  ]);
+}
+
+/**
+ * @param {any} ts
+ * @param {any} options
+ * @param {SourceFileCache} cache
+ */
+function createCachingCompilerHost(ts, options, cache) {
+  const host = ts.createCompilerHost(options);
+  const originalGetSourceFile = host.getSourceFile;
+  const settingsKey = compilationSettingsKey(options);
+
+  host.getSourceFile = (fileName, languageVersionOrOptions, onError, shouldCreateNewSourceFile) => {
+    if (shouldCreateNewSourceFile || !fileName.endsWith('.d.ts')) {
+      return originalGetSourceFile.call(host, fileName, languageVersionOrOptions, onError, shouldCreateNewSourceFile);
+    }
+    const languageVersionKey = typeof languageVersionOrOptions === 'object' ?
+        `${languageVersionOrOptions.languageVersion}:${languageVersionOrOptions.impliedNodeFormat}` :
+        `${languageVersionOrOptions}`;
+    const key = `${settingsKey}|${languageVersionKey}|${fileName}`;
+    const cachedSourceFile = cache.get(key, fileName);
+    if (cachedSourceFile) {
+      return cachedSourceFile;
+    }
+    const sourceFile = originalGetSourceFile.call(host, fileName, languageVersionOrOptions, onError);
+    if (sourceFile) {
+      cache.set(key, fileName, sourceFile);
+    }
+    return sourceFile;
+  };
+
+  return host;
+}
+
+/**
+ * @param {any} ts
+ */
+function createFormatDiagnosticsHost(ts) {
+  return {
+    getCurrentDirectory: () => ts.sys.getCurrentDirectory(),
+    getCanonicalFileName: fileName => ts.sys.useCaseSensitiveFileNames ? fileName : fileName.toLowerCase(),
+    getNewLine: () => ts.sys.newLine,
+  };
+}
+
+/**
+ * Parses and binds all declaration files of the project described by
+ * `tsconfigLocation` and pins them in `cache`. Returns the number of pinned
+ * files.
+ *
+ * @param {any} ts
+ * @param {string} tsconfigLocation
+ * @param {SourceFileCache} cache
+ * @return {number}
+ */
+function preloadDeclarations(ts, tsconfigLocation, cache) {
+  const parsedCommandLine = ts.getParsedCommandLineOfConfigFile(tsconfigLocation, /* optionsToExtend */ {}, {
+    ...ts.sys,
+    onUnRecoverableConfigFileDiagnostic: () => {},
+  });
+  if (!parsedCommandLine) {
+    return 0;
+  }
+  const program = ts.createProgram({
+    rootNames: parsedCommandLine.fileNames,
+    options: parsedCommandLine.options,
+    host: createCachingCompilerHost(ts, parsedCommandLine.options, cache),
+  });
+  // Creating the type checker binds all files, so that programs reusing the
+  // cached files don't have to bind them again.
+  program.getTypeChecker();
+  let pinned = 0;
+  for (const sourceFile of program.getSourceFiles()) {
+    if (sourceFile.isDeclarationFile) {
+      cache.pin(sourceFile.fileName);
+      pinned++;
+    }
+  }
+  return pinned;
+}
+
+/**
+ * Compiles the project described by `tsconfigLocation`, mirroring the
+ * diagnostics, outputs and exit code of `tsc -p <tsconfigLocation>`.
+ *
+ * @param {any} ts
+ * @param {string} tsconfigLocation
+ * @param {SourceFileCache} cache
+ * @param {object=} optionsToExtend compiler options that override the tsconfig
+ * @return {{exitCode: number, output: string}}
+ */
+function compileProject(ts, tsconfigLocation, cache, optionsToExtend = {}) {
+  const formatHost = createFormatDiagnosticsHost(ts);
+  /** @type {any[]} */
+  const configDiagnostics = [];
+  const parsedCommandLine = ts.getParsedCommandLineOfConfigFile(tsconfigLocation, optionsToExtend, {
+    ...ts.sys,
+    onUnRecoverableConfigFileDiagnostic: diagnostic => configDiagnostics.push(diagnostic),
+  });
+  if (!parsedCommandLine) {
+    return {
+      exitCode: EXIT_STATUS_DIAGNOSTICS_PRESENT_OUTPUTS_SKIPPED,
+      output: ts.formatDiagnostics(configDiagnostics, formatHost),
+    };
+  }
+
+  const host = createCachingCompilerHost(ts, parsedCommandLine.options, cache);
+  const program = ts.createProgram({
+    rootNames: parsedCommandLine.fileNames,
+    options: parsedCommandLine.options,
+    projectReferences: parsedCommandLine.projectReferences,
+    host,
+    configFileParsingDiagnostics: ts.getConfigFileParsingDiagnostics(parsedCommandLine),
+  });
+
+  const diagnostics = [
+    ...ts.getConfigFileParsingDiagnostics(parsedCommandLine),
+    ...ts.getPreEmitDiagnostics(program),
+  ];
+  const emitResult = program.emit();
+  diagnostics.push(...emitResult.diagnostics);
+
+  const sortedDiagnostics = ts.sortAndDeduplicateDiagnostics(diagnostics);
+  let exitCode = EXIT_STATUS_SUCCESS;
+  if (sortedDiagnostics.length > 0) {
+    exitCode = emitResult.emitSkipped ? EXIT_STATUS_DIAGNOSTICS_PRESENT_OUTPUTS_SKIPPED :
+                                        EXIT_STATUS_DIAGNOSTICS_PRESENT_OUTPUTS_GENERATED;
+  }
+
+  return {
+    exitCode,
+    output: ts.formatDiagnostics(sortedDiagnostics, formatHost),
+  };
+}
+
+module.exports = {
+  SourceFileCache,
+  compileProject,
+  preloadDeclarations,
+};
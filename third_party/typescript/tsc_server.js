@@ -0,0 +1,358 @@
+// Copyright 2024 The Chromium Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+// @ts-check
+
+/**
+ * Long-lived TypeScript compile server for `ts_library.py`.
+ *
+ * Starting Node and loading the TypeScript compiler for every `ts_library`
+ * action is a significant part of a clean build. This server is started once
+ * per out directory (by the first `ts_library.py` invocation that needs it) and
+ * keeps a pool of worker threads with a warmed up compiler and a cache of
+ * parsed declaration files. The declaration files that all targets share are
+ * preloaded from the `--global-typings` tsconfig when a worker starts.
+ *
+ * When type checking is skipped, the server instead transpiles targets with a
+ * single esbuild service and keeps an incremental build per target, so that
+ * rebuilding a target only re-parses the files that changed.
+ *
+ * Clients connect over a localhost TCP socket whose port is written to
+ * `<state directory>/server.json`. Every connection carries exactly one
+ * newline-terminated JSON request and receives one newline-terminated JSON
+ * response:
+ *
+ *   {"command": "compile", "tsconfig": "/abs/path/foo-tsconfig.json"}
+ *     => {"exitCode": 0, "output": ""}
+ *   {"command": "esbuild", "sources": ["/abs/path/foo.ts"], "outdir": "...",
+ *    "tsconfig": "/abs/path/tsconfig.json", "format": "cjs"|null}
+ *     => {"exitCode": 0, "output": ""}
+ *   {"command": "shutdown"}
+ *     => {"ok": true}
+ *
+ * The server shuts itself down after being idle for `--idle-timeout` seconds.
+ */
+
+const fs = require('fs');
+const net = require('net');
+const os = require('os');
+const path = require('path');
+const {Worker, isMainThread, parentPort, workerData} = require('worker_threads');
+
+const SERVER_INFO_FILE_NAME = 'server.json';
+// Every incremental esbuild build keeps the parsed sources of its target alive.
+const MAX_ESBUILD_INCREMENTAL_BUILDS = 512;
+
+function parseArguments() {
+  const args = {
+    stateDirectory: '',
+    key: '',
+    typescript: '',
+    globalTypings: '',
+    esbuildBinary: '',
+    workers: os.cpus().length,
+    idleTimeout: 30 * 60,
+  };
+  const argv = process.argv.slice(2);
+  for (let i = 0; i < argv.length; i += 2) {
+    const value = argv[i + 1];
+    switch (argv[i]) {
+      case '--state-directory':
+        args.stateDirectory = value;
+        break;
+      case '--key':
+        args.key = value;
+        break;
+      case '--typescript':
+        args.typescript = value;
+        break;
+      case '--global-typings':
+        args.globalTypings = value;
+        break;
+      case '--esbuild-binary':
+        args.esbuildBinary = value;
+        break;
+      case '--workers':
+        args.workers = Math.max(1, parseInt(value, 10));
+        break;
+      case '--idle-timeout':
+        args.idleTimeout = parseInt(value, 10);
+        break;
+      default:
+        throw new Error(`Unknown argument ${argv[i]}`);
+    }
+  }
+  if (!args.stateDirectory || !args.typescript) {
+    throw new Error('Both --state-directory and --typescript are required');
+  }
+  return args;
+}
+
+function runWorker() {
+  const {SourceFileCache, compileProject, preloadDeclarations} = require('./tsc_compiler.js');
+  const ts = require(workerData.typescript);
+  const cache = new SourceFileCache();
+  if (workerData.globalTypings) {
+    preloadDeclarations(ts, workerData.globalTypings, cache);
+  }
+
+  parentPort?.on('message', ({id, tsconfig}) => {
+    let result;
+    try {
+      result = compileProject(ts, tsconfig, cache);
+    } catch (error) {
+      result = {exitCode: 1, output: `Compile server failed to compile ${tsconfig}:\n${error.stack}`, crashed: true};
+    }
+    parentPort?.postMessage({id, ...result});
+  });
+}
+
+class CompileServer {
+  /**
+   * @param {ReturnType<typeof parseArguments>} args
+   */
+  constructor(args) {
+    this.args = args;
+    this.infoFile = path.join(args.stateDirectory, SERVER_INFO_FILE_NAME);
+    /** @type {Array<{id: number, tsconfig: string, respond: (response: object) => void}>} */
+    this.queue = [];
+    /** @type {Worker[]} */
+    this.idleWorkers = [];
+    this.workerCount = 0;
+    /** @type {Map<Worker, {respond: (response: object) => void}>} */
+    this.busyWorkers = new Map();
+    this.nextRequestId = 0;
+    /** @type {NodeJS.Timeout|null} */
+    this.idleTimer = null;
+    /** @type {any} */
+    this.esbuild = null;
+    /**
+     * Incremental esbuild builds in least recently used order.
+     * @type {Map<string, any>}
+     */
+    this.esbuildBuilds = new Map();
+    this.pendingEsbuildRequests = 0;
+    this.server = net.createServer(socket => this.handleConnection(socket));
+  }
+
+  start() {
+    this.server.listen(0, '127.0.0.1', () => {
+      const address = this.server.address();
+      if (!address || typeof address === 'string') {
+        throw new Error('Compile server is not listening on a TCP port');
+      }
+      fs.mkdirSync(this.args.stateDirectory, {recursive: true});
+      // Write atomically, so that clients never observe a partially written file.
+      const temporaryInfoFile = `${this.infoFile}.${process.pid}`;
+      fs.writeFileSync(temporaryInfoFile, JSON.stringify({port: address.port, pid: process.pid, key: this.args.key}));
+      fs.renameSync(temporaryInfoFile, this.infoFile);
+      this.resetIdleTimer();
+    });
+    process.on('SIGTERM', () => this.shutdown());
+    process.on('SIGINT', () => this.shutdown());
+  }
+
+  // Workers are created on demand, so that a server that only runs esbuild
+  // never loads the TypeScript compiler.
+  createWorker() {
+    this.workerCount++;
+    const worker = new Worker(__filename, {
+      workerData: {typescript: this.args.typescript, globalTypings: this.args.globalTypings},
+    });
+    worker.on('message', ({id: _id, crashed, ...result}) => {
+      const request = this.busyWorkers.get(worker);
+      this.busyWorkers.delete(worker);
+      request?.respond(crashed ? {error: result.output} : result);
+      this.idleWorkers.push(worker);
+      this.dispatch();
+    });
+    worker.on('error', error => {
+      const request = this.busyWorkers.get(worker);
+      this.busyWorkers.delete(worker);
+      this.idleWorkers = this.idleWorkers.filter(w => w !== worker);
+      this.workerCount--;
+      // The client falls back to running tsc itself. If the worker failed to
+      // start (e.g. TypeScript could not be loaded), the next request spawns a
+      // new worker, which fails in the same way.
+      request?.respond({error: `Compile server worker crashed: ${error.stack}`});
+      this.dispatch();
+    });
+    return worker;
+  }
+
+  /**
+   * @param {net.Socket} socket
+   */
+  handleConnection(socket) {
+    let buffer = '';
+    socket.setEncoding('utf8');
+    socket.on('data', chunk => {
+      buffer += chunk;
+      const newline = buffer.indexOf('\n');
+      if (newline === -1) {
+        return;
+      }
+      /** @param {object} response */
+      const respond = response => {
+        socket.end(JSON.stringify(response) + '\n');
+        this.resetIdleTimer();
+      };
+      let request;
+      try {
+        request = JSON.parse(buffer.slice(0, newline));
+      } catch (error) {
+        respond({error: `Malformed request: ${error.message}`});
+        return;
+      }
+      this.handleRequest(request, respond);
+    });
+    socket.on('error', () => {
+      // The client went away, nothing to report back to.
+    });
+  }
+
+  /**
+   * @param {any} request
+   * @param {(response: object) => void} respond
+   */
+  handleRequest(request, respond) {
+    if (request.command === 'shutdown') {
+      respond({ok: true});
+      this.shutdown();
+      return;
+    }
+    if (request.command === 'compile' && typeof request.tsconfig === 'string') {
+      this.queue.push({id: this.nextRequestId++, tsconfig: request.tsconfig, respond});
+      this.dispatch();
+      return;
+    }
+    if (request.command === 'esbuild' && Array.isArray(request.sources)) {
+      this.pendingEsbuildRequests++;
+      this.runEsbuild(request)
+          .then(respond, error => respond({error: `Compile server failed to run esbuild:\n${error.stack}`}))
+          .finally(() => this.pendingEsbuildRequests--);
+      return;
+    }
+    respond({error: `Unknown request ${JSON.stringify(request)}`});
+  }
+
+  dispatch() {
+    while (this.queue.length > 0 && this.idleWorkers.length === 0 && this.workerCount < this.args.workers) {
+      this.idleWorkers.push(this.createWorker());
+    }
+    while (this.queue.length > 0 && this.idleWorkers.length > 0) {
+      const request = this.queue.shift();
+      const worker = this.idleWorkers.pop();
+      if (!request || !worker) {
+        return;
+      }
+      this.busyWorkers.set(worker, request);
+      worker.postMessage({id: request.id, tsconfig: request.tsconfig});
+    }
+  }
+
+  /**
+   * Transpiles the sources of a target exactly like the esbuild command line in
+   * `ts_library.py` does. Builds are incremental, so rebuilding a target only
+   * re-parses the files that changed since the last build of that target.
+   *
+   * @param {{sources: string[], outdir: string, tsconfig: string, format: string|null}} request
+   */
+  async runEsbuild(request) {
+    if (!this.esbuild) {
+      // esbuild fails asynchronously (and fatally) when it can't spawn its service.
+      if (!this.args.esbuildBinary || !fs.existsSync(this.args.esbuildBinary)) {
+        throw new Error(`esbuild binary not found at '${this.args.esbuildBinary}'`);
+      }
+      // The esbuild module runs its service using the binary in this path.
+      process.env.ESBUILD_BINARY_PATH = this.args.esbuildBinary;
+      this.esbuild = require('esbuild');
+    }
+    /** @type {Record<string, any>} */
+    const options = {
+      entryPoints: request.sources,
+      outdir: request.outdir,
+      tsconfig: request.tsconfig,
+      sourcemap: true,
+      logLevel: 'silent',
+      incremental: true,
+    };
+    if (request.format) {
+      options.format = request.format;
+    }
+    const buildKey = JSON.stringify(options);
+    const previousBuild = this.esbuildBuilds.get(buildKey);
+    this.esbuildBuilds.delete(buildKey);
+
+    let result;
+    try {
+      result = previousBuild ? await previousBuild.rebuild() : await this.esbuild.build(options);
+    } catch (error) {
+      previousBuild?.rebuild.dispose();
+      if (!Array.isArray(error.errors)) {
+        throw error;
+      }
+      return {exitCode: 1, output: await this.formatEsbuildMessages(error.errors, error.warnings ?? [])};
+    }
+
+    this.esbuildBuilds.set(buildKey, result);
+    for (const [key, build] of this.esbuildBuilds) {
+      if (this.esbuildBuilds.size <= MAX_ESBUILD_INCREMENTAL_BUILDS) {
+        break;
+      }
+      this.esbuildBuilds.delete(key);
+      build.rebuild.dispose();
+    }
+    return {exitCode: 0, output: await this.formatEsbuildMessages([], result.warnings)};
+  }
+
+  /**
+   * @param {any[]} errors
+   * @param {any[]} warnings
+   */
+  async formatEsbuildMessages(errors, warnings) {
+    const formatted = [
+      ...await this.esbuild.formatMessages(errors, {kind: 'error', color: false}),
+      ...await this.esbuild.formatMessages(warnings, {kind: 'warning', color: false}),
+    ];
+    return formatted.join('');
+  }
+
+  resetIdleTimer() {
+    if (this.idleTimer) {
+      clearTimeout(this.idleTimer);
+    }
+    this.idleTimer = setTimeout(() => {
+      if (this.queue.length === 0 && this.busyWorkers.size === 0 && this.pendingEsbuildRequests === 0) {
+        this.shutdown();
+      } else {
+        this.resetIdleTimer();
+      }
+    }, this.args.idleTimeout * 1000);
+    this.idleTimer.unref();
+  }
+
+  shutdown() {
+    try {
+      const info = JSON.parse(fs.readFileSync(this.infoFile, 'utf8'));
+      // A newer server might have replaced us already; leave its file alone.
+      if (info.pid === process.pid) {
+        fs.unlinkSync(this.infoFile);
+      }
+    } catch {
+      // The info file is already gone.
+    }
+    this.server.close();
+    const workers = [...this.idleWorkers, ...this.busyWorkers.keys()];
+    // Terminating the workers is asynchronous, which also gives pending
+    // responses the chance to be flushed before the process exits.
+    void Promise.all(workers.map(worker => worker.terminate())).then(() => process.exit(0));
+  }
+}
+
+if (isMainThread) {
+  new CompileServer(parseArguments()).start();
+} else {
+  runWorker();
+}